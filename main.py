@@ -2,11 +2,11 @@ import argparse
 import json
 import os
 import time
-from jsonpath import jsonpath
 
 import smartBugs
 
-from src.interface.cli import create_parser_with_args
+from src.aggregation.aggregation import FindingsTable, aggregate_table
+from src.aggregation.ingestion import contract_errors, mythril_findings, slither_findings
 
 
 class Issue:
@@ -234,96 +234,60 @@ class Contract:
         self.language = language  # 语言种类
         self.filepath = filepath  # 源代码路径
 
-    def analyze(self) -> AnalysisResult:
-        result = {}
+    def analyze(self, processes=None) -> AnalysisResult:
         time_now = time.time()
-        if not os.path.isdir("aggregated_result"):
-            if os.path.exists("aggregated_result"):
-                print("[-]Error: Result dir \"aggregated_result\" is not empty")
-                exit()
-            os.mkdir("aggregated_result")
-        analysis_result = AnalysisResult(
-            "aggregated_result/" + time.strftime("%Y-%m-%d-%H-%M-%S", time.localtime(time_now)) + "_" + self.name)
-        tool_start_time = {}  # dict[tool: start time]
-        for i in TOOLS:
-            time_now = time.time()
-            tool_start_time[i] = time_now
-            smartBugs.exec_cmd(create_parser_with_args(["-t", i, "-f", self.filepath]))
-            
-        for i in TOOLS:
-            time_now_format_list = [time.strftime("%Y%m%d_%H%M", time.localtime(tool_start_time[i] + 60)),
-                                    time.strftime("%Y%m%d_%H%M", time.localtime(tool_start_time[i]))]  # 时间可能有误差
-            
-            flag = False
-            result_json_filepath = ""
-            for time_now_format in time_now_format_list:
-                result_json_filepath = "results/{0}/{1}/{2}/result.json".format(i, time_now_format, self.name)
-                if os.path.exists(result_json_filepath):
-                    flag = True
-                    break
-            if not flag:
-                print("[-]Error: contract {} tool {} exec result not found, result filepath {}".format(self.name, i, time_now_format_list))
+        # 所有工具在同一次运行中并行执行
+        return self.aggregate(run_tools([self.filepath], processes), time_now)
+
+    def results(self, handles):
+        # 各工具的结果 dict[tool: [(line, issue)]], 由运行返回的结果句柄读取
+        result = {}
+        for tool in TOOLS:
+            handle = handles.get((tool, self.filepath))
+            if handle is None or not handle.exists():
+                print("[-]Error: contract {} tool {} exec result not found".format(self.filepath, tool))
                 continue
-            result_i, ok = phase_result_json(result_json_filepath, i)
+            result_tool, ok = phase_result_json(handle.result_json, tool)
             if not ok:
                 print(
-                    "[-]Error: contract {} tool {} exec result cannot phase, result filepath {}".format(self.name, i, result_json_filepath))
+                    "[-]Error: contract {} tool {} exec result cannot phase, result filepath {}".format(
+                        self.filepath, tool, handle.result_json))
                 continue
-            result[i] = result_i
-        for position, issue_list in aggregate(result).items():
+            result[tool] = result_tool
+        return result
+
+    def aggregate(self, handles, time_now) -> AnalysisResult:
+        make_result_dir()
+        analysis_result = AnalysisResult(
+            "aggregated_result/" + time.strftime("%Y-%m-%d-%H-%M-%S", time.localtime(time_now)) + "_" + self.name)
+        for position, issue_list in aggregate(self.results(handles)).items():
             analysis_result.add_issue(position, issue_list)
         analysis_result.save()
         return analysis_result
 
 
 class AnalysisTask:
-    def __init__(self, contracts):
+    def __init__(self, contracts, processes=None):
         self.contracts = contracts
+        self.processes = processes  # 同时运行的分析数, 默认每个工具一个
 
     def exec_in_batch(self):
         t0 = time.time()
         print("[+]Info: task begins (exec in batch)")
-        result = {}
-        if not os.path.isdir("aggregated_result"):
-            if os.path.exists("aggregated_result"):
-                print("[-]Error: Result dir \"aggregated_result\" is not empty")
-                exit()
-            os.mkdir("aggregated_result")
+        table = findings_table()  # 所有合约的结果, 一次聚合
+        make_result_dir()
         analysis_results = {}  # 存储各合约执行结果dict[contract.name:analysis_result]
-        contract_files = []  # 各合约路径列表
         for contract in self.contracts:
             analysis_results[contract.name] = AnalysisResult(
                 "aggregated_result/" + time.strftime("%Y-%m-%d-%H-%M-%S", time.localtime(t0)) + "_" + contract.name)
-            contract_files.append(contract.filepath)
-        tool_start_time = {}  # 存储各工具开始执行的时间dict[tool: start time]
-        for tool in TOOLS:
-            time_now = time.time()
-            tool_start_time[tool] = time_now
-            smartBugs.exec_cmd(create_parser_with_args(["-t", tool, "-f"] + contract_files))
+        # 所有合约与工具在同一次运行中执行
+        handles = run_tools([contract.filepath for contract in self.contracts], self.processes)
+        for contract in self.contracts:
+            for tool, result_tool in contract.results(handles).items():
+                table.add(contract, tool, result_tool)
+        aggregate_results = aggregate_table(table, TOOL_VULNERABILITY_RANGE, STRATEGY, [ISSUE_OTHER, ISSUE_UNKNOWN])
         for contract in self.contracts:
-            for tool in TOOLS:
-                time_now_format_list = [time.strftime("%Y%m%d_%H%M", time.localtime(tool_start_time[tool] + 60)),
-                                        time.strftime("%Y%m%d_%H%M", time.localtime(tool_start_time[tool]))]  # 时间可能有误差
-                flag = False
-                result_json_filepath = ""
-                for time_now_format in time_now_format_list:
-                    result_json_filepath = "results/{0}/{1}/{2}/result.json".format(tool, time_now_format,
-                                                                                    contract.name)
-                    if os.path.exists(result_json_filepath):
-                        flag = True
-                        break
-                if not flag:
-                    print("[-]Error: contract {} tool {} exec result not found, result filepath {}".format(
-                        contract.filepath, tool, time_now_format_list))
-                    continue
-                result_tool, ok = phase_result_json(result_json_filepath, tool)
-                if not ok:
-                    print(
-                        "[-]Error: contract {} tool {} exec result cannot phase, result filepath {}".format(
-                            contract.filepath, tool, result_json_filepath))
-                    continue
-                result[tool] = result_tool
-            for position, issue_list in aggregate(result).items():
+            for position, issue_list in aggregate_results.get(contract, {}).items():
                 analysis_results[contract.name].add_issue(position, issue_list)
             analysis_results[contract.name].save()
         print("[+]Info: Task is finished, total time: {}".format(
@@ -332,10 +296,12 @@ class AnalysisTask:
     def exec_in_order(self):
         t0 = time.time()
         print("[+]Info: task begins (exec in order)")
+        # 所有合约与工具在同一次运行中执行, 再逐个合约聚合
+        handles = run_tools([contract.filepath for contract in self.contracts], self.processes)
         for contract in self.contracts:
             t1 = time.time()
             print("[+]Info: File {} analysis begins".format(contract.filepath))
-            result = contract.analyze()
+            result = contract.aggregate(handles, t1)
             t2 = time.time()
             print("[+]Info: Save result of {} in {} successfully, time: {}".format(contract.filepath,
                                                                                    result.output_filepath,
@@ -345,31 +311,31 @@ class AnalysisTask:
             time.strftime("%Hh%Mm%Ss", time.localtime(time.time() - t0 - 8*3600))))
 
 
+# 在一次运行中用所有工具分析合约, 返回各 (工具, 合约路径) 的结果句柄
+def run_tools(filepaths, processes=None):
+    return smartBugs.run_analyses(filepaths, TOOLS, processes or len(TOOLS))
+
+
+# 创建聚合结果目录
+def make_result_dir():
+    if not os.path.isdir("aggregated_result"):
+        if os.path.exists("aggregated_result"):
+            print("[-]Error: Result dir \"aggregated_result\" is not empty")
+            exit()
+        os.mkdir("aggregated_result")
+
+
+# 结果表: (合约, 工具, 行, 漏洞类型) 整数编码的列
+def findings_table():
+    return FindingsTable(TOOL_VULNERABILITY_RANGE.keys(), ISSUE_LIST + [ISSUE_UNKNOWN])
+
+
 # 聚合结果
 def aggregate(result) :
-    aggregate_result = {}
-    statistical_result = {}
-    confidence_count = {}
-    for issue_type in ISSUE_LIST:
-        confidence_count[issue_type] = 0
-    for tool in result.keys():
-        for issue_type in TOOL_VULNERABILITY_RANGE[tool]:
-            confidence_count[issue_type] += 1
+    table = findings_table()
     for tool, tool_res in result.items():
-        for line, issue_list in tool_res.items():
-            for issue in issue_list:
-                if line not in statistical_result:
-                    statistical_result[line] = {}
-                if issue not in statistical_result[line]:
-                    statistical_result[line][issue] = 0
-                statistical_result[line][issue] += 1
-    for line, issue_count in statistical_result.items():
-        for issue, count in issue_count.items():
-            if (count >= STRATEGY * confidence_count[issue]) and issue != ISSUE_OTHER and issue != ISSUE_UNKNOWN:
-                if line not in aggregate_result:
-                    aggregate_result[line] = []
-                aggregate_result[line].append(issue)
-    return aggregate_result
+        table.add(None, tool, tool_res)
+    return aggregate_table(table, TOOL_VULNERABILITY_RANGE, STRATEGY, [ISSUE_OTHER, ISSUE_UNKNOWN]).get(None, {})
 
 
 def phase_result_json(filepath: str, tool: str) :
@@ -397,105 +363,64 @@ def phase_result_json(filepath: str, tool: str) :
         return phase_result_json_securify(filepath)
     else:
         print("[-]ERROR: Unknown tool", tool)
-        return {}, False
+        return [], False
 
 
 def phase_result_json_conkas(filepath: str) :
     f = open(filepath)
     data = json.load(f)
-    result = {}
+    result = []
     if ("analysis" not in data) or (not data["analysis"]):
         f.close()
         return result, False
     for i in data['analysis']:
         line = int(i['line_number'])
         issue = VULNERABILITY_MAPPING[i['vuln_type']]
-        if line not in result:
-            result[line] = []
-        result[line].append(issue)
+        result.append((line, issue))
     f.close()
     return result, True
 
 
 def phase_result_json_mythril(filepath: str):
-    f = open(filepath)
-    data = json.load(f)
-    result = {}
-    issues = jsonpath(data, "$..issues")
-    for i in issues:
-        for iss in i:
-            line = iss['lineno']
-            issue = VULNERABILITY_MAPPING[iss['title']]
-            if line not in result:
-                result[line] = []
-            result[line].append(issue)
-    f.close()
-    return result, True
+    findings = mythril_findings(filepath)
+    if findings is None:
+        return [], False
+    return [(line, VULNERABILITY_MAPPING[title]) for line, title in findings], True
 
 
 def phase_result_json_osiris(filepath: str):
-    f = open(filepath)
-    data = json.load(f)
-    result = {}
-    issues = jsonpath(data, "$..errors")
-    for i in issues:
-        for iss in i:
-            line = iss['line']
-            issue = VULNERABILITY_MAPPING[iss['message']]
-            if line not in result:
-                result[line] = []
-            result[line].append(issue)
-    f.close()
-    return result, True
+    findings = contract_errors(filepath)
+    if findings is None:
+        return [], False
+    return [(line, VULNERABILITY_MAPPING[message]) for line, message in findings], True
 
 
 def phase_result_json_slither(filepath: str):
-    f = open(filepath)
-    data = json.load(f)
-    result = {}
-    for i in data['analysis']:
-        title = i['check']
-        lines = jsonpath(i['elements'], "$..lines")
-        for li in lines:
-            for line in li:
-                issue = VULNERABILITY_MAPPING[title]
-                if line not in result:
-                    result[line] = []
-                result[line].append(issue)
-    f.close()
-    return result, True
+    findings = slither_findings(filepath)
+    if findings is None:
+        return [], False
+    return [(line, VULNERABILITY_MAPPING[check]) for line, check in findings], True
 
 
 def phase_result_json_oyente(filepath: str):
-    f = open(filepath)
-    data = json.load(f)
-    result = {}
-    issues = jsonpath(data, "$..errors")
-    for i in issues:
-        for iss in i:
-            line = iss['line']
-            issue = VULNERABILITY_MAPPING[iss['message']]
-            if line not in result:
-                result[line] = []
-            result[line].append(issue)
-    f.close()
-    return result, True
+    findings = contract_errors(filepath)
+    if findings is None:
+        return [], False
+    return [(line, VULNERABILITY_MAPPING[message]) for line, message in findings], True
 
 
 def phase_result_json_solhint(filepath: str) :
     # TODO
     f = open(filepath)
     data = json.load(f)
-    result = {}
+    result = []
     if "analysis" not in data:
         f.close()
         return result, False
     for i in data['analysis']:
         line = i['line']
         issue = VULNERABILITY_MAPPING[i['message']]
-        if line not in result:
-            result[line] = []
-        result[line].append(issue)
+        result.append((line, issue))
     f.close()
     return result, True
 
@@ -503,16 +428,14 @@ def phase_result_json_solhint(filepath: str) :
 def phase_result_json_smartcheck(filepath: str) :
     f = open(filepath)
     data = json.load(f)
-    result = {}
+    result = []
     if "analysis" not in data:
         f.close()
         return result, False
     for i in data["analysis"]:
         line = i["line"]
         issue = VULNERABILITY_MAPPING[i["name"]]
-        if line not in result:
-            result[line] = []
-        result[line].append(issue)
+        result.append((line, issue))
     f.close()
     return result, True
 
@@ -520,16 +443,14 @@ def phase_result_json_smartcheck(filepath: str) :
 def phase_result_json_honeybadger(filepath: str) :
     f = open(filepath)
     data = json.load(f)
-    result = {}
+    result = []
     if ("analysis" not in data) or (len(data["analysis"]) == 0) or ("errors" not in data["analysis"][0]):
         f.close()
         return result, False
     for error in data["analysis"][0]["errors"]:
         line = error["line"]
         issue = VULNERABILITY_MAPPING[error["message"]]
-        if line not in result:
-            result[line] = []
-        result[line].append(issue)
+        result.append((line, issue))
     f.close()
     return result, True
 
@@ -537,16 +458,14 @@ def phase_result_json_honeybadger(filepath: str) :
 def phase_result_json_manticore(filepath: str):
     f = open(filepath)
     data = json.load(f)
-    result = {}
+    result = []
     if "analysis" not in data or (len(data["analysis"]) == 0):
         f.close()
         return result, False
     for i in data["analysis"][0]:
         line = i["line"]
         issue = VULNERABILITY_MAPPING[i["name"]]
-        if line not in result:
-            result[line] = []
-        result[line].append(issue)
+        result.append((line, issue))
     f.close()
     return result, True
 
@@ -554,16 +473,14 @@ def phase_result_json_manticore(filepath: str):
 def phase_result_json_maian(filepath: str) :
     f = open(filepath)
     data = json.load(f)
-    result = {}
+    result = []
     if "analysis" not in data:
         f.close()
         return result, False
     for k, v in data["analysis"].items():
         if v:
             line = 0
-            if line not in result:
-                result[line] = []
-            result[line].append(VULNERABILITY_MAPPING[k])
+            result.append((line, VULNERABILITY_MAPPING[k]))
     f.close()
     return result, True
 
@@ -571,16 +488,14 @@ def phase_result_json_maian(filepath: str) :
 def phase_result_json_securify(filepath: str) :
     f = open(filepath)
     data = json.load(f)
-    result = {}
+    result = []
     if ("analysis" not in data) or (len(data["analysis"]) == 0) or (
             "results" not in list(data["analysis"].values())[0]):
         f.close()
         return result, False
     for k, v in list(data["analysis"].values())[0]["results"].items():
         for line in v["violations"]:
-            if line not in result:
-                result[line] = []
-            result[line].append(VULNERABILITY_MAPPING[k])
+            result.append((line, VULNERABILITY_MAPPING[k]))
     f.close()
     return result, True
 
@@ -593,6 +508,8 @@ if __name__ == '__main__':
     parser.add_argument('files', metavar='FILE', type=str, nargs='+', help='smart contract files')
     parser.add_argument('--mode', '-m', type=str, help='exec mode, \"order\": analyze contract by contract, '
                                                        '\"batch\": analyze together', default="order")
+    parser.add_argument('--processes', '-p', type=int, default=None,
+                        help='number of analyses running at once, by default one per tool')
     args = parser.parse_args()
     contracts = []
     for file in args.files:
@@ -604,7 +521,7 @@ if __name__ == '__main__':
     if len(contracts) == 0:
         print("[-]Error: No file given, exit")
         exit()
-    task = AnalysisTask(contracts)
+    task = AnalysisTask(contracts, args.processes)
     if args.mode == "order":
         task.exec_in_order()
     elif args.mode == "batch":
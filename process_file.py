@@ -1,6 +1,7 @@
 import argparse
 import os
 import re
+from multiprocessing import Pool
 
 re_pragma1 = re.compile(r"pragma solidity \^?0.[0-9].[0-9]{1,2};")
 re_pragma2 = re.compile(r"pragma solidity >=0.[0-9].[0-9]{1,2};")
@@ -19,6 +20,12 @@ openzeppelin_dir_mapping = {
     "@openzeppelinV3/": dir_path_openzeppelinV3 + "/",
     "@openzeppelinV4/": dir_path_openzeppelinV4 + "/",
 }
+# the text every directive of a kind starts with, and the expressions of the directives of that kind
+directive_kinds = [
+    ("pragma", "pragma solidity ", [re_pragma1, re_pragma2, re_pragma3]),
+    ("license", "// SPDX-License-Identifier: ", [re_license]),
+    ("import", "import ", [re_import_file1, re_import_file2]),
+]
 
 
 class SolVersion:
@@ -66,7 +73,167 @@ def merge(v1: SolVersion, v2: SolVersion) -> (SolVersion, bool):
     return SolVersion, False
 
 
+# the pragmas, licenses and imports of a solidity file, and its source code without them
+class SolSource:
+    def __init__(self, pragmas: list, licenses: list, import_paths: list, source_code: str):
+        self.pragmas = pragmas
+        self.licenses = licenses
+        self.import_paths = import_paths
+        self.source_code = source_code
+
+
+# reads a file and finds its directives in one pass over its text: each directive is looked for only where the text it
+# starts with is, and is cut out of the source code as it is found. None for a file that is not a solidity file
+def scan_sol_file(filepath: str):
+    if not (filepath.endswith(".sol") and os.path.isfile(filepath)):
+        return None
+    with open(filepath) as f:
+        file_data = f.read()
+    directives = {}
+    spans = []
+    for kind, prefix, expressions in directive_kinds:
+        # the directives of each expression after those of the one before, as they were found one expression at a time
+        matches = [[] for _ in expressions]
+        index = file_data.find(prefix)
+        while index != -1:
+            for expression, expression_matches in zip(expressions, matches):
+                match = expression.match(file_data, index)
+                if match is not None:
+                    expression_matches.append(match.group())
+                    spans.append(match.span())
+                    index = match.end()
+                    break
+            else:
+                index += 1
+            index = file_data.find(prefix, index)
+        directives[kind] = [directive for expression_matches in matches for directive in expression_matches]
+    source_code = []
+    end = 0
+    for start, next_end in sorted(spans):
+        source_code.append(file_data[end:start])
+        end = next_end
+    source_code.append(file_data[end:])
+    # import "./A.sol"; -> ./A.sol, import {A} from "./A.sol"; -> ./A.sol
+    import_paths = [import_file.split(" ")[3 if "from" in import_file else 1][1:-2]
+                    for import_file in directives["import"]]
+    return SolSource(directives["pragma"], directives["license"], import_paths, "".join(source_code))
+
+
+# absolute path -> source of the file, scanned once whatever the path it is reached by
+sol_sources = {}
+
+
+def get_sol_source(filepath: str):
+    key = os.path.abspath(filepath)
+    if key not in sol_sources:
+        sol_sources[key] = scan_sol_file(filepath)
+    return sol_sources[key]
+
+
+# scans the files and all the files they import, each level of the import tree in parallel
+def load_sol_sources(filepaths: list[str], processes: int):
+    pending = [map_filepath(filepath) for filepath in filepaths]
+    pool = Pool(processes) if processes > 1 else None
+    try:
+        while len(pending) > 0:
+            paths = list({os.path.abspath(path): path for path in pending
+                          if os.path.abspath(path) not in sol_sources}.values())
+            if pool is None:
+                sources = map(scan_sol_file, paths)
+            else:
+                sources = pool.map(scan_sol_file, paths, chunksize=max(1, len(paths) // (processes * 4)))
+            pending = []
+            for filepath, sol_source in zip(paths, sources):
+                sol_sources[os.path.abspath(filepath)] = sol_source
+                if sol_source is not None:
+                    pending += [resolve_import(filepath, import_path) for import_path in sol_source.import_paths]
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+# "@openzeppelin/..." in a path -> the directory of the openzeppelin contracts
+def map_filepath(filepath: str) -> str:
+    for k, v in openzeppelin_dir_mapping.items():
+        if k in filepath:
+            index = filepath.find(k)
+            filepath = filepath[index:].replace(k, v)
+            break
+    return filepath
+
+
+def resolve_import(filepath: str, import_path: str) -> str:
+    name = os.path.split(filepath)[1][:-4]
+    return map_filepath(os.path.abspath(os.path.join(filepath.replace("/" + name + ".sol", ""), import_path)))
+
+
+#  "pragma solidity ^0.4.25" -> SolVersion(0, 4, 25, True), "pragma solidity 0.8.0" -> SolVersion(0, 8, 0, False)
+def parse_sol_version(pragma: str) -> SolVersion:
+    sol_version = SolVersion(0, 0, 0, True)
+    sol_version.allow_higher = ("^" in pragma) or (">=" in pragma)
+    sol_version_string_tuple = re_sol_version.findall(pragma)[0][:len(pragma) - 1].split(".")
+    sol_version.first = int(sol_version_string_tuple[0])
+    sol_version.second = int(sol_version_string_tuple[1])
+    sol_version.third = int(sol_version_string_tuple[2])
+    return sol_version
+
+
 sol_file_mapping = {}
+# position of each file of sol_file_mapping in the order the files are output, for as many files as it has
+file_positions = {}
+# filepath -> the files its output is made of, in order
+import_orders = {}
+
+
+# the files of sol_file_mapping ordered so that each comes after the files it imports, computed again only when files
+# were added to the mapping
+def get_file_positions() -> dict:
+    global file_positions
+    if len(file_positions) == len(sol_file_mapping):
+        return file_positions
+    filepath_in_order = []
+    visited_files = {}
+    for file_path in sol_file_mapping.keys():
+        visited_files[file_path] = 0
+    valid = True
+
+    def dfs(s: str):
+        nonlocal valid
+        visited_files[s] = 1
+        for sol_file in sol_file_mapping[s].import_files:
+            if visited_files[sol_file.filepath] == 0:
+                dfs(sol_file.filepath)
+                if not valid:
+                    return
+            elif visited_files[sol_file.filepath] == 1:
+                valid = False
+                return
+        visited_files[s] = 2
+        filepath_in_order.append(s)
+
+    for filepath in sol_file_mapping.keys():
+        if valid and not visited_files[filepath]:
+            dfs(filepath)
+
+    if not valid:
+        exit("circular import")
+
+    file_positions = {filepath: position for position, filepath in enumerate(filepath_in_order)}
+    import_orders.clear()
+    return file_positions
+
+
+# the file and the files it imports, directly or not, in the order they are output; the order of each imported file is
+# computed once and reused by every file importing it
+def get_import_order(sol_file) -> list:
+    positions = get_file_positions()
+    if sol_file.filepath not in import_orders:
+        files = {sol_file.filepath: sol_file}
+        for import_file in sol_file.import_files:
+            files.update((imported.filepath, imported) for imported in get_import_order(import_file))
+        import_orders[sol_file.filepath] = sorted(files.values(), key=lambda imported: positions[imported.filepath])
+    return import_orders[sol_file.filepath]
 
 
 class SolFile:
@@ -76,71 +243,25 @@ class SolFile:
             exit("file {} is not a solidity file".format(self.filepath))
         self.name = os.path.split(filepath)[1][:-4]
 
-        with open(filepath) as f:
-            self.file_data = f.read()
-        if self._count_pragma_of_file() != 1:
-            exit("file {} has {} version pragma".format(self.filepath, self._count_pragma_of_file()))
-        if self._count_license_of_file() != 1:
-            exit("file {} has {} license".format(self.filepath, self._count_license_of_file()))
-        self.sol_version = self._get_sol_version()
-        self.license = self._get_license()
-        self.import_files = self._get_import_files()
-        self.source_code = self._get_source_code()
+        sol_source = get_sol_source(filepath)
+        if len(sol_source.pragmas) != 1:
+            exit("file {} has {} version pragma".format(self.filepath, len(sol_source.pragmas)))
+        if len(sol_source.licenses) != 1:
+            exit("file {} has {} license".format(self.filepath, len(sol_source.licenses)))
+        self.sol_version = parse_sol_version(sol_source.pragmas[0])
+        # SPDX - License - Identifier: MIT -> "MIT"
+        self.license = sol_source.licenses[0][28:]
+        self.import_files = self._get_import_files(sol_source.import_paths)
+        self.source_code = sol_source.source_code
         print("new SolFile {}".format(self.filepath))
 
-    #  "pragma solidity ^0.4.25" -> SolVersion(0, 4, 25, True), "pragma solidity 0.8.0" -> SolVersion(0, 8, 0, False)
-    def _get_sol_version(self) -> SolVersion:
-        if len(re_pragma1.findall(self.file_data)) != 0:
-            pragma = re_pragma1.findall(self.file_data)[0]
-        elif len(re_pragma2.findall(self.file_data)) != 0:
-            pragma = re_pragma2.findall(self.file_data)[0]
-        else:
-            pragma = re_pragma3.findall(self.file_data)[0]
-        sol_version = SolVersion(0, 0, 0, True)
-        sol_version.allow_higher = ("^" in pragma) or (">=" in pragma)
-        sol_version_string_tuple = re_sol_version.findall(pragma)[0][:len(pragma) - 1].split(".")
-        sol_version.first = int(sol_version_string_tuple[0])
-        sol_version.second = int(sol_version_string_tuple[1])
-        sol_version.third = int(sol_version_string_tuple[2])
-        return sol_version
-
-    # SPDX - License - Identifier: MIT -> "MIT"
-    def _get_license(self) -> str:
-        return re_license.findall(self.file_data)[0][28:]
-
-    def _count_license_of_file(self) -> int:
-        return len(re_license.findall(self.file_data))
-
     def _is_file_solidity(self) -> bool:
         return self.filepath.endswith(".sol") and os.path.isfile(self.filepath)
 
-    def _count_pragma_of_file(self) -> int:
-        pragmas = re_pragma1.findall(self.file_data) + re_pragma2.findall(self.file_data) + re_pragma3.findall(self.file_data)
-        return len(pragmas)
-
-    def _get_source_code(self) -> str:
-        pragmas = re_pragma1.findall(self.file_data) + re_pragma2.findall(self.file_data) + re_pragma3.findall(self.file_data)
-        source_code = self.file_data
-        for pragma in pragmas:
-            source_code = source_code.replace(pragma, "")
-        for import_file in re_import_file1.findall(self.file_data) + re_import_file2.findall(self.file_data):
-            source_code = source_code.replace(import_file, "")
-        for spdx_license in re_license.findall(self.file_data):
-            source_code = source_code.replace(spdx_license, "")
-        return source_code
-
-    def _get_import_files(self) -> list:
-        imports = re_import_file1.findall(self.file_data) + re_import_file2.findall(self.file_data)
+    def _get_import_files(self, import_paths: list) -> list:
         files = []
-        for import_file in imports:
-            self_filepath = self.filepath
-            if "from" in import_file:
-                filepath = os.path.abspath(
-                    os.path.join(self_filepath.replace("/" + self.name + ".sol", ""), import_file.split(" ")[3][1:-2]))
-            else:
-                filepath = os.path.abspath(
-                    os.path.join(self_filepath.replace("/" + self.name + ".sol", ""), import_file.split(" ")[1][1:-2]))
-            new_sol_file = make_sol_file(filepath)
+        for import_path in import_paths:
+            new_sol_file = make_sol_file(resolve_import(self.filepath, import_path))
             merge_sol_version, ok = merge(self.sol_version, new_sol_file.sol_version)
             if not ok:
                 exit("solidity version conflict between {} and {}".format(self.filepath, new_sol_file.filepath))
@@ -148,40 +269,11 @@ class SolFile:
             files.append(new_sol_file)
         return files
 
+    # the source code of the file after that of the files it imports
     def output(self) -> str:
         if len(self.import_files) == 0:
             return self.source_code
-        filepath_in_order = []
-        visited_files = {}
-        for file_path in sol_file_mapping.keys():
-            visited_files[file_path] = 0
-        valid = True
-
-        def dfs(s: str):
-            nonlocal valid
-            visited_files[s] = 1
-            for sol_file in sol_file_mapping[s].import_files:
-                if visited_files[sol_file.filepath] == 0:
-                    dfs(sol_file.filepath)
-                    if not valid:
-                        return
-                elif visited_files[sol_file.filepath] == 1:
-                    valid = False
-                    return
-            visited_files[s] = 2
-            filepath_in_order.append(s)
-
-        for filepath in sol_file_mapping.keys():
-            if valid and not visited_files[filepath]:
-                dfs(filepath)
-
-        if not valid:
-            exit("circular import")
-
-        text = ""
-        for filepath in filepath_in_order:
-            text += sol_file_mapping[filepath].source_code
-        return text
+        return "".join(sol_file.source_code for sol_file in get_import_order(self))
 
     def save(self, target_filepath: str):
         while os.path.exists(target_filepath):
@@ -197,11 +289,7 @@ class SolFile:
 
 
 def make_sol_file(filepath: str) -> SolFile:
-    for k, v in openzeppelin_dir_mapping.items():
-        if k in filepath:
-            index = filepath.find(k)
-            filepath = filepath[index:].replace(k, v)
-            break
+    filepath = map_filepath(filepath)
     if filepath in sol_file_mapping:
         return sol_file_mapping[filepath]
     new_sol_file = SolFile(filepath)
@@ -233,6 +321,8 @@ if __name__ == '__main__':
     parser.add_argument('path', metavar='PATH', type=str, help='directory or main file')
     parser.add_argument('--output_dir', '-o', type=str, help='merged file output directory', required=True)
     parser.add_argument('--only_contract', '-oc', action="store_true", help='only output main file with contract')
+    parser.add_argument('--processes', '-p', type=int, default=os.cpu_count() or 1,
+                        help='number of processes reading the files (default: the number of CPUs)')
     args = parser.parse_args()
     if not os.path.exists(args.output_dir):
         os.mkdir(args.output_dir)
@@ -251,6 +341,7 @@ if __name__ == '__main__':
             for m in k:
                 if m.endswith(".sol"):
                     solidity_files.append(os.path.join(i, m))
+        load_sol_sources(solidity_files, args.processes)
         for solidity_file in solidity_files:
             make_sol_file(solidity_file)
         main_files = find_main_files(sol_file_mapping, args.only_contract)
@@ -261,6 +352,7 @@ if __name__ == '__main__':
             exit(0)
         exit("no main file")
     elif args.path.endswith(".sol"):
+        load_sol_sources([args.path], args.processes)
         format_sol_file(args.path, args.output_dir + "/o_" + os.path.split(args.path)[1])
         exit(0)
     exit("path {} is not a dir or a sol file".format(args.path))
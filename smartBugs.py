@@ -1,18 +1,17 @@
 #!/usr/bin/env python3
 
 import argparse
-import git
-import json
 import os
 import pathlib
 import sys
 import yaml
 
 from datetime import timedelta
-from multiprocessing import Manager, Pool
-from src.docker_api.docker_api import analyse_files
-from src.interface.cli import create_parser, getRemoteDataset, isRemoteDataset, DATASET_CHOICES, TOOLS_CHOICES
-from src.output_parser.SarifHolder import SarifHolder
+from src.interface.cli import create_cache_parser, create_parser, create_parser_with_args, create_worker_parser, getRemoteDataset, isRemoteDataset, DATASET_CHOICES, TOOLS_CHOICES
+from src.exception.BrokerKeyException import BrokerKeyException
+from src.interface.result_handle import ResultHandle
+from src.journal.journal import JobJournal, remaining_jobs
+from src.result_cache.result_cache import ResultCache
 from time import time, localtime, strftime
 
 
@@ -23,47 +22,153 @@ with open(cfg_dataset_path, 'r') as ymlfile:
     except yaml.YAMLError as exc:
         print(exc)
 
-output_folder = strftime("%Y%m%d_%H%M", localtime())
-pathlib.Path('results/logs/').mkdir(parents=True, exist_ok=True)
-logs = open('results/logs/SmartBugs_' + output_folder + '.log', 'w')
+# the output folder and the log of the run, only created once a run starts, see start_run
+output_folder = None
+logs = None
+journal = None
 
 
-def analyse(args):
+def start_run(folder=None):
     global logs, output_folder
+    if logs is not None:
+        logs.close()
+    # a new run gets the folder of the current minute, a resumed one writes to the folder of the stopped run
+    output_folder = folder if folder is not None else strftime("%Y%m%d_%H%M", localtime())
+    pathlib.Path('results/logs/').mkdir(parents=True, exist_ok=True)
+    logs = open('results/logs/SmartBugs_' + output_folder + '.log', 'a')
+    return logs
+
+
+def init_job_process(folder, log_path, run_journal, images):
+    # the state of the run in a process of its pool, passed rather than inherited so that it does not depend on the
+    # process being forked: the output folder, the log, the journal and the images pinned by the planning phase
+    global logs, output_folder, journal
+    from src.docker_api.docker_api import pin_images
+
+    output_folder = folder
+    logs = open(log_path, 'a')
+    journal = run_journal
+    pin_images(images)
+
+
+def analyse(args):
+    global logs, output_folder, journal
+    from src.docker_api.docker_api import analyse_files
+    from src.output_parser.SarifHolder import SarifHolder
 
-    (tool, file, sarif_outputs, import_path, output_version, nb_task, nb_task_done, total_execution, start_time) = args
+    (tool, file, import_path, output_version, warm_containers, result_cache, adaptive_timeout) = args
 
     try:
         start = time()
-        nb_task_done.value += 1
+        if journal is not None:
+            journal.started(tool, file)
 
-        sys.stdout.write('\x1b[1;37m' + 'Analysing file [%d/%d]: ' % (nb_task_done.value, nb_task) + '\x1b[0m')
+        sys.stdout.write('\x1b[1;37m' + 'Analysing file: ' + '\x1b[0m')
         sys.stdout.write('\x1b[1;34m' + file + '\x1b[0m')
         sys.stdout.write('\x1b[1;37m' + ' [' + tool + ']' + '\x1b[0m' + '\n')
 
-        analyse_files(tool, file, logs, output_folder, sarif_outputs, output_version, import_path)
+        # the holder only lives for this task, the output is sent back to the parent to be parsed, or the runs of a
+        # cached result with the result record
+        file_name = os.path.splitext(os.path.basename(file))[0]
+        sarif_outputs = {file_name: SarifHolder()}
+        (runs, analysis) = analyse_files(tool, file, logs, output_folder, sarif_outputs, output_version, import_path,
+                                         warm_containers, result_cache, adaptive_timeout, collect=True)
+        return tool, file, file_name, runs, time() - start, analysis
+    except Exception as e:
+        if journal is not None:
+            journal.failed(tool, file, e)
+        print(e)
+        raise e
 
 
-        total_execution.value += time() - start
+def analyse_batch_job(batch):
+    global logs, output_folder, journal
+    from src.docker_api.docker_api import analyse_batch
+    from src.output_parser.SarifHolder import SarifHolder
 
-        duration = str(timedelta(seconds=round(time() - start)))
+    (tool, _, import_path, output_version, _, result_cache, adaptive_timeout) = batch[0]
+    files = [task[1] for task in batch]
 
-        task_sec = nb_task_done.value / (time() - start_time)
-        remaining_time = str(timedelta(seconds=round((nb_task - nb_task_done.value) / task_sec)))
+    try:
+        start = time()
+        if journal is not None:
+            for file in files:
+                journal.started(tool, file)
 
-        sys.stdout.write(
-            '\x1b[1;37m' + 'Done [%d/%d, %s]: ' % (nb_task_done.value, nb_task, remaining_time) + '\x1b[0m')
-        sys.stdout.write('\x1b[1;34m' + file + '\x1b[0m')
-        sys.stdout.write('\x1b[1;37m' + ' [' + tool + '] in ' + duration + ' ' + '\x1b[0m' + '\n')
-        logs.write('[%d/%d] ' % (nb_task_done.value, nb_task) + file + ' [' + tool + '] in ' + duration + ' \n')
+        sys.stdout.write('\x1b[1;37m' + 'Analysing %d files: ' % len(files) + '\x1b[0m')
+        sys.stdout.write('\x1b[1;34m' + ' '.join(files) + '\x1b[0m')
+        sys.stdout.write('\x1b[1;37m' + ' [' + tool + ']' + '\x1b[0m' + '\n')
+
+        file_names = [os.path.splitext(os.path.basename(file))[0] for file in files]
+        sarif_outputs = {file_name: SarifHolder() for file_name in file_names}
+        (runs, analyses) = analyse_batch(tool, files, logs, output_folder, sarif_outputs, output_version,
+                                         import_path, result_cache, adaptive_timeout, collect=True)
+
+        # each file is accounted the same share of the batch
+        duration = (time() - start) / len(files)
+        return [(tool, file, file_name, runs.get(file, []), duration, analyses.get(file))
+                for (file, file_name) in zip(files, file_names)]
     except Exception as e:
+        if journal is not None:
+            for file in files:
+                journal.failed(tool, file, e)
         print(e)
         raise e
 
 
-def exec_cmd(args: argparse.Namespace):
-    global logs, output_folder
+def analyse_job(job):
+    # a batch of tasks sends back one record per file
+    if isinstance(job, list):
+        return analyse_batch_job(job)
+    return [analyse(job)]
+
+
+def write_aggregate_sarif(sarif_output, file_name):
+    sarif_file_path = 'results/' + output_folder + '/' + file_name + '.sarif'
+    os.makedirs(os.path.dirname(sarif_file_path), exist_ok=True)
+    with open(sarif_file_path, 'w') as sarif_file:
+        sarif_output.write(sarif_file)
+
+
+def report_progress(record, nb_task_done, nb_task, start_time):
+    (tool, file, file_name, runs, duration) = record
+
+    task_sec = nb_task_done / (time() - start_time)
+    remaining_time = str(timedelta(seconds=round((nb_task - nb_task_done) / task_sec)))
+    duration = str(timedelta(seconds=round(duration)))
+
+    sys.stdout.write(
+        '\x1b[1;37m' + 'Done [%d/%d, %s]: ' % (nb_task_done, nb_task, remaining_time) + '\x1b[0m')
+    sys.stdout.write('\x1b[1;34m' + file + '\x1b[0m')
+    sys.stdout.write('\x1b[1;37m' + ' [' + tool + '] in ' + duration + ' ' + '\x1b[0m' + '\n')
+    logs.write('[%d/%d] ' % (nb_task_done, nb_task) + file + ' [' + tool + '] in ' + duration + ' \n')
+
+
+def exec_cmd(args: argparse.Namespace, remaining=None, results=None):
+    global logs, output_folder, journal
+    # docker, the parsers and the engines are only loaded by a run, not to answer --help or --list; the processes of
+    # the pools inherit them
+    import asyncio
+    from src.distributed.broker import Coordinator, broker_key, parse_address
+    from src.docker_api.async_engine import AsyncEngine
+    from src.docker_api.container_pool import remove_pool_containers
+    from src.docker_api.docker_api import get_batch_size, get_client, load_tool_config, pin_images, \
+        remove_sweep_containers, select_image
+    from src.docker_api.docker_http import AsyncDockerClient
+    from src.docker_api.image_plan import plan_images
+    from src.docker_api.pipeline import Pipeline
+    from src.output_parser.SarifHolder import SarifHolder
+    from src.output_parser.SarifStream import SarifAggregate
+    from src.scheduler.scheduler import adaptive_timeouts, pack_batches, schedule, write_makespan_report
+
+    if args.engine == 'distributed':
+        # a broker that would accept other hosts with the public key is refused before the sweep starts
+        broker_key(parse_address(args.broker))
+    if logs is None:
+        start_run()
     logs.write('Arguments passed: ' + str(sys.argv) + '\n')
+    journal = JobJournal(output_folder)
+    journal.open_sweep(sys.argv, resumed=remaining is not None)
 
     files_to_analyze = []
 
@@ -89,6 +194,7 @@ def exec_cmd(args: argparse.Namespace):
                         sys.stdout.write('\x1b[1;37m' + 'Cloning remote dataset [%s <- %s]... ' % (
                             base_path, remote_info['url']) + '\x1b[0m')
                         sys.stdout.flush()
+                        import git
                         git.Repo.clone_from(remote_info['url'], base_path)
                         sys.stdout.write('\x1b[1;37m\n' + 'Done.' + '\x1b[0m\n')
                     else:
@@ -135,13 +241,15 @@ def exec_cmd(args: argparse.Namespace):
 
     # Setting up analysis variables
     start_time = time()
-    manager = Manager()
-
-    nb_task_done = manager.Value('i', 0)
-    total_execution = manager.Value('f', 0)
-    nb_task = len(files_to_analyze) * len(args.tool)
 
-    sarif_outputs = manager.dict()
+    sarif_outputs = {}
+    warm_containers = (args.warm_containers, args.container_max_jobs) if args.warm_containers > 0 else None
+    result_cache = ResultCache(args.cache_dir, args.cache_size) if args.cache else None
+    timeouts = {}
+    if args.adaptive_timeout is not None:
+        timeouts = adaptive_timeouts(args.tool, args.adaptive_timeout)
+        for (tool, timeout) in sorted(timeouts.items()):
+            logs.write('Adaptive timeout of ' + tool + ': %ds\n' % timeout)
     tasks = []
     file_names = []
     for file in files_to_analyze:
@@ -156,39 +264,213 @@ def exec_cmd(args: argparse.Namespace):
                 if os.path.exists(folder):
                     continue
 
-            tasks.append((tool, file, sarif_outputs, args.import_path, args.output_version, nb_task, nb_task_done,
-                          total_execution, start_time))
-        file_names.append(os.path.splitext(os.path.basename(file))[0])
-
-    # initialize all sarif outputs
-    for file_name in file_names:
-        sarif_outputs[file_name] = SarifHolder()
+            # a resumed sweep only runs the jobs its journal does not record as finished
+            if remaining is not None and (tool, file) not in remaining:
+                continue
 
-    with Pool(processes=args.processes) as pool:
-        pool.map(analyse, tasks)
+            tasks.append((tool, file, args.import_path, args.output_version, warm_containers, result_cache,
+                          timeouts.get(tool)))
+        file_names.append(os.path.splitext(os.path.basename(file))[0])
 
+    if remaining is None:
+        journal.queued(tasks)
+    else:
+        # containers of the stopped run would otherwise keep running next to the resumed jobs
+        removed = remove_sweep_containers(output_folder, logs)
+        logs.write('Resuming %d jobs, %d containers of the stopped run removed\n' % (len(tasks), removed))
+
+    # images are pulled once here rather than by each worker whose job needs them, the workers of a distributed
+    # sweep use their own daemon
+    pinned_images = {}
+    if args.engine != 'distributed':
+        pinned_images = plan_images(get_client(), tasks, logs, args.max_pulls)
+        pin_images(pinned_images)
+        for (image, image_id) in pinned_images.items():
+            logs.write('Image ' + image + ': ' + image_id + '\n')
+
+    # the SARIF outputs of a file are only held until its last analysis is done
+    file_tasks = {}
+    for task in tasks:
+        file_name = os.path.splitext(os.path.basename(task[1]))[0]
+        file_tasks[file_name] = file_tasks.get(file_name, 0) + 1
     if args.aggregate_sarif:
         for file_name in file_names:
-            sarif_file_path = 'results/' + output_folder + '/' + file_name + '.sarif'
-            with open(sarif_file_path, 'w') as sarif_file:
-                json.dump(sarif_outputs[file_name].print(), sarif_file, indent=2)
+            sarif_outputs[file_name] = SarifHolder()
 
+    sarif_aggregate = None
     if args.unique_sarif_output:
-        sarif_holder = SarifHolder()
-        for sarif_output in sarif_outputs.values():
-            for run in sarif_output.sarif.runs:
-                sarif_holder.addRun(run)
-        sarif_file_path = 'results/' + output_folder + '.sarif'
-        with open(sarif_file_path, 'w') as sarif_file:
-            json.dump(sarif_holder.print(), sarif_file, indent=2)
+        sarif_aggregate = SarifAggregate('results/' + output_folder + '.sarif',
+                                         [(task[0], os.path.splitext(os.path.basename(task[1]))[0]) for task in tasks],
+                                         file_names, args.sarif_shards)
+
+    predictions = None
+    if args.schedule == 'longest-first':
+        (tasks, predictions) = schedule(tasks)
+
+    nb_task = len(tasks)
+    nb_task_done = 0
+    durations = {}
+
+    # workers stream back one record per (tool, file), folded here by the only owner of the SARIF outputs
+    def fold_record(record):
+        nonlocal nb_task_done
+        nb_task_done += 1
+        (tool, file, file_name, runs, duration) = record
+        durations[(tool, file)] = duration
+        if results is not None:
+            results[(tool, file)] = ResultHandle(tool, file, output_folder, file_name, runs, duration)
+        if args.aggregate_sarif:
+            for run in runs:
+                sarif_outputs[file_name].addRun(run)
+            file_tasks[file_name] -= 1
+            if file_tasks[file_name] == 0:
+                write_aggregate_sarif(sarif_outputs.pop(file_name), file_name)
+        if sarif_aggregate is not None:
+            sarif_aggregate.addRuns(tool, file_name, runs)
+        report_progress(record, nb_task_done, nb_task, start_time)
+
+    try:
+        if args.engine == 'async':
+            logs.flush()
+            engine = AsyncEngine(AsyncDockerClient(), output_folder, logs.name,
+                                 max_containers=args.max_containers,
+                                 tool_limits=dict(args.tool_limit),
+                                 image_limits=dict(args.image_limit),
+                                 parse_processes=args.parse_processes or args.processes,
+                                 journal=journal,
+                                 images=pinned_images)
+            asyncio.run(engine.run(tasks, fold_record))
+        elif args.engine == 'distributed':
+            logs.flush()
+            coordinator = Coordinator(args.broker, output_folder, logs.name,
+                                      lease_timeout=args.lease_timeout,
+                                      max_attempts=args.max_attempts,
+                                      journal=journal)
+            coordinator.run(tasks, fold_record)
+        else:
+            jobs = tasks
+            if warm_containers and not args.no_batch:
+                # a warm container runs one file per job, batches would leave the pool unused
+                logs.write('Batches are not used with warm containers\n')
+            elif not args.no_batch:
+                # files of the tools that accept several inputs share containers, in the scheduled order
+                cfgs = {tool: load_tool_config(tool, logs)[1] for tool in set(task[0] for task in tasks)}
+                batch_sizes = {tool: get_batch_size(cfg) for (tool, cfg) in cfgs.items()}
+                jobs = pack_batches(tasks, batch_sizes, lambda task: select_image(cfgs[task[0]], task[1], logs))
+            # containers and parsing run in separate pools, parsing by default on at most one process per CPU
+            parse_processes = args.parse_processes or min(args.processes, os.cpu_count() or 1)
+            logs.flush()
+            pipeline = Pipeline(analyse_job, logs.name,
+                                processes=args.processes,
+                                parse_processes=parse_processes,
+                                queue_size=args.parse_queue,
+                                result_cache=result_cache,
+                                journal=journal,
+                                initializer=init_job_process,
+                                initargs=(output_folder, logs.name, journal, pinned_images))
+            pipeline.run(jobs, fold_record)
+    finally:
+        if warm_containers:
+            # workers are terminated with the pool, so their warm containers are removed from here
+            remove_pool_containers(get_client(), output_folder)
+
+    if predictions is not None:
+        workers = args.max_containers if args.engine == 'async' else args.processes
+        report = write_makespan_report('results/logs/SmartBugs_' + output_folder + '_makespan.json', tasks,
+                                       predictions, durations, workers, time() - start_time)
+        logs.write('Predicted makespan: %ds, actual: %ds\n' % (report['predicted_makespan'],
+                                                                report['actual_makespan']))
+
+    if result_cache is not None:
+        result_cache.prune()
+
+    # the files without analyses to run
+    for (file_name, sarif_output) in sarif_outputs.items():
+        write_aggregate_sarif(sarif_output, file_name)
+
+    if sarif_aggregate is not None:
+        sarif_aggregate.close()
 
     return logs
 
 
+def new_sweep_folder():
+    # the folder of the current minute, numbered when a sweep of the same minute already has a log or a journal
+    base = strftime("%Y%m%d_%H%M", localtime())
+    folder = base
+    number = 1
+    while JobJournal(folder).exists() or os.path.exists('results/logs/SmartBugs_' + folder + '.log'):
+        number += 1
+        folder = '%s_%d' % (base, number)
+    return folder
+
+
+def run_analyses(files, tools, processes=1, options=()):
+    # runs the tools on the files in one sweep of this process, all in the same pools, and returns the ResultHandle of
+    # each (tool, file) analysed. options are given as on the command line. each call is a sweep of its own, with its
+    # own output folder, log and journal, so that it never writes over the results of an earlier call
+    args = create_parser_with_args(['--tool'] + list(tools) + ['--file'] + list(files) +
+                                   ['--processes', str(processes)] + list(options))
+    start_run(new_sweep_folder())
+    results = {}
+    exec_cmd(args, results=results)
+    return results
+
+
+def resume_sweep(sweep):
+    sweep_journal = JobJournal(sweep)
+    if not sweep_journal.exists():
+        print('\x1b[1;31m' + 'ERROR: no journal of sweep %s in %s' % (sweep, os.path.dirname(sweep_journal.path))
+              + '\x1b[0m')
+        sys.exit(1)
+    (argv, states) = sweep_journal.replay()
+
+    # the options of the stopped run, the ones given again with --resume take precedence
+    args = create_parser_with_args(argv[1:] + sys.argv[1:])
+
+    # the resumed jobs write to the results folders and the log of the stopped run
+    start_run(sweep)
+    return args, remaining_jobs(states)
+
+
+def exec_cache_cmd(args: argparse.Namespace):
+    result_cache = ResultCache(args.cache_dir)
+    if args.command == 'stats':
+        stats = result_cache.stats()
+        print('Cached results: %d' % stats['entries'])
+        print('Size: %.1f MB' % (stats['size'] / (1024 * 1024)))
+        if stats['entries'] > 0:
+            print('Least recently used: ' + strftime("%Y-%m-%d %H:%M", localtime(stats['oldest'])))
+            print('Most recently used: ' + strftime("%Y-%m-%d %H:%M", localtime(stats['newest'])))
+    elif args.command == 'prune':
+        max_size = 0 if args.all else args.max_size * 1024 * 1024
+        older_than = args.older_than * 24 * 3600 if args.older_than is not None else None
+        evicted = result_cache.prune(max_size=max_size, older_than=older_than)
+        print('Evicted %d cached results' % evicted)
+
+
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'cache':
+        exec_cache_cmd(create_cache_parser(sys.argv[2:]))
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == 'worker':
+        from src.distributed.worker import run_workers
+        worker_args = create_worker_parser(sys.argv[2:])
+        try:
+            run_workers(worker_args.broker, worker_args.processes,
+                        worker_args.cache_dir if worker_args.cache else None)
+        except BrokerKeyException as err:
+            sys.exit('\x1b[1;31m' + 'ERROR: ' + err.message + '\x1b[0m')
+        sys.exit(0)
     start_time = time()
     args = create_parser()
-    logs = exec_cmd(args)
+    remaining = None
+    if args.resume is not None:
+        (args, remaining) = resume_sweep(args.resume)
+    try:
+        logs = exec_cmd(args, remaining)
+    except BrokerKeyException as err:
+        sys.exit('\x1b[1;31m' + 'ERROR: ' + err.message + '\x1b[0m')
     elapsed_time = round(time() - start_time)
     if elapsed_time > 60:
         elapsed_time_sec = round(elapsed_time % 60)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+from array import array
+
+import numpy
+
+
+"""
+findings of the tools on many contracts as integer-encoded columns, one row per (contract, tool, line, issue) found,
+in the order they were added
+
+contracts and lines are encoded in the order they are first seen, tools and issues by their position in the lists
+the table is created with. the tools that gave a result on a contract are recorded apart from the findings, a
+tool without findings still counts in the consensus of the contract
+"""
+class FindingsTable:
+    def __init__(self, tools, issues):
+        self.tools = list(tools)
+        self.tool_codes = {tool: code for (code, tool) in enumerate(self.tools)}
+        self.issues = list(issues)
+        self.issue_codes = {issue: code for (code, issue) in enumerate(self.issues)}
+        self.contracts = []
+        self.contract_codes = {}
+        # the contract and tool columns are stored as runs of rows, expanded by columns(). lines are kept as found,
+        # whatever their type, and encoded all at once by columns()
+        self.result_contracts = array('q')
+        self.result_tools = array('q')
+        self.result_sizes = array('q')
+        self.line_column = []
+        self.issue_column = array('q')
+        self.lines = None
+
+    def __len__(self):
+        return len(self.issue_column)
+
+    def contract_code(self, contract):
+        code = self.contract_codes.get(contract)
+        if code is None:
+            code = self.contract_codes[contract] = len(self.contracts)
+            self.contracts.append(contract)
+        return code
+
+    def add(self, contract, tool, findings):
+        # findings of a tool on a contract, as [(line, issue), ...]
+        if findings:
+            (lines, issues) = zip(*findings)
+            self.line_column.extend(lines)
+            self.issue_column.extend(map(self.issue_codes.__getitem__, issues))
+            self.lines = None
+        self.result_contracts.append(self.contract_code(contract))
+        self.result_tools.append(self.tool_codes[tool])
+        self.result_sizes.append(len(findings))
+
+    def columns(self):
+        # the line codes, and the lines in the order of their codes, are computed once for all the findings added
+        if self.lines is None:
+            codes = {}
+            self.line_codes = numpy.fromiter((codes.setdefault(line, len(codes)) for line in self.line_column),
+                                             dtype=numpy.int64, count=len(self.line_column))
+            self.lines = numpy.empty(len(codes), dtype=object)
+            for (line, code) in codes.items():
+                self.lines[code] = line
+        result_sizes = numpy.frombuffer(self.result_sizes, dtype=numpy.int64)
+        return (numpy.repeat(numpy.frombuffer(self.result_contracts, dtype=numpy.int64), result_sizes),
+                numpy.repeat(numpy.frombuffer(self.result_tools, dtype=numpy.int64), result_sizes),
+                self.line_codes,
+                numpy.frombuffer(self.issue_column, dtype=numpy.int64))
+
+
+"""
+number of tools that gave a result on each contract and can find each issue, as a (contracts, issues) matrix: the
+tools of each contract times the issues of each tool, a tool listing an issue twice counting twice
+"""
+def confidence_counts(table, tool_ranges):
+    ranges = numpy.zeros((len(table.tools), len(table.issues)), dtype=numpy.int64)
+    for (tool, issues) in tool_ranges.items():
+        if tool in table.tool_codes:
+            for issue in issues:
+                ranges[table.tool_codes[tool], table.issue_codes[issue]] += 1
+    results = numpy.zeros((len(table.contracts), len(table.tools)), dtype=numpy.int64)
+    results[numpy.frombuffer(table.result_contracts, dtype=numpy.int64),
+            numpy.frombuffer(table.result_tools, dtype=numpy.int64)] = 1
+    return results @ ranges
+
+
+"""
+consensus of the tools over all the contracts of a table at once: the (contract, line, issue) reported by at least
+`strategy` times the tools able to find the issue on the contract, except the excluded issues. returns the contract,
+line and issue codes of the retained findings, each in the order it was first reported
+"""
+def consensus(table, tool_ranges, strategy, excluded=()):
+    (contracts, _, lines, issues) = table.columns()
+    if len(issues) == 0:
+        empty = numpy.zeros(0, dtype=numpy.int64)
+        return empty, empty, empty
+
+    # one key per (contract, line, issue), grouped and counted in one sort
+    n_lines = len(table.lines)
+    n_issues = len(table.issues)
+    keys = (contracts * n_lines + lines) * n_issues + issues
+    (groups, first, counts) = numpy.unique(keys, return_index=True, return_counts=True)
+    group_issues = groups % n_issues
+    group_lines = groups // n_issues % n_lines
+    group_contracts = groups // n_issues // n_lines
+
+    thresholds = strategy * confidence_counts(table, tool_ranges)
+    retained = counts >= thresholds[group_contracts, group_issues]
+    excluded_codes = [table.issue_codes[issue] for issue in excluded if issue in table.issue_codes]
+    if excluded_codes:
+        retained &= ~numpy.isin(group_issues, excluded_codes)
+
+    order = numpy.argsort(first[retained], kind='stable')
+    return group_contracts[retained][order], group_lines[retained][order], group_issues[retained][order]
+
+
+"""
+the retained findings of each contract of a table, as {contract: {line: [issue, ...]}}, with the lines and the issues
+of each line in the order they were first reported. contracts without retained findings map to an empty dict
+"""
+def aggregate_table(table, tool_ranges, strategy, excluded=()):
+    (contracts, lines, issues) = consensus(table, tool_ranges, strategy, excluded)
+    aggregated = {contract: {} for contract in table.contracts}
+    by_code = [aggregated[contract] for contract in table.contracts]
+    # filled one by one, so that an issue given as a tuple stays one value
+    issue_values = numpy.empty(len(table.issues), dtype=object)
+    for (code, issue) in enumerate(table.issues):
+        issue_values[code] = issue
+    for (contract, line, issue) in zip(contracts.tolist(), table.lines[lines].tolist(),
+                                       issue_values[issues].tolist()):
+        found = by_code[contract]
+        at_line = found.get(line)
+        if at_line is None:
+            found[line] = [issue]
+        else:
+            at_line.append(issue)
+    return aggregated
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import re
+
+# result.json files larger than this are read incrementally, one finding entry at a time
+STREAM_SIZE = 1 << 20
+CHUNK_SIZE = 1 << 16
+
+WHITESPACE = ' \t\n\r'
+DELIMITER = re.compile(r'[ \t\n\r,\]}]')
+
+
+"""
+incremental reader of a JSON document: values are decoded one at a time from a buffer refilled from the file, so that
+only the value being read is held in memory
+"""
+class JsonStream:
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        # number of characters dropped from the start of the buffer
+        self.offset = 0
+        self.eof = False
+
+    def fill(self, size):
+        # drops what was read, and appends at least `size` characters unless the file ends
+        chunk = self.f.read(max(size, self.chunk_size))
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.offset += self.pos
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+
+    def peek(self):
+        # the next character that is not whitespace, or '' at the end of the file
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self.fill(self.chunk_size)
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError('Expecting %r' % char, self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self):
+        if self.peek() not in ('{', '[', '"'):
+            # a number or a literal is decoded once a delimiter follows it, a cut one could decode to a shorter value
+            while not self.eof and DELIMITER.search(self.buffer, self.pos) is None:
+                self.fill(self.chunk_size)
+        while True:
+            try:
+                (value, self.pos) = self.decoder.raw_decode(self.buffer, self.pos)
+                return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # the buffer grows by what it already holds, so that a large value is decoded a bounded number of times
+            self.fill(len(self.buffer) - self.pos)
+
+    def members(self):
+        # the key of each member of the object at the reader position, with the reader at its value. the value is
+        # skipped if it was not read when the next key is asked for
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            position = self.offset + self.pos
+            yield key
+            if self.offset + self.pos == position:
+                self.value()
+            if self.peek() == '}':
+                self.pos += 1
+                return
+            self.expect(',')
+
+    def items(self):
+        # each item of the array at the reader position, decoded one at a time
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ']':
+                self.pos += 1
+                return
+            self.expect(',')
+
+
+"""
+the entries of the array at `path` in the analysis of a result.json, or None when the analysis has no such array
+(a tool that failed). files larger than STREAM_SIZE are read incrementally, and the entries are then decoded one at a
+time while they are iterated
+"""
+def analysis_entries(filepath, path=(), stream_size=STREAM_SIZE):
+    if os.path.getsize(filepath) <= stream_size:
+        with open(filepath) as f:
+            value = json.load(f).get('analysis')
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        return value if isinstance(value, list) else None
+
+    f = open(filepath)
+    stream = JsonStream(f)
+    for key in ('analysis',) + tuple(path):
+        if stream.peek() != '{':
+            f.close()
+            return None
+        for member in stream.members():
+            if member == key:
+                break
+        else:
+            f.close()
+            return None
+    if stream.peek() != '[':
+        f.close()
+        return None
+
+    def entries():
+        with f:
+            yield from stream.items()
+    return entries()
+
+
+"""
+source lines of the elements of a slither finding, in the order they appear: the lines of each element, then those of
+the elements it refers to (its contract and function in older slither versions, its parent in newer ones)
+"""
+def slither_element_lines(elements):
+    lines = []
+    for element in elements:
+        for (key, value) in element.items():
+            if key == 'source_mapping':
+                lines.extend(value.get('lines', ()))
+            elif key in ('contract', 'function') and isinstance(value, dict):
+                lines.extend(slither_element_lines([value]))
+            elif key == 'type_specific_fields' and isinstance(value.get('parent'), dict):
+                lines.extend(slither_element_lines([value['parent']]))
+    return lines
+
+
+"""
+(line, name) of each finding of a tool in a result.json, straight from the place the tool output is stored in: the
+issues of mythril, the errors of each contract of oyente and osiris, the elements of each check of slither. returns
+None when the result has no findings array
+"""
+def mythril_findings(filepath, stream_size=STREAM_SIZE):
+    issues = analysis_entries(filepath, ('issues',), stream_size)
+    if issues is None:
+        return None
+    return [(issue['lineno'], issue['title']) for issue in issues]
+
+
+def contract_errors(filepath, stream_size=STREAM_SIZE):
+    contracts = analysis_entries(filepath, (), stream_size)
+    if contracts is None:
+        return None
+    return [(error['line'], error['message']) for contract in contracts for error in contract['errors']]
+
+
+def slither_findings(filepath, stream_size=STREAM_SIZE):
+    checks = analysis_entries(filepath, (), stream_size)
+    if checks is None:
+        return None
+    return [(line, check['check']) for check in checks for line in slither_element_lines(check['elements'])]
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+
+import os
+import queue
+import tempfile
+import threading
+from collections import deque
+from shutil import rmtree
+from time import time
+
+from src.exception.BrokerKeyException import BrokerKeyException
+
+BROKER_ADDRESS = '127.0.0.1:7800'
+# shared secret of the coordinator and its workers, connections with another key are refused
+BROKER_KEY_ENV = 'SMARTBUGS_BROKER_KEY'
+# key used without SMARTBUGS_BROKER_KEY, public in the repository and so only accepted on the loopback interface: the
+# messages of the broker are pickles, whoever knows the key can run code on the coordinator and its workers
+LOOPBACK_BROKER_KEY = 'smartbugs'
+# seconds a job stays leased to a worker without news from it, the workers renew their leases well before
+LEASE_TIMEOUT = 120
+# attempts of a job, failed or lost with its worker, before it is given up
+MAX_ATTEMPTS = 3
+# seconds a worker waits before asking again when all the remaining jobs are leased, at most a quarter of the lease
+WAIT_DELAY = 5
+
+
+"""
+(host, port) of a HOST:PORT address
+"""
+def parse_address(address):
+    (host, _, port) = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+"""
+whether connections to host stay on this machine
+"""
+def is_loopback(host):
+    import ipaddress
+    import socket
+
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+"""
+key authenticating the connections to the broker at (host, port): key if given, else SMARTBUGS_BROKER_KEY, else the
+default key, which is refused for a broker that is not on the loopback interface
+"""
+def broker_key(address, key=None):
+    if key is None:
+        key = (os.environ.get(BROKER_KEY_ENV) or LOOPBACK_BROKER_KEY).encode('utf8')
+    if key == LOOPBACK_BROKER_KEY.encode('utf8') and not is_loopback(address[0]):
+        raise BrokerKeyException('%s:%d' % address)
+    return key
+
+
+"""
+an analysis of a contract by a tool, as handed to workers: the contract is only known by the hash of its bytes
+"""
+class Job:
+    def __init__(self, job_id, task, file_hash, file_path_in_repo, output_folder):
+        (tool, file, import_path, output_version, warm_containers, result_cache, adaptive_timeout) = task
+        self.id = job_id
+        self.task = task
+        self.tool = tool
+        self.file = file
+        self.file_hash = file_hash
+        self.file_path_in_repo = file_path_in_repo
+        self.file_name = os.path.splitext(os.path.basename(file))[0]
+        self.output_folder = output_folder
+        self.output_version = output_version
+        self.warm_containers = warm_containers
+        self.adaptive_timeout = adaptive_timeout
+        self.attempts = 0
+        self.worker = None
+        self.expires = None
+        self.done = False
+
+    def description(self, lease_timeout):
+        # what a worker needs to run the job, everything but the contract bytes
+        return {
+            'id': self.id,
+            'tool': self.tool,
+            'file_hash': self.file_hash,
+            'file_path_in_repo': self.file_path_in_repo,
+            'output_folder': self.output_folder,
+            'output_version': self.output_version,
+            'warm_containers': self.warm_containers,
+            'adaptive_timeout': self.adaptive_timeout,
+            'lease_timeout': lease_timeout
+        }
+
+
+"""
+state of the jobs of a sweep: queued, leased to a worker until their lease expires, done or given up
+
+all the methods are called under one lock by the coordinator, whatever the thread serving the worker
+"""
+class Broker:
+    def __init__(self, jobs, lease_timeout=LEASE_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+        self.jobs = {job.id: job for job in jobs}
+        self.queue = deque(jobs)
+        self.leased = {}
+        self.remaining = len(jobs)
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+
+    def finished(self):
+        return self.remaining == 0
+
+    def lease(self, worker, now):
+        # the next queued job, None when all the remaining jobs are leased
+        while self.queue:
+            job = self.queue.popleft()
+            if job.done:
+                continue
+            job.attempts += 1
+            job.worker = worker
+            job.expires = now + self.lease_timeout
+            self.leased[job.id] = job
+            return job
+        return None
+
+    def renew(self, job_id, worker, now):
+        job = self.leased.get(job_id)
+        if job is None or job.worker != worker:
+            return False
+        job.expires = now + self.lease_timeout
+        return True
+
+    def complete(self, job_id):
+        # the first completion of a job counts, a late one from a worker whose lease expired is ignored
+        job = self.jobs[job_id]
+        if job.done:
+            return None
+        job.done = True
+        self.leased.pop(job_id, None)
+        self.remaining -= 1
+        return job
+
+    def fail(self, job_id, worker):
+        # returns the job and whether it was given up
+        job = self.leased.get(job_id)
+        if job is None or job.worker != worker or job.done:
+            return None, False
+        del self.leased[job_id]
+        return job, self.retry(job)
+
+    def expire(self, now):
+        # jobs whose worker went silent, returned with whether each was given up
+        expired = [job for job in self.leased.values() if job.expires < now]
+        for job in expired:
+            del self.leased[job.id]
+        return [(job, self.retry(job)) for job in expired]
+
+    def retry(self, job):
+        if job.attempts >= self.max_attempts:
+            job.done = True
+            self.remaining -= 1
+            return True
+        self.queue.append(job)
+        return False
+
+
+"""
+coordinator of a distributed sweep: serves the jobs to the workers connected to its broker socket, writes the result
+files they send back and hands one record per job to the sweep, as the local engines do
+
+workers speak to the broker through multiprocessing connections, authenticated by the broker key:
+    ('lease', worker) -> ('job', description) | ('wait', seconds) | ('done',)
+    ('contract', file_hash) -> ('contract', bytes)
+    ('renew', job_id, worker) -> ('renewed', bool)
+    ('artifact', job_id, worker, name, chunk) -> ('ok',)
+    ('complete', job_id, worker, runs, duration) -> ('ok',)
+    ('fail', job_id, worker, error) -> ('ok',)
+
+the result files of a job come before its completion, one chunk of a file per artifact message, and are kept aside
+until the job completes, so that neither side holds a whole file and a late attempt does not overwrite the results
+"""
+class Coordinator:
+    def __init__(self, address, output_folder, log_path, key=None, lease_timeout=LEASE_TIMEOUT,
+                 max_attempts=MAX_ATTEMPTS, journal=None):
+        self.address = parse_address(address)
+        self.output_folder = output_folder
+        self.log_path = log_path
+        self.key = broker_key(self.address, key)
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.journal = journal
+        self.lock = threading.Lock()
+        self.records = queue.Queue()
+        self.broker = None
+        self.contracts = {}
+        # (job id, worker) -> folder the result files of an attempt are uploaded to
+        self.uploads = {}
+        self.listener = None
+
+    def prepare_jobs(self, tasks):
+        # the run machinery is only loaded by a run, the command line reads the defaults of the broker from here
+        import hashlib
+        from src.docker_api.docker_api import get_file_path_in_repo
+
+        jobs = []
+        hashes = {}
+        for (job_id, task) in enumerate(tasks):
+            (tool, file, import_path) = task[:3]
+            if file not in hashes:
+                with open(file, 'rb') as f:
+                    hashes[file] = hashlib.sha256(f.read()).hexdigest()
+                self.contracts[hashes[file]] = file
+            jobs.append(Job(job_id, task, hashes[file], get_file_path_in_repo(file, import_path), self.output_folder))
+        return jobs
+
+    def run(self, tasks, on_record):
+        from multiprocessing.connection import Listener
+
+        jobs = self.prepare_jobs(tasks)
+        self.broker = Broker(jobs, self.lease_timeout, self.max_attempts)
+        self.listener = Listener(self.address, authkey=self.key)
+        print('Broker listening on %s:%d, waiting for workers' % self.address)
+        threading.Thread(target=self.accept, daemon=True).start()
+        try:
+            # each job ends with exactly one record, done or given up
+            for _ in range(len(jobs)):
+                while True:
+                    with self.lock:
+                        expired = self.broker.expire(time())
+                    for (job, given_up) in expired:
+                        self.job_failed(job, given_up, 'lease of ' + str(job.worker) + ' expired')
+                    try:
+                        record = self.records.get(timeout=1)
+                        break
+                    except queue.Empty:
+                        pass
+                on_record(record)
+        finally:
+            self.listener.close()
+            # uploads of workers lost before completing their job
+            for folder in self.uploads.values():
+                rmtree(folder, ignore_errors=True)
+
+    def accept(self):
+        while True:
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                # closed at the end of the sweep
+                return
+            except Exception as err:
+                # a client without the broker key
+                self.log('refused connection: ' + str(err))
+                continue
+            threading.Thread(target=self.serve, args=(connection,), daemon=True).start()
+
+    def serve(self, connection):
+        with connection:
+            while True:
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = self.handle(request)
+                except Exception as err:
+                    reply = ('error', str(err))
+                connection.send(reply)
+
+    def handle(self, request):
+        command = request[0]
+        if command == 'lease':
+            with self.lock:
+                if self.broker.finished():
+                    return ('done',)
+                job = self.broker.lease(request[1], time())
+            if job is None:
+                return ('wait', min(WAIT_DELAY, self.lease_timeout / 4))
+            if self.journal is not None:
+                self.journal.started(job.tool, job.file)
+            return ('job', job.description(self.lease_timeout))
+        if command == 'contract':
+            with open(self.contracts[request[1]], 'rb') as f:
+                return ('contract', f.read())
+        if command == 'renew':
+            with self.lock:
+                return ('renewed', self.broker.renew(request[1], request[2], time()))
+        if command == 'artifact':
+            (_, job_id, worker, name, chunk) = request
+            with open(os.path.join(self.upload_folder(job_id, worker), os.path.basename(name)), 'ab') as f:
+                f.write(chunk)
+            return ('ok',)
+        if command == 'complete':
+            (_, job_id, worker, runs, duration) = request
+            with self.lock:
+                job = self.broker.complete(job_id)
+                upload = self.uploads.pop((job_id, worker), None)
+            if job is not None and upload is not None:
+                self.move_artifacts(job, upload)
+            if upload is not None:
+                rmtree(upload, ignore_errors=True)
+            if job is not None:
+                if self.journal is not None:
+                    self.journal.finished(job.tool, job.file, duration)
+                self.records.put((job.tool, job.file, job.file_name, runs, duration))
+            return ('ok',)
+        if command == 'fail':
+            (_, job_id, worker, error) = request
+            with self.lock:
+                (job, given_up) = self.broker.fail(job_id, worker)
+                upload = self.uploads.pop((job_id, worker), None)
+            if upload is not None:
+                rmtree(upload, ignore_errors=True)
+            if job is not None:
+                self.job_failed(job, given_up, str(worker) + ': ' + error)
+            return ('ok',)
+        return ('error', 'unknown command ' + str(command))
+
+    def job_failed(self, job, given_up, error):
+        self.log(job.file + ' [' + job.tool + '] attempt %d: ' % job.attempts + error)
+        if self.journal is not None:
+            self.journal.failed(job.tool, job.file, error)
+        if given_up:
+            # the sweep goes on without the results of the job, as with the errors of the local engines
+            self.records.put((job.tool, job.file, job.file_name, [], 0))
+
+    def upload_folder(self, job_id, worker):
+        # created next to the results of the job, so that they are moved rather than copied once it completes
+        with self.lock:
+            if (job_id, worker) not in self.uploads:
+                output_folder = os.path.join('results', self.broker.jobs[job_id].tool, self.output_folder)
+                os.makedirs(output_folder, exist_ok=True)
+                self.uploads[(job_id, worker)] = tempfile.mkdtemp(prefix='.upload-', dir=output_folder)
+            return self.uploads[(job_id, worker)]
+
+    def move_artifacts(self, job, upload):
+        # result files of the job, moved where a local run writes them
+        results_folder = os.path.join('results', job.tool, self.output_folder, job.file_name)
+        os.makedirs(results_folder, exist_ok=True)
+        for name in os.listdir(upload):
+            os.replace(os.path.join(upload, name), os.path.join(results_folder, name))
+
+    def log(self, message):
+        print(message)
+        with open(self.log_path, 'a') as logs:
+            logs.write(message + '\n')
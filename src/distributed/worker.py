@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import os
+import socket
+import tempfile
+import threading
+from multiprocessing import Process
+from multiprocessing.connection import Client
+from shutil import rmtree
+from time import sleep, time
+
+from src.distributed.broker import broker_key, parse_address
+from src.docker_api.docker_api import analyse_files, close_container_pool
+from src.exception.StagingPathException import StagingPathException
+from src.output_parser.SarifHolder import SarifHolder
+from src.result_cache.result_cache import ResultCache
+
+# seconds a worker keeps trying to reach a broker that is not up yet or went away
+CONNECT_TIMEOUT = 60
+# bytes of a result file sent to the broker in one message
+ARTIFACT_CHUNK_SIZE = 1024 * 1024
+
+
+"""
+connection to the broker, retried until it accepts or the timeout passes
+"""
+def connect(address, key, timeout=CONNECT_TIMEOUT):
+    deadline = time() + timeout
+    while True:
+        try:
+            return Client(address, authkey=key)
+        except OSError:
+            if time() > deadline:
+                raise
+            sleep(1)
+
+
+"""
+run a job with the local Docker daemon through the pipeline of local sweeps, returns the SARIF runs of the job and
+the folder of its result files
+"""
+def analyse_job(job, file, import_path, logs, result_cache):
+    file_name = os.path.splitext(os.path.basename(file))[0]
+    sarif_outputs = {file_name: SarifHolder()}
+    runs = analyse_files(job['tool'], file, logs, job['output_folder'], sarif_outputs, job['output_version'],
+                         import_path, job['warm_containers'], result_cache, job['adaptive_timeout'])
+    return runs, os.path.join('results', job['tool'], job['output_folder'], file_name)
+
+
+"""
+send the result files of a job to the broker one chunk at a time, so that no file is held whole on either side
+"""
+def send_artifacts(connection, job, worker, results_folder):
+    for name in sorted(os.listdir(results_folder)):
+        path = os.path.join(results_folder, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            # an empty file is still sent, as one empty chunk
+            while True:
+                chunk = f.read(ARTIFACT_CHUNK_SIZE)
+                connection.send(('artifact', job['id'], worker, name, chunk))
+                connection.recv()
+                if len(chunk) < ARTIFACT_CHUNK_SIZE:
+                    break
+
+
+"""
+renews the lease of a job from its own connection while the job runs
+"""
+class Heartbeat(threading.Thread):
+    def __init__(self, address, key, worker, job):
+        super().__init__(daemon=True)
+        self.address = address
+        self.key = key
+        self.worker = worker
+        self.job = job
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            with connect(self.address, self.key) as connection:
+                while not self.stopped.wait(self.job['lease_timeout'] / 4):
+                    connection.send(('renew', self.job['id'], self.worker))
+                    connection.recv()
+        except (OSError, EOFError):
+            # the broker is gone, the job result will not be taken anyway
+            pass
+
+    def stop(self):
+        self.stopped.set()
+
+
+"""
+worker process: leases jobs from the broker and runs them one at a time until the sweep is done
+"""
+def work(address, key, worker, stage_dir, log_path, cache_dir=None, analyse=analyse_job):
+    result_cache = ResultCache(cache_dir) if cache_dir is not None else None
+    try:
+        with connect(address, key) as connection, open(log_path, 'a') as logs:
+            while True:
+                try:
+                    connection.send(('lease', worker))
+                    reply = connection.recv()
+                except (OSError, EOFError):
+                    # the coordinator closes its broker once the sweep is done
+                    return
+                if reply[0] == 'done':
+                    return
+                if reply[0] == 'wait':
+                    sleep(reply[1])
+                    continue
+                if reply[0] != 'job':
+                    raise RuntimeError('unexpected broker reply: ' + str(reply))
+                job = reply[1]
+
+                import_path = os.path.join(stage_dir, job['file_hash']) + '/'
+                heartbeat = Heartbeat(address, key, worker, job)
+                heartbeat.start()
+                start = time()
+                results_folder = None
+                try:
+                    file = stage_contract(connection, stage_dir, job)
+                    (runs, results_folder) = analyse(job, file, import_path, logs, result_cache)
+                    report = ('complete', job['id'], worker, runs, time() - start)
+                except Exception as err:
+                    logs.write(job['file_path_in_repo'] + ' [' + job['tool'] + ']: ' + str(err) + '\n')
+                    report = ('fail', job['id'], worker, str(err))
+                try:
+                    if results_folder is not None and os.path.isdir(results_folder):
+                        send_artifacts(connection, job, worker, results_folder)
+                    connection.send(report)
+                    connection.recv()
+                except (OSError, EOFError):
+                    return
+                finally:
+                    heartbeat.stop()
+                    # the results now live on the coordinator
+                    if results_folder is not None:
+                        rmtree(results_folder, ignore_errors=True)
+    finally:
+        close_container_pool()
+
+
+"""
+write the contract of a job, fetched from the broker once per worker host, under the path it has in the repository
+of the coordinator, so that the tool command and the SARIF locations are the same as in a local run
+"""
+def stage_contract(connection, stage_dir, job):
+    # the paths come from the broker, a contract is only written under the folder of its hash
+    root = os.path.abspath(stage_dir)
+    folder = os.path.abspath(os.path.join(root, job['file_hash']))
+    file = os.path.abspath(os.path.join(folder, job['file_path_in_repo']))
+    if os.path.dirname(folder) != root or os.path.commonpath([folder, file]) != folder or file == folder:
+        raise StagingPathException(job['file_path_in_repo'])
+    if not os.path.isfile(file):
+        connection.send(('contract', job['file_hash']))
+        contract = connection.recv()[1]
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        # the other processes of the worker may stage the same contract
+        (fd, staging) = tempfile.mkstemp(dir=os.path.dirname(file))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contract)
+        os.replace(staging, file)
+    return file
+
+
+"""
+run worker processes against a broker until its sweep is done
+"""
+def run_workers(address, processes=1, cache_dir=None, key=None, analyse=analyse_job, log_path=None):
+    address = parse_address(address)
+    key = broker_key(address, key)
+    stage_dir = tempfile.mkdtemp(prefix='smartbugs-worker-')
+    if log_path is None:
+        os.makedirs('results/logs', exist_ok=True)
+        log_path = os.path.join('results/logs', 'SmartBugs_worker_%s_%d.log' % (socket.gethostname(), os.getpid()))
+    try:
+        workers = [Process(target=work, args=(address, key, '%s:%d:%d' % (socket.gethostname(), os.getpid(), i),
+                                              stage_dir, log_path, cache_dir, analyse))
+                   for i in range(processes)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        rmtree(stage_dir, ignore_errors=True)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import shlex
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AsyncExitStack
+from time import time
+
+from src.docker_api.docker_api import ENGINE_LABEL, KILLED_EXIT_CODE, NO_ENTRYPOINT_IMAGES, STATUS_COMPLETED, \
+    STATUS_OOM, STATUS_TIMEOUT, SpooledArchive, get_cmd, get_file_path_in_repo, get_resource_limits, get_timeout, \
+    load_tool_config, parse_results, restore_results, select_image, stage_files
+from src.docker_api.docker_http import AsyncDockerClient, host_config
+from src.docker_api.log_stream import file_chunks
+from src.exception.DockerAPIException import DockerAPIException
+from src.output_parser.SarifHolder import SarifHolder
+
+worker_logs = None
+
+
+"""
+open the log file in each parsing process
+"""
+def init_worker(log_path):
+    global worker_logs
+    worker_logs = open(log_path, 'a')
+
+
+"""
+read the configuration of a job and choose its image and command, in a parsing process since it parses the source
+"""
+def prepare_job(tool, file, import_path):
+    (cfg_path, cfg) = load_tool_config(tool, worker_logs)
+    file_name = os.path.splitext(os.path.basename(file))[0]
+    image = select_image(cfg, file, worker_logs)
+    cmd = get_cmd(cfg, file)
+    return cfg_path, cfg, image, cmd, file_name, get_file_path_in_repo(file, import_path)
+
+
+"""
+write the results of a job from the result cache, returns None on a miss
+"""
+def restore_job(result_cache, cache_key, tool, file_name, results_folder, output_version):
+    cached = result_cache.load(cache_key)
+    if cached is None:
+        return None
+    sarif_outputs = {file_name: SarifHolder()}
+    restore_results(cached, tool, file_name, results_folder, sarif_outputs, output_version)
+    return cached[2]
+
+
+"""
+parse the raw output of a job and write its results
+"""
+def parse_job(output_path, archive_path, tool, file_name, cfg, results_folder, start, end, file_path_in_repo,
+              output_version, result_cache, cache_key, status):
+    sarif_outputs = {file_name: SarifHolder()}
+    try:
+        (results, runs) = parse_results(file_chunks(output_path), tool, file_name, SpooledArchive(archive_path), cfg,
+                                        worker_logs, results_folder, start, end, sarif_outputs, file_path_in_repo,
+                                        output_version, status)
+    finally:
+        os.remove(output_path)
+        if archive_path is not None:
+            os.remove(archive_path)
+    if cache_key is not None and results['analysis'] is not None and status == STATUS_COMPLETED:
+        result_cache.store(cache_key, os.path.join(results_folder, file_name, 'result.log'), results, runs)
+    worker_logs.flush()
+    return runs
+
+
+"""
+runs the analyses of a sweep from a single event loop
+
+containers are driven through the Docker Engine API, so a job waiting on its container only holds a coroutine and a
+socket; the number of containers in flight is bounded globally, per tool and per image, and the CPU-bound steps
+(reading the source, parsing the output) run in a process pool. timeouts and resource limits come from the tool
+configurations
+"""
+class AsyncEngine:
+    def __init__(self, docker, output_folder, log_path, max_containers=16, tool_limits=None, image_limits=None,
+                 parse_processes=1, journal=None, images=None):
+        self.docker = docker
+        self.output_folder = output_folder
+        self.log_path = log_path
+        self.max_containers = max_containers
+        self.tool_limits = tool_limits or {}
+        self.image_limits = image_limits or {}
+        self.parse_processes = parse_processes
+        self.journal = journal
+        self.semaphores = {}
+        self.images = {}
+        # name -> id of the images pinned by the planning phase of the sweep
+        self.pinned_images = images or {}
+
+    def semaphore(self, kind, name, limit):
+        if limit is None:
+            return None
+        if (kind, name) not in self.semaphores:
+            self.semaphores[(kind, name)] = asyncio.Semaphore(limit)
+        return self.semaphores[(kind, name)]
+
+    async def resolve_image(self, image):
+        # the id of an image, pulled once for all the jobs that need it unless it was pinned before the sweep
+        if image in self.pinned_images:
+            return self.pinned_images[image]
+        if image not in self.images:
+            self.images[image] = asyncio.ensure_future(self.pull_if_missing(image))
+        return await self.images[image]
+
+    async def pull_if_missing(self, image):
+        image_id = await self.docker.image_id(image)
+        if image_id is None:
+            print('pulling ' + image + ' image, this may take a while...')
+            image_id = await self.docker.pull_image(image)
+            print('image pulled')
+        return image_id
+
+    async def run_container(self, tool, file, cfg, image, cmd, timeout):
+        # returns the files the output and the archive of the output files were saved to and the status of the
+        # analysis
+        staging = stage_files(cfg, [file])
+        binds = staging.binds()
+        entrypoint = [''] if image in NO_ENTRYPOINT_IMAGES else None
+
+        container_id = None
+        try:
+            container_id = await self.docker.create_container(self.pinned_images.get(image, image), shlex.split(cmd),
+                                                              binds=binds,
+                                                              entrypoint=entrypoint,
+                                                              labels={ENGINE_LABEL: self.output_folder},
+                                                              host_config=host_config(get_resource_limits(cfg)))
+            await self.docker.start_container(container_id)
+            status = STATUS_COMPLETED
+            try:
+                exit_code = await asyncio.wait_for(self.docker.wait_container(container_id), timeout=timeout)
+                if exit_code == KILLED_EXIT_CODE:
+                    state = (await self.docker.inspect_container(container_id)).get('State', {})
+                    if state.get('OOMKilled'):
+                        status = STATUS_OOM
+            except asyncio.TimeoutError:
+                status = STATUS_TIMEOUT
+            # the output is saved aside rather than held in memory, parse_job streams it to result.log
+            (fd, output_path) = tempfile.mkstemp(prefix='smartbugs-', suffix='.log')
+            try:
+                with os.fdopen(fd, 'wb') as output:
+                    await self.docker.container_logs(container_id, output)
+            except BaseException:
+                os.remove(output_path)
+                raise
+
+            archive_path = None
+            if 'output_in_files' in cfg:
+                (fd, archive_path) = tempfile.mkstemp(prefix='smartbugs-', suffix='.tar')
+                try:
+                    with os.fdopen(fd, 'wb') as archive:
+                        await self.docker.get_archive(container_id, cfg['output_in_files']['folder'], archive)
+                except DockerAPIException as err:
+                    os.remove(archive_path)
+                    archive_path = None
+                    print('\x1b[1;31m' + 'ERROR: could not get file from container. file not analysed.' + '\x1b[0m')
+                    print(err)
+                except BaseException:
+                    os.remove(archive_path)
+                    os.remove(output_path)
+                    raise
+            return output_path, archive_path, status
+        finally:
+            if container_id is not None:
+                try:
+                    await self.docker.remove_container(container_id)
+                except DockerAPIException as err:
+                    print(err)
+            staging.close()
+
+    async def analyse(self, executor, task):
+        (tool, file, import_path, output_version, warm_containers, result_cache, adaptive_timeout) = task
+        loop = asyncio.get_running_loop()
+        start = time()
+
+        (cfg_path, cfg, image, cmd, file_name, file_path_in_repo) = await loop.run_in_executor(
+            executor, prepare_job, tool, file, import_path)
+        results_folder = 'results/' + tool + '/' + self.output_folder
+        image_id = await self.resolve_image(image)
+
+        cache_key = None
+        if result_cache is not None:
+            cache_key = result_cache.key(file, cfg_path, image_id, cmd, file_path_in_repo, tool, output_version)
+            runs = await loop.run_in_executor(executor, restore_job, result_cache, cache_key, tool, file_name,
+                                              results_folder, output_version)
+            if runs is not None:
+                print(cmd + ' (cached)')
+                if self.journal is not None:
+                    self.journal.finished(tool, file, time() - start)
+                return tool, file, file_name, runs, time() - start
+
+        async with AsyncExitStack() as stack:
+            for semaphore in (self.semaphore('tool', tool, self.tool_limits.get(tool)),
+                              self.semaphore('image', image, self.image_limits.get(image)),
+                              self.semaphore('global', None, self.max_containers)):
+                if semaphore is not None:
+                    await stack.enter_async_context(semaphore)
+            print(cmd)
+            if self.journal is not None:
+                self.journal.started(tool, file)
+            start = time()
+            (output_path, archive_path, status) = await self.run_container(tool, file, cfg, image, cmd,
+                                                                           get_timeout(cfg, adaptive_timeout))
+            end = time()
+
+        runs = await loop.run_in_executor(executor, parse_job, output_path, archive_path, tool, file_name, cfg,
+                                          results_folder, start, end, file_path_in_repo, output_version, result_cache,
+                                          cache_key, status)
+        if self.journal is not None:
+            self.journal.finished(tool, file, end - start)
+        return tool, file, file_name, runs, end - start
+
+    async def analyse_or_report(self, executor, task):
+        try:
+            return await self.analyse(executor, task)
+        except (DockerAPIException, OSError) as err:
+            (tool, file) = task[:2]
+            print(err)
+            if self.journal is not None:
+                self.journal.failed(tool, file, err)
+            with open(self.log_path, 'a') as logs:
+                logs.write(file + ' [' + tool + ']: ' + str(err) + '\n')
+            return tool, file, os.path.splitext(os.path.basename(file))[0], [], 0
+
+    async def run(self, tasks, on_record):
+        # only a window of jobs is scheduled at a time, so memory does not grow with the size of the sweep
+        window = max(8 * self.max_containers, 1)
+        tasks = iter(tasks)
+        pending = set()
+        with ProcessPoolExecutor(max_workers=self.parse_processes, initializer=init_worker,
+                                 initargs=(self.log_path,)) as executor:
+            while True:
+                for task in tasks:
+                    pending.add(asyncio.ensure_future(self.analyse_or_report(executor, task)))
+                    if len(pending) >= window:
+                        break
+                if not pending:
+                    break
+                (done, pending) = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    on_record(future.result())
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import shlex
+import tarfile
+import tempfile
+import threading
+
+import docker
+
+POOL_LABEL = 'smartbugs.pool'
+KEEP_ALIVE_ENTRYPOINT = ['tail', '-f', '/dev/null']
+
+
+"""
+a long-lived tool container that runs one analysis job at a time through exec_run
+"""
+class WarmContainer:
+    def __init__(self, container, image, entrypoint, key=None):
+        self.container = container
+        self.image = image
+        # the pool slot of the container, its image and resource limits
+        self.key = key if key is not None else (image, ())
+        self.entrypoint = entrypoint
+        self.jobs = 0
+        self.broken = False
+        self.staged = []
+        # how the last job ended, read by the caller to tell timeouts and killed jobs from completed ones
+        self.exit_code = None
+        self.timed_out = False
+
+    def stage(self, file):
+        # copy a contract into /data/ of the container
+        data = io.BytesIO()
+        with tarfile.open(fileobj=data, mode='w') as tar:
+            tar.add(file, arcname='data/' + os.path.basename(file))
+        if not self.container.put_archive('/', data.getvalue()):
+            raise docker.errors.APIError('could not copy ' + file + ' into container ' + self.container.id)
+        self.staged.append('/data/' + os.path.basename(file))
+
+    def run(self, cmd, timeout=None):
+        # run the tool command and return the chunks of its output, the output produced so far when the timeout
+        # expires; the output is spooled to a file so that it is never held in memory
+        self.jobs += 1
+        self.exit_code = None
+        self.timed_out = False
+        spool = tempfile.TemporaryFile()
+        spool_lock = threading.Lock()
+        errors = []
+
+        def consume():
+            try:
+                api = self.container.client.api
+                exec_id = api.exec_create(self.container.id, self.entrypoint + shlex.split(cmd))['Id']
+                for chunk in api.exec_start(exec_id, stream=True):
+                    with spool_lock:
+                        if worker.abandoned:
+                            return
+                        spool.write(chunk)
+                self.exit_code = api.exec_inspect(exec_id).get('ExitCode')
+            except Exception as e:
+                errors.append(e)
+
+        worker = threading.Thread(target=consume, daemon=True)
+        worker.abandoned = False
+        worker.start()
+        worker.join(timeout)
+        with spool_lock:
+            # a job still running past its timeout stops writing its output from here
+            worker.abandoned = True
+        if worker.is_alive() or errors:
+            # the exec cannot be cancelled on its own, so the container has to go
+            self.timed_out = worker.is_alive()
+            self.broken = True
+        return spooled_chunks(spool)
+
+    def clean(self, paths):
+        # remove the staged contracts and the tool output files left by the last job
+        try:
+            result = self.container.exec_run(['rm', '-rf'] + self.staged + list(paths))
+            if result.exit_code not in (0, None):
+                self.broken = True
+        except docker.errors.APIError:
+            self.broken = True
+        self.staged = []
+
+    def destroy(self):
+        try:
+            self.container.remove(force=True)
+        except docker.errors.APIError:
+            pass
+
+
+"""
+chunks of the output spooled by a job, the spool is closed once they are read
+"""
+def spooled_chunks(spool, chunk_size=64 * 1024):
+    with spool:
+        spool.seek(0)
+        while True:
+            chunk = spool.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+"""
+keeps up to `size` idle warm containers per tool image and recycles them after `max_jobs` jobs or when they break
+"""
+class ContainerPool:
+    def __init__(self, client, size=1, max_jobs=100, label='default'):
+        self.client = client
+        self.size = size
+        self.max_jobs = max_jobs
+        self.label = label
+        # idle containers by image and resource limits
+        self.idle = {}
+        self.entrypoints = {}
+        self.lock = threading.Lock()
+
+    def image_entrypoint(self, image, no_entrypoint):
+        # the entrypoint `containers.run` would have used, since exec_run bypasses it
+        if no_entrypoint:
+            return []
+        if image not in self.entrypoints:
+            config = self.client.images.get(image).attrs.get('Config') or {}
+            entrypoint = config.get('Entrypoint') or []
+            if isinstance(entrypoint, str):
+                entrypoint = shlex.split(entrypoint)
+            self.entrypoints[image] = list(entrypoint)
+        return self.entrypoints[image]
+
+    def acquire(self, image, no_entrypoint=False, limits=None):
+        # limits are set when the container starts, so containers are only shared by jobs with the same limits
+        limits = limits or {}
+        key = (image, tuple(sorted(limits.items())))
+        with self.lock:
+            idle = self.idle.get(key, [])
+            if idle:
+                return idle.pop()
+        entrypoint = self.image_entrypoint(image, no_entrypoint)
+        container = self.client.containers.run(image,
+                                               detach=True,
+                                               entrypoint=KEEP_ALIVE_ENTRYPOINT,
+                                               labels={POOL_LABEL: self.label},
+                                               **limits)
+        return WarmContainer(container, image, entrypoint, key)
+
+    def release(self, warm, output_paths=()):
+        warm.clean(output_paths)
+        with self.lock:
+            idle = self.idle.setdefault(warm.key, [])
+            if not warm.broken and warm.jobs < self.max_jobs and len(idle) < self.size:
+                idle.append(warm)
+                return
+        warm.destroy()
+
+    def close(self):
+        with self.lock:
+            containers = [warm for idle in self.idle.values() for warm in idle]
+            self.idle = {}
+        for warm in containers:
+            warm.destroy()
+
+
+"""
+remove every warm container started with the given label, including those left by terminated workers
+"""
+def remove_pool_containers(client, label):
+    for container in client.containers.list(all=True, filters={'label': POOL_LABEL + '=' + label}):
+        try:
+            container.remove(force=True)
+        except docker.errors.APIError:
+            pass
@@ -3,49 +3,87 @@
 import docker
 import json
 import os
-import re
+import requests
 import sys
-import tarfile
-import yaml
 import tempfile
-from shutil import copyfile, rmtree
-
-from solidity_parser import parser
-
-from src.output_parser.Conkas import Conkas
-from src.output_parser.HoneyBadger import HoneyBadger
-from src.output_parser.Maian import Maian
-from src.output_parser.Manticore import Manticore
-from src.output_parser.Mythril import Mythril
-from src.output_parser.Osiris import Osiris
-from src.output_parser.Oyente import Oyente
-from src.output_parser.Securify import Securify
-from src.output_parser.Slither import Slither
-from src.output_parser.Smartcheck import Smartcheck
-from src.output_parser.Solhint import Solhint
-from src.output_parser.Mythril2 import Mythril2
-from src.output_parser.Slither2 import Slither2
-from src.output_parser.Manticore2 import Manticore2
-from src.output_parser.Securify2 import Securify2
+import yaml
+from shutil import copyfile, copyfileobj
+
+from src.docker_api.container_pool import POOL_LABEL, ContainerPool, spooled_chunks
+from src.docker_api.log_stream import LogStream, file_chunks
+from src.docker_api.staging import STAGING_MODES, STAGING_READ_ONLY, Staging
+from src.docker_api.tar_stream import extract_members
+from src.output_parser.SarifHolder import SarifHolder
+from src.output_parser.registry import get_parser
+from src.source_metadata.source_metadata import get_source_metadata
 from time import time
 
 
-client = docker.from_env()
+# the connection to the Docker daemon, made by the first function that needs it, see get_client
+client = None
+container_pool = None
+# image name -> id of the images resolved by the planning phase of the sweep, inherited by the worker processes
+pinned_images = {}
+
+# images whose entrypoint is replaced by the tool command
+NO_ENTRYPOINT_IMAGES = ["trailofbits/eth-security-toolbox", "mythril/myth", "securify"]
+
+# seconds an analysis may run when its tool configuration sets no timeout
+DEFAULT_TIMEOUT = 30 * 60
+# container limits a tool configuration may set, with the meaning of the docker run arguments of the same name
+RESOURCE_LIMITS = ['cpu_quota', 'nano_cpus', 'mem_limit', 'pids_limit']
+# exit code of a container killed by SIGKILL, the signal the kernel OOM killer sends
+KILLED_EXIT_CODE = 137
+
+STATUS_COMPLETED = 'completed'
+STATUS_TIMEOUT = 'timeout'
+STATUS_OOM = 'oom'
+
+# labels of the containers of a sweep, set to its output folder: one-shot, asyncio engine and warm containers
+SWEEP_LABEL = 'smartbugs.sweep'
+ENGINE_LABEL = 'smartbugs.engine'
+SWEEP_LABELS = [SWEEP_LABEL, ENGINE_LABEL, POOL_LABEL]
+
+
+"""
+get the client of the Docker daemon, connected on first use
+"""
+def get_client():
+    global client
+    if client is None:
+        client = docker.from_env()
+    return client
+
+
+"""
+get the warm container pool of this process
+"""
+def get_container_pool(warm_containers, label):
+    global container_pool
+    if container_pool is None:
+        (size, max_jobs) = warm_containers
+        container_pool = ContainerPool(get_client(), size=size, max_jobs=max_jobs, label=label)
+    return container_pool
+
+
+"""
+remove the warm containers of this process, for the processes that outlive their jobs
+"""
+def close_container_pool():
+    global container_pool
+    if container_pool is not None:
+        container_pool.close()
+        container_pool = None
 
 """
 get solidity compiler version
 """
 def get_solc_version(file, logs):
-    try:
-        with open(file, 'r', encoding='utf-8') as fd:
-            sourceUnit = parser.parse(fd.read())
-            solc_version = sourceUnit['children'][0]['value']
-            solc_version = solc_version.strip('^')
-            solc_version = solc_version.split('.')
-            return (int(solc_version[1]), int(solc_version[2]))
-    except:
-        print('\x1b[1;33m' + 'WARNING: could not parse solidity file to get solc version' + '\x1b[0m')
-        logs.write('WARNING: could not parse solidity file to get solc version \n')
+    solc_version = get_source_metadata(file)['solc_version']
+    if solc_version is not None:
+        return tuple(solc_version)
+    print('\x1b[1;33m' + 'WARNING: could not parse solidity file to get solc version' + '\x1b[0m')
+    logs.write('WARNING: could not parse solidity file to get solc version \n')
     return (None, None)
 
 
@@ -56,7 +94,7 @@ def pull_image(image, logs):
     try:
         print('pulling ' + image + ' image, this may take a while...')
         logs.write('pulling ' + image + ' image, this may take a while...\n')
-        image = client.images.pull(image)
+        image = get_client().images.pull(image)
         print('image pulled')
         logs.write('image pulled\n')
 
@@ -65,18 +103,6 @@ def pull_image(image, logs):
         logs.write(err + '\n')
 
 
-"""
-mount volumes
-"""
-def mount_volumes(dir_path, logs):
-    try:
-        volume_bindings = {os.path.abspath(dir_path): {'bind': '/data', 'mode': 'rw'}}
-        return volume_bindings
-    except os.error as err:
-        print(err)
-        logs.write(err + '\n')
-
-
 """
 stop container
 """
@@ -89,6 +115,21 @@ def stop_container(container, logs):
         logs.write(str(err) + '\n')
 
 
+"""
+remove the containers left by a sweep, such as those of a crashed run
+"""
+def remove_sweep_containers(sweep, logs):
+    removed = 0
+    for label in SWEEP_LABELS:
+        for container in get_client().containers.list(all=True, filters={'label': label + '=' + sweep}):
+            try:
+                container.remove(force=True)
+                removed += 1
+            except docker.errors.APIError as err:
+                logs.write(str(err) + '\n')
+    return removed
+
+
 """
 remove container
 """
@@ -102,10 +143,10 @@ def remove_container(container, logs):
 
 
 """
-write output
+write output, streamed from the chunks of the tool output to result.log and to the parser
 """
-def parse_results(output, tool, file_name, container, cfg, logs, results_folder, start, end, sarif_outputs,
-                  file_path_in_repo, output_version):
+def parse_results(log_chunks, tool, file_name, container, cfg, logs, results_folder, start, end, sarif_outputs,
+                  file_path_in_repo, output_version, status=STATUS_COMPLETED):
     output_folder = os.path.join(results_folder, file_name)
 
     results = {
@@ -114,249 +155,670 @@ def parse_results(output, tool, file_name, container, cfg, logs, results_folder,
         'start': start,
         'end': end,
         'duration': end - start,
+        'status': status,
         'analysis': None
     }
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
-    with open(os.path.join(output_folder, 'result.log'), 'w', encoding='utf-8') as f:
-        f.write(output)
+    output = LogStream(log_chunks, os.path.join(output_folder, 'result.log'))
+    parser = get_parser(tool)
 
+    archive = None
     if 'output_in_files' in cfg:
         try:
-            with open(os.path.join(output_folder, 'result.tar'), 'wb') as f:
-                output_in_file = cfg['output_in_files']['folder']
-                bits, stat = container.get_archive(output_in_file)
-                for chunk in bits:
-                    f.write(chunk)
+            output_in_file = cfg['output_in_files']['folder']
+            bits, stat = container.get_archive(output_in_file)
+            # only the members the tool reads are extracted from the stream, result.tar is only written on request
+            archive_path = None
+            if cfg['output_in_files'].get('keep_archive'):
+                archive_path = os.path.join(output_folder, 'result.tar')
+            members = cfg['output_in_files'].get('members', parser.members if parser is not None else None)
+            archive = extract_members(bits, members or None, archive_path)
         except Exception as e:
-            print(output)
             print(e)
             print('\x1b[1;31m' + 'ERROR: could not get file from container. file not analysed.' + '\x1b[0m')
             logs.write('ERROR: could not get file from container. file not analysed.\n')
 
+    runs = []
+    if status != STATUS_COMPLETED:
+        # the output of an analysis that was cut short is kept in result.log, but not reported as findings
+        output.drain()
+        print('\x1b[1;31m' + 'ERROR: ' + tool + ' did not complete on ' + file_name + ' (' + status + ')' + '\x1b[0m')
+        logs.write('ERROR: ' + tool + ' did not complete on ' + file_name + ' (' + status + ')\n')
+        write_results(results, tool, file_name, output_folder, sarif_outputs, output_version)
+        return results, runs
+
     try:
         sarif_holder = sarif_outputs[file_name]
-        if tool == 'oyente':
-            results['analysis'] = Oyente().parse(output)
-            # Sarif Conversion
-            sarif_holder.addRun(Oyente().parseSarif(results, file_path_in_repo))
-        elif tool == 'osiris':
-            results['analysis'] = Osiris().parse(output)
-            sarif_holder.addRun(Osiris().parseSarif(results, file_path_in_repo))
-        elif tool == 'honeybadger':
-            results['analysis'] = HoneyBadger().parse(output)
-            sarif_holder.addRun(HoneyBadger().parseSarif(results, file_path_in_repo))
-        elif tool == 'smartcheck':
-            results['analysis'] = Smartcheck().parse(output)
-            sarif_holder.addRun(Smartcheck().parseSarif(results, file_path_in_repo))
-        elif tool == 'solhint':
-            results['analysis'] = Solhint().parse(output)
-            sarif_holder.addRun(Solhint().parseSarif(results, file_path_in_repo))
-        elif tool == 'maian':
-            results['analysis'] = Maian().parse(output)
-            sarif_holder.addRun(Maian().parseSarif(results, file_path_in_repo))
-        elif tool == 'mythril':
-            results['analysis'] = json.loads(output)
-            sarif_holder.addRun(Mythril().parseSarif(results, file_path_in_repo))
-        elif tool == 'mythril2':
-            results['analysis'] = json.loads(output)
-            sarif_holder.addRun(Mythril2().parseSarif(results,file_path_in_repo))
-        elif tool == 'securify':
-            if len(output) > 0 and output[0] == '{':
-                results['analysis'] = json.loads(output)
-            elif os.path.exists(os.path.join(output_folder, 'result.tar')):
-                tar = tarfile.open(os.path.join(output_folder, 'result.tar'))
-                try:
-                    output_file = tar.extractfile('results/results.json')
-                    results['analysis'] = json.loads(output_file.read())
-                    sarif_holder.addRun(Securify().parseSarif(results, file_path_in_repo))
-                except Exception as e:
-                    print('pas terrible')
-                    output_file = tar.extractfile('results/live.json')
-                    results['analysis'] = {
-                        file_name: {
-                            'results': json.loads(output_file.read())["patternResults"]
-                        }
-                    }
-                    sarif_holder.addRun(Securify().parseSarifFromLiveJson(results, file_path_in_repo))
-        elif tool == 'securify2':
-            if len(output) > 0 and output[0] == '{':
-                results['analysis'] = json.loads(output)
-            elif os.path.exists(os.path.join(output_folder, 'result.tar')):
-                tar = tarfile.open(os.path.join(output_folder, 'result.tar'))
-                try:
-                    output_file = tar.extractfile('results/results.json')
-                    results['analysis'] = json.loads(output_file.read())
-                    sarif_holder.addRun(Securify2().parseSarif(results, file_path_in_repo))
-                except Exception as e:
-                    print('pas terrible')
-                    output_file = tar.extractfile('results/live.json')
-                    results['analysis'] = {
-                        file_name: {
-                            'results': json.loads(output_file.read())["patternResults"]
-                        }
-                    }
-                    sarif_holder.addRun(Securify2().parseSarifFromLiveJson(results, file_path_in_repo))
-        elif tool == 'slither':
-            if os.path.exists(os.path.join(output_folder, 'result.tar')):
-                tar = tarfile.open(os.path.join(output_folder, 'result.tar'))
-                output_file = tar.extractfile('output.json')
-                results['analysis'] = json.loads(output_file.read())
-                sarif_holder.addRun(Slither().parseSarif(results, file_path_in_repo))
-        elif tool == 'slither2':
-            if os.path.exists(os.path.join(output_folder, 'result.tar')):
-                tar = tarfile.open(os.path.join(output_folder, 'result.tar'))
-                output_file = tar.extractfile('output.json')
-                results['analysis'] = json.loads(output_file.read())
-                sarif_holder.addRun(Slither2().parseSarif(results, file_path_in_repo))
-        elif tool == 'manticore':
-            if os.path.exists(os.path.join(output_folder, 'result.tar')):
-                tar = tarfile.open(os.path.join(output_folder, 'result.tar'))
-                m = re.findall('Results in /(mcore_.+)', output)
-                results['analysis'] = []
-                for fout in m:
-                    output_file = tar.extractfile('results/' + fout + '/global.findings')
-                    results['analysis'].append(Manticore().parse(output_file.read().decode('utf8')))
-                sarif_holder.addRun(Manticore().parseSarif(results, file_path_in_repo))
-        elif tool == 'manticore2':
-            if os.path.exists(os.path.join(output_folder, 'result.tar')):
-                tar = tarfile.open(os.path.join(output_folder, 'result.tar'))
-                m = re.findall('Results in /(mcore_.+)', output)
-                results['analysis'] = []
-                for fout in m:
-                    output_file = tar.extractfile('results/' + fout + '/global.findings')
-                    results['analysis'].append(Manticore2().parse(output_file.read().decode('utf8')))
-                sarif_holder.addRun(Manticore2().parseSarif(results, file_path_in_repo))
-        elif tool == 'conkas':
-            results['analysis'] = Conkas().parse(output)
-            sarif_holder.addRun(Conkas().parseSarif(results, file_path_in_repo))
-
+        # the parser sets the analysis and builds its run in one pass over the output
+        if parser is not None:
+            run = parser.parse_output(output, archive, results, file_path_in_repo)
+            if run is not None:
+                runs.append(run)
+                sarif_holder.addRun(run)
         sarif_outputs[file_name] = sarif_holder
 
     except Exception as e:
         # ignore
         pass
+    finally:
+        output.drain()
+    check_solc_errors(output, logs)
+
+    write_results(results, tool, file_name, output_folder, sarif_outputs, output_version)
 
+    return results, runs
+
+
+"""
+write the result files of an output version
+"""
+def write_results(results, tool, file_name, output_folder, sarif_outputs, output_version):
     if output_version == 'v1' or output_version == 'all':
         with open(os.path.join(output_folder, 'result.json'), 'w') as f:
             json.dump(results, f, indent=2)
 
     if output_version == 'v2' or output_version == 'all':
         with open(os.path.join(output_folder, 'result.sarif'), 'w') as sarifFile:
-            json.dump(sarif_outputs[file_name].printToolRun(tool=tool), sarifFile, indent=2)
+            sarif_outputs[file_name].writeToolRun(tool, sarifFile)
+
+
+"""
+write the results of a cached analysis as if the tool had just run
+"""
+def restore_results(cached, tool, file_name, results_folder, sarif_outputs, output_version):
+    (log_path, results, runs) = cached
+    output_folder = os.path.join(results_folder, file_name)
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    copyfile(log_path, os.path.join(output_folder, 'result.log'))
+
+    sarif_holder = sarif_outputs[file_name]
+    for run in runs:
+        sarif_holder.addRun(run)
+    sarif_outputs[file_name] = sarif_holder
 
+    write_results(results, tool, file_name, output_folder, sarif_outputs, output_version)
 
 
 """
-analyse solidity files
+archive of a finished container, already downloaded to a temporary file, handed to parse_results in place of the
+container
 """
-def analyse_files(tool, file, logs, now, sarif_outputs, output_version, import_path):
+class SpooledArchive:
+    def __init__(self, path):
+        self.path = path
+
+    def get_archive(self, path):
+        if self.path is None:
+            raise FileNotFoundError(path)
+        return file_chunks(self.path), None
+
+
+"""
+path of a new temporary file holding chunks
+"""
+def spool_chunks(chunks, suffix):
+    (fd, path) = tempfile.mkstemp(prefix='smartbugs-', suffix=suffix)
     try:
-        cfg_path = os.path.abspath('config/tools/' + tool + '.yaml')
-        with open(cfg_path, 'r', encoding='utf-8') as ymlfile:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+"""
+analysis of a file by a tool, with what its results are written from once its container is done. the output is
+either parsed as it is read from the container, or collected to be parsed by another process: the output and the
+archive of the output files are then saved to temporary files, so that only their paths go to the other process
+"""
+class Analysis:
+    def __init__(self, tool, file_name, cfg, results_folder, start, file_path_in_repo, output_version,
+                 cache_key=None):
+        self.tool = tool
+        self.file_name = file_name
+        self.cfg = cfg
+        self.results_folder = results_folder
+        self.start = start
+        self.file_path_in_repo = file_path_in_repo
+        self.output_version = output_version
+        self.cache_key = cache_key
+        # set once the output is collected
+        self.end = None
+        self.status = None
+        self.output_path = None
+        self.archive_path = None
+
+    def parse(self, log_chunks, container, logs, sarif_outputs, status, end):
+        return parse_results(log_chunks, self.tool, self.file_name, container, self.cfg, logs, self.results_folder,
+                             self.start, end, sarif_outputs, self.file_path_in_repo, self.output_version, status)
+
+    def collect(self, log_chunks, container, logs, status, end):
+        # keeps the output and the output files of the container, which can be removed afterwards
+        self.status = status
+        self.end = end
+        self.output_path = spool_chunks(log_chunks, '.log')
+        if 'output_in_files' in self.cfg:
             try:
-                cfg = yaml.safe_load(ymlfile)
-            except yaml.YAMLError as exc:
-                print(exc)
-                logs.write(exc)
+                (bits, stat) = container.get_archive(self.cfg['output_in_files']['folder'])
+                self.archive_path = spool_chunks(bits, '.tar')
+            except Exception as e:
+                # parse_results reports the missing output files
+                print(e)
+        return self
 
-        # create result folder with time
-        results_folder = 'results/' + tool + '/' + now
-        if not os.path.exists(results_folder):
-            os.makedirs(results_folder)
-        # os.makedirs(os.path.dirname(results_folder), exist_ok=True)
+    def parse_collected(self, logs, result_cache=None):
+        # writes the results of the collected output and returns its SARIF runs
+        sarif_outputs = {self.file_name: SarifHolder()}
+        try:
+            (results, runs) = parse_results(file_chunks(self.output_path), self.tool, self.file_name,
+                                            SpooledArchive(self.archive_path), self.cfg, logs, self.results_folder,
+                                            self.start, self.end, sarif_outputs, self.file_path_in_repo,
+                                            self.output_version, self.status)
+        finally:
+            os.remove(self.output_path)
+            if self.archive_path is not None:
+                os.remove(self.archive_path)
+        self.store(result_cache, results, runs)
+        return runs
 
-        # check if config file as all required fields
-        if 'default' not in cfg['docker_image'] or cfg['docker_image'] == None:
-            logs.write(tool + ': default docker image not provided. please check you config file.\n')
-            sys.exit(tool + ': default docker image not provided. please check you config file.')
-        elif 'cmd' not in cfg or cfg['cmd'] == None:
-            logs.write(tool + ': commands not provided. please check you config file.\n')
-            sys.exit(tool + ': commands not provided. please check you config file.')
-
-        if import_path == "FILE":
-            import_path = file
-            file_path_in_repo = file
-        else:
-            file_path_in_repo = file.replace(import_path, '')  # file path relative to project's root directory
+    def store(self, result_cache, results, runs):
+        # timed out and killed analyses are not cached, they may complete with other limits
+        if result_cache is not None and self.cache_key is not None and results['analysis'] is not None \
+                and results['status'] == STATUS_COMPLETED:
+            result_cache.store(self.cache_key, os.path.join(self.results_folder, self.file_name, 'result.log'),
+                               results, runs)
 
-        file_name = os.path.basename(file)
-        file_name = os.path.splitext(file_name)[0]
 
-        working_dir = tempfile.mkdtemp()
-        copyfile(file, os.path.join(working_dir, os.path.basename(file)))
-        file = os.path.join(working_dir, os.path.basename(file))
+"""
+load and check the configuration of a tool
+"""
+def load_tool_config(tool, logs):
+    cfg_path = os.path.abspath('config/tools/' + tool + '.yaml')
+    with open(cfg_path, 'r', encoding='utf-8') as ymlfile:
+        try:
+            cfg = yaml.safe_load(ymlfile)
+        except yaml.YAMLError as exc:
+            print(exc)
+            logs.write(exc)
+
+    # check if config file as all required fields
+    if 'default' not in cfg['docker_image'] or cfg['docker_image'] == None:
+        logs.write(tool + ': default docker image not provided. please check you config file.\n')
+        sys.exit(tool + ': default docker image not provided. please check you config file.')
+    elif 'cmd' not in cfg or cfg['cmd'] == None:
+        logs.write(tool + ': commands not provided. please check you config file.\n')
+        sys.exit(tool + ': commands not provided. please check you config file.')
+    elif cfg.get('staging', STAGING_READ_ONLY) not in STAGING_MODES:
+        logs.write(tool + ': unknown staging ' + str(cfg['staging']) + '. please check you config file.\n')
+        sys.exit(tool + ': unknown staging ' + str(cfg['staging']) + '. please check you config file.')
+    return cfg_path, cfg
 
-        # bind directory path instead of file path to allow imports in the same directory
-        volume_bindings = mount_volumes(working_dir, logs)
 
-        start = time()
+"""
+docker run arguments for the resource limits set in the configuration of a tool
+"""
+def get_resource_limits(cfg):
+    return {limit: cfg[limit] for limit in RESOURCE_LIMITS if cfg.get(limit) is not None}
 
-        (solc_version, solc_version_minor) = get_solc_version(file, logs)
 
-        if isinstance(solc_version, int) and solc_version < 5 and 'solc<5' in cfg['docker_image']:
-            image = cfg['docker_image']['solc<5']
-        # if there's no version or version >5, choose default
-        else:
-            image = cfg['docker_image']['default']
+"""
+seconds an analysis of a tool may run, an adaptive timeout never exceeds the configured one
+"""
+def get_timeout(cfg, adaptive_timeout=None):
+    timeout = cfg.get('timeout', DEFAULT_TIMEOUT)
+    if adaptive_timeout is not None:
+        return min(timeout, adaptive_timeout)
+    return timeout
 
-        if not client.images.list(image):
-            pull_image(image, logs)
 
-        cmd = cfg['cmd']
-        if '{contract}' in cmd:
-            cmd = cmd.replace('{contract}', '/data/' + os.path.basename(file))
-        else:
-            cmd += ' /data/' + os.path.basename(file)
-
-        if '{version}' in cmd:
-            with open(file) as f:
-                file_data = f.read()
-                pattern = re.compile(r'pragma solidity (>=)?(.?[0-9]+)+', re.I)
-                a=pattern.search(file_data)
-                b=str(a.group())
-                c=re.search(r'([0-9]+.?)+',b)
-                c=c.group()
-                cmd = cmd.replace('{version}' ,c)
-        
-        print(cmd)
-        container = None
-        img = ["trailofbits/eth-security-toolbox","mythril/myth","securify"]
+"""
+exit code of a container once it stops and whether it was still running after timeout seconds. only the timeout of
+the wait is taken for a timeout, other errors of the daemon are raised
+"""
+def wait_container(container, timeout):
+    try:
+        return container.wait(timeout=timeout).get('StatusCode'), False
+    except (requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError):
+        return None, True
+
+
+"""
+status of an analysis from the exit code of its container, killed containers are inspected for the OOM killer
+"""
+def get_status(container, exit_code, timed_out):
+    if timed_out:
+        return STATUS_TIMEOUT
+    if exit_code == KILLED_EXIT_CODE:
         try:
-            if image in img:
-                container = client.containers.run(image,
-                                              cmd,
-                                              detach=True,
-                                              # cpu_quota=150000,
-                                              volumes=volume_bindings,
-                                              entrypoint="")
-            else:                                  
-                container = client.containers.run(image,
+            container.reload()
+            if container.attrs.get('State', {}).get('OOMKilled'):
+                return STATUS_OOM
+        except docker.errors.APIError:
+            pass
+    return STATUS_COMPLETED
+
+
+"""
+file path relative to project's root directory
+"""
+def get_file_path_in_repo(file, import_path):
+    if import_path == "FILE":
+        return file
+    return file.replace(import_path, '')
+
+
+"""
+choose the docker image of a tool for a solc major version
+"""
+def image_for_version(cfg, solc_version):
+    if isinstance(solc_version, int) and solc_version < 5 and 'solc<5' in cfg['docker_image']:
+        return cfg['docker_image']['solc<5']
+    # if there's no version or version >5, choose default
+    return cfg['docker_image']['default']
+
+
+"""
+choose the docker image for a file according to its solc version
+"""
+def select_image(cfg, file, logs):
+    (solc_version, solc_version_minor) = get_solc_version(file, logs)
+    return image_for_version(cfg, solc_version)
+
+
+"""
+pin the images of a sweep to the ids resolved before it starts, see image_plan
+"""
+def pin_images(images):
+    pinned_images.clear()
+    pinned_images.update(images)
+
+
+"""
+reference a container of an image is created from: its pinned id, or its name when it was not planned
+"""
+def pinned_image(image):
+    return pinned_images.get(image, image)
+
+
+"""
+choose the docker image for a file and pull it if needed, pinned images are known to be there
+"""
+def get_image(cfg, file, logs):
+    image = select_image(cfg, file, logs)
+
+    if image not in pinned_images and not get_client().images.list(image):
+        pull_image(image, logs)
+    return image
+
+
+"""
+id of an image, as part of the result cache key
+"""
+def get_image_id(image):
+    if image in pinned_images:
+        return pinned_images[image]
+    return get_client().images.get(image).id
+
+
+"""
+build the tool command for a file mounted in /data
+"""
+def get_cmd(cfg, file):
+    cmd = cfg['cmd']
+    if '{contract}' in cmd:
+        cmd = cmd.replace('{contract}', '/data/' + os.path.basename(file))
+    else:
+        cmd += ' /data/' + os.path.basename(file)
+
+    if '{version}' in cmd:
+        version = get_source_metadata(file)['cmd_version']
+        if version is not None:
+            cmd = cmd.replace('{version}', version)
+    return cmd
+
+
+"""
+mount the contracts of a job in /data of its container as its tool needs them
+"""
+def stage_files(cfg, files):
+    return Staging(files, cfg.get('staging', STAGING_READ_ONLY))
+
+
+"""
+largest number of files a tool analyses in one container, 1 for the tools without a batch configuration or whose
+output cannot be split back per file (output files, a command depending on the solc version of each file)
+"""
+def get_batch_size(cfg):
+    batch = cfg.get('batch')
+    if not batch or 'output_in_files' in cfg or '{version}' in cfg['cmd']:
+        return 1
+    return max(1, int(batch.get('max_size', 1)))
+
+
+"""
+build the tool command for files mounted together in /data: the list of files, or /data for tools analysing a
+directory
+"""
+def get_batch_cmd(cfg, files):
+    if cfg['batch'].get('input') == 'directory':
+        contracts = '/data'
+    else:
+        contracts = ' '.join('/data/' + os.path.basename(file) for file in files)
+    cmd = cfg['cmd']
+    if '{contract}' in cmd:
+        return cmd.replace('{contract}', contracts)
+    return cmd + ' ' + contracts
+
+
+"""
+split the output of a batch into the output of each file: with `split: prefix` each line starts with the path of its
+file, with `split: header` the path of a file on its own line starts the output of that file. lines before the first
+file belong to every file. after it, lines without a path belong to the file before them with `split: header`, and
+are dropped with `split: prefix`, where they sum up the whole batch (e.g. the problem count of solhint) rather than
+one file. the output is read a chunk at a time and the output of each file spooled to a temporary file, returns the
+spool of each file
+"""
+def split_batch_output(cfg, chunks, files):
+    paths = {'/data/' + os.path.basename(file): file for file in files}
+    header = cfg['batch'].get('split') == 'header'
+    preamble = tempfile.TemporaryFile()
+    spools = {file: None for file in files}
+    current = None
+    try:
+        for line in batch_lines(chunks):
+            text = line.decode('utf8', errors='replace').strip()
+            path = text if header else text.split(':', 1)[0]
+            if path in paths:
+                current = paths[path]
+            elif current is not None and not header:
+                continue
+            if current is None:
+                preamble.write(line)
+                continue
+            if spools[current] is None:
+                spools[current] = copy_spool(preamble)
+            spools[current].write(line)
+        for (file, spool) in spools.items():
+            if spool is None:
+                spools[file] = copy_spool(preamble)
+    except BaseException:
+        for spool in spools.values():
+            if spool is not None:
+                spool.close()
+        raise
+    finally:
+        preamble.close()
+    return spools
+
+
+"""
+lines of an output streamed in chunks, with their line breaks; a line is only held in memory until it is complete
+"""
+def batch_lines(chunks):
+    pending = b''
+    for chunk in chunks:
+        lines = (pending + chunk).splitlines(keepends=True)
+        # a line is complete once it ends with a line break, a \r may be the first half of \r\n
+        pending = lines.pop() if lines and not lines[-1].endswith(b'\n') else b''
+        yield from lines
+    if pending:
+        yield pending
+
+
+"""
+new spool holding what was written to spool so far
+"""
+def copy_spool(spool):
+    copy = tempfile.TemporaryFile()
+    spool.seek(0)
+    copyfileobj(spool, copy)
+    spool.seek(0, os.SEEK_END)
+    return copy
+
+
+"""
+report solc failures found in the tool output
+"""
+def check_solc_errors(output, logs):
+    if output.solc_error:
+        print(
+            '\x1b[1;31m' + 'ERROR: Solc experienced a fatal error. Check the results file for more info' + '\x1b[0m')
+        logs.write('ERROR: Solc experienced a fatal error. Check the results file for more info\n')
+
+
+"""
+analyse a solidity file in a new container, its output and container are handed to consume once it is done
+"""
+def analyse_file_in_container(file, cfg, logs, now, image, cmd, timeout, consume):
+    # the contract is mounted rather than copied, a copy is only made for the tools that change their input
+    staging = stage_files(cfg, [file])
+    volume_bindings = staging.volumes()
+
+    container = None
+    try:
+        if image in NO_ENTRYPOINT_IMAGES:
+            container = get_client().containers.run(pinned_image(image),
+                                                    cmd,
+                                                    detach=True,
+                                                    volumes=volume_bindings,
+                                                    entrypoint="",
+                                                    labels={SWEEP_LABEL: now},
+                                                    **get_resource_limits(cfg))
+        else:
+            container = get_client().containers.run(pinned_image(image),
+                                                    cmd,
+                                                    detach=True,
+                                                    volumes=volume_bindings,
+                                                    labels={SWEEP_LABEL: now},
+                                                    **get_resource_limits(cfg)
+                                                    )
+        (exit_code, timed_out) = wait_container(container, timeout)
+        if timed_out:
+            stop_container(container, logs)
+        status = get_status(container, exit_code, timed_out)
+
+        end = time()
+
+        return consume(container.logs(stream=True), container, status, end)
+    finally:
+        stop_container(container, logs)
+        remove_container(container, logs)
+        staging.close()
+
+
+"""
+analyse a solidity file in a warm container of the pool, its output and container are handed to consume once it is
+done
+"""
+def analyse_file_in_warm_container(file, cfg, logs, now, warm_containers, image, cmd, timeout, consume):
+    pool = get_container_pool(warm_containers, now)
+
+    warm = pool.acquire(pinned_image(image), no_entrypoint=image in NO_ENTRYPOINT_IMAGES,
+                        limits=get_resource_limits(cfg))
+    try:
+        warm.stage(file)
+        log_chunks = warm.run(cmd, timeout=timeout)
+
+        end = time()
+
+        status = get_status(warm.container, warm.exit_code, warm.timed_out)
+        if status == STATUS_OOM:
+            # the OOM flag stays on the container, so it is not reused
+            warm.broken = True
+        return consume(log_chunks, warm.container, status, end)
+    except Exception:
+        warm.broken = True
+        raise
+    finally:
+        output_paths = [cfg['output_in_files']['folder']] if 'output_in_files' in cfg else []
+        pool.release(warm, output_paths)
+
+
+"""
+analyse solidity files of a tool in one new container, returns the output of each file and the status of the batch
+"""
+def analyse_batch_in_container(cfg, files, logs, now, image, cmd, timeout):
+    staging = stage_files(cfg, files)
+    volume_bindings = staging.volumes()
+
+    entrypoint = {'entrypoint': ""} if image in NO_ENTRYPOINT_IMAGES else {}
+
+    container = None
+    try:
+        container = get_client().containers.run(pinned_image(image),
                                                 cmd,
                                                 detach=True,
-                                                # cpu_quota=150000,
-                                                volumes=volume_bindings
-                                                )
+                                                volumes=volume_bindings,
+                                                labels={SWEEP_LABEL: now},
+                                                **entrypoint,
+                                                **get_resource_limits(cfg))
+        (exit_code, timed_out) = wait_container(container, timeout)
+        if timed_out:
+            stop_container(container, logs)
+        status = get_status(container, exit_code, timed_out)
+
+        return split_batch_output(cfg, container.logs(stream=True), files), status
+    finally:
+        stop_container(container, logs)
+        remove_container(container, logs)
+        staging.close()
+
+
+"""
+analyse solidity files of a tool that need the same image in one container, each file getting the result folder,
+SARIF runs and cache entry of a file analysed alone. the duration of the batch is shared between its files, returns
+the SARIF runs of each file. with collect, the outputs are not parsed here: returns the SARIF runs of the cached files
+and the collected Analysis of the others
+"""
+def analyse_batch(tool, files, logs, now, sarif_outputs, output_version, import_path, result_cache=None,
+                  adaptive_timeout=None, collect=False):
+    runs = {}
+    analyses = {}
+    try:
+        (cfg_path, cfg) = load_tool_config(tool, logs)
+
+        results_folder = 'results/' + tool + '/' + now
+        if not os.path.exists(results_folder):
+            os.makedirs(results_folder)
+
+        start = time()
+        image = get_image(cfg, files[0], logs)
+
+        pending = []
+        cache_keys = {}
+        for file in files:
+            file_name = os.path.splitext(os.path.basename(file))[0]
+            if result_cache is not None:
+                # the key of a file analysed alone, so that batched and single analyses share their results
+                cache_keys[file] = result_cache.key(file, cfg_path, get_image_id(image), get_cmd(cfg, file),
+                                                    get_file_path_in_repo(file, import_path), tool, output_version)
+                cached = result_cache.load(cache_keys[file])
+                if cached is not None:
+                    print(get_cmd(cfg, file) + ' (cached)')
+                    restore_results(cached, tool, file_name, results_folder, sarif_outputs, output_version)
+                    runs[file] = cached[2]
+                    continue
+            pending.append(file)
+        if pending:
+            cmd = get_batch_cmd(cfg, pending)
+            print(cmd)
+            # the batch may run as long as its analyses would have run one after the other
+            timeout = get_timeout(cfg, adaptive_timeout) * len(pending)
+            (outputs, status) = analyse_batch_in_container(cfg, pending, logs, now, image, cmd, timeout)
+            share = (time() - start) / len(pending)
+
             try:
-                container.wait(timeout=(30 * 60))
-            except Exception as e:
-                pass
-            output = container.logs().decode('utf8').strip()
-            if (output.count('Solc experienced a fatal error') >= 1 or output.count('compilation failed') >= 1):
-                print(
-                    '\x1b[1;31m' + 'ERROR: Solc experienced a fatal error. Check the results file for more info' + '\x1b[0m')
-                logs.write('ERROR: Solc experienced a fatal error. Check the results file for more info\n')
+                for file in pending:
+                    file_name = os.path.splitext(os.path.basename(file))[0]
+                    analysis = Analysis(tool, file_name, cfg, results_folder, start,
+                                        get_file_path_in_repo(file, import_path), output_version, cache_keys.get(file))
+                    if collect:
+                        analyses[file] = analysis.collect(spooled_chunks(outputs.pop(file)), None, logs, status,
+                                                          start + share)
+                        continue
+                    (results, runs[file]) = analysis.parse(spooled_chunks(outputs.pop(file)), None, logs,
+                                                           sarif_outputs, status, start + share)
+                    analysis.store(result_cache, results, runs[file])
+            finally:
+                # the spools of the files not reached when an error stops the batch
+                for spool in outputs.values():
+                    spool.close()
 
-            end = time()
+    except (docker.errors.APIError, docker.errors.ContainerError, docker.errors.ImageNotFound) as err:
+        print(err)
+        logs.write(str(err) + '\n')
+    if collect:
+        return runs, analyses
+    return runs
 
-            parse_results(output, tool, file_name, container, cfg, logs, results_folder, start, end, sarif_outputs,
-                          file_path_in_repo, output_version)
-        finally:
-            stop_container(container, logs)
-            remove_container(container, logs)
-            rmtree(working_dir)
+
+"""
+analyse solidity files, returns the SARIF runs produced for the file. with collect, the output is not parsed here:
+returns the SARIF runs of a cached result and the collected Analysis to parse, None when there is none
+"""
+def analyse_files(tool, file, logs, now, sarif_outputs, output_version, import_path, warm_containers=None,
+                  result_cache=None, adaptive_timeout=None, collect=False):
+    runs = []
+    analysis = None
+    try:
+        (cfg_path, cfg) = load_tool_config(tool, logs)
+
+        # create result folder with time
+        results_folder = 'results/' + tool + '/' + now
+        if not os.path.exists(results_folder):
+            os.makedirs(results_folder)
+        # os.makedirs(os.path.dirname(results_folder), exist_ok=True)
+
+        file_path_in_repo = get_file_path_in_repo(file, import_path)
+
+        file_name = os.path.basename(file)
+        file_name = os.path.splitext(file_name)[0]
+
+        start = time()
+
+        image = get_image(cfg, file, logs)
+        cmd = get_cmd(cfg, file)
+        timeout = get_timeout(cfg, adaptive_timeout)
+
+        cache_key = None
+        cached = None
+        if result_cache is not None:
+            cache_key = result_cache.key(file, cfg_path, get_image_id(image), cmd, file_path_in_repo, tool,
+                                         output_version)
+            cached = result_cache.load(cache_key)
+        if cached is not None:
+            print(cmd + ' (cached)')
+            restore_results(cached, tool, file_name, results_folder, sarif_outputs, output_version)
+            runs = cached[2]
+        else:
+            print(cmd)
+            analysis = Analysis(tool, file_name, cfg, results_folder, start, file_path_in_repo, output_version,
+                                cache_key)
+
+            def consume(log_chunks, container, status, end):
+                if collect:
+                    return analysis.collect(log_chunks, container, logs, status, end)
+                return analysis.parse(log_chunks, container, logs, sarif_outputs, status, end)
+
+            if warm_containers:
+                consumed = analyse_file_in_warm_container(file, cfg, logs, now, warm_containers, image, cmd, timeout,
+                                                          consume)
+            else:
+                consumed = analyse_file_in_container(file, cfg, logs, now, image, cmd, timeout, consume)
+            if not collect:
+                (results, runs) = consumed
+                analysis.store(result_cache, results, runs)
 
     except (docker.errors.APIError, docker.errors.ContainerError, docker.errors.ImageNotFound) as err:
         print(err)
-        logs.write(err + '\n')
+        logs.write(str(err) + '\n')
+        analysis = None
+    if collect:
+        return runs, analysis
+    return runs
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import os
+import struct
+from urllib.parse import quote, urlencode, urlparse
+
+from src.exception.DockerAPIException import DockerAPIException
+
+DOCKER_HOST = 'unix:///var/run/docker.sock'
+API_VERSION = 'v1.41'
+
+# HostConfig fields of the docker run arguments used as tool resource limits
+HOST_CONFIG_LIMITS = {'cpu_quota': 'CpuQuota', 'nano_cpus': 'NanoCpus', 'mem_limit': 'Memory',
+                      'pids_limit': 'PidsLimit'}
+BYTE_UNITS = {'b': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+READ_SIZE = 64 * 1024
+
+
+"""
+minimal asyncio client of the Docker Engine API, one connection per request
+
+DOCKER_HOST may be a unix:// socket or a tcp:// address, so the engine can be pointed at a local fake API server
+"""
+class AsyncDockerClient:
+    def __init__(self, docker_host=None):
+        self.docker_host = docker_host or os.environ.get('DOCKER_HOST', DOCKER_HOST)
+        self.url = urlparse(self.docker_host)
+
+    async def open_connection(self):
+        if self.url.scheme == 'unix':
+            return await asyncio.open_unix_connection(self.url.path)
+        return await asyncio.open_connection(self.url.hostname, self.url.port or 2375)
+
+    async def request(self, method, path, params=None, body=None):
+        # returns (status, body) of a request
+        chunks = []
+        status = await self.stream(method, path, chunks.append, params, body)
+        return status, b''.join(chunks)
+
+    async def stream(self, method, path, on_chunk, params=None, body=None):
+        # hands the body of a response to on_chunk as it arrives, returns the status
+        target = '/' + API_VERSION + path
+        if params:
+            target += '?' + urlencode(params)
+        data = json.dumps(body).encode('utf8') if body is not None else b''
+        headers = 'Host: docker\r\nConnection: close\r\nContent-Length: %d\r\n' % len(data)
+        if body is not None:
+            headers += 'Content-Type: application/json\r\n'
+
+        reader, writer = await self.open_connection()
+        try:
+            writer.write(('%s %s HTTP/1.1\r\n%s\r\n' % (method, target, headers)).encode('latin-1') + data)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            status = int(status_line.split()[1])
+            response_headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                (name, value) = line.decode('latin-1').split(':', 1)
+                response_headers[name.strip().lower()] = value.strip()
+
+            # the body of an error is only a message, read whole to raise it
+            errors = []
+            if status >= 400:
+                on_chunk = errors.append
+
+            if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+                while True:
+                    size = int((await reader.readline()).split(b';')[0], 16)
+                    if size == 0:
+                        break
+                    while size > 0:
+                        chunk = await reader.read(min(size, READ_SIZE))
+                        if not chunk:
+                            raise asyncio.IncompleteReadError(chunk, size)
+                        on_chunk(chunk)
+                        size -= len(chunk)
+                    await reader.readline()
+            else:
+                remaining = int(response_headers['content-length']) if 'content-length' in response_headers else None
+                while remaining is None or remaining > 0:
+                    chunk = await reader.read(READ_SIZE if remaining is None else min(remaining, READ_SIZE))
+                    if not chunk:
+                        if remaining is not None:
+                            raise asyncio.IncompleteReadError(chunk, remaining)
+                        break
+                    on_chunk(chunk)
+                    if remaining is not None:
+                        remaining -= len(chunk)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                # the daemon may reset a connection it is done with
+                pass
+
+        if status >= 400:
+            content = b''.join(errors)
+            try:
+                message = json.loads(content).get('message', '')
+            except ValueError:
+                message = content.decode('utf8', errors='replace')
+            raise DockerAPIException(status, message)
+        return status
+
+    async def image_id(self, image):
+        # returns the id of a local image, None when the image is not present
+        try:
+            (status, content) = await self.request('GET', '/images/' + quote(image, safe='') + '/json')
+        except DockerAPIException as err:
+            if err.status == 404:
+                return None
+            raise
+        return json.loads(content)['Id']
+
+    async def pull_image(self, image):
+        (name, tag) = (image, 'latest')
+        if ':' in image.rsplit('/', 1)[-1]:
+            (name, tag) = image.rsplit(':', 1)
+        # a failed pull still answers 200, its error comes as a line of the progress it streams
+        lines = PullProgress()
+        await self.stream('POST', '/images/create', lines.feed, params={'fromImage': name, 'tag': tag})
+        lines.close()
+        return await self.image_id(image)
+
+    async def create_container(self, image, cmd, binds=None, entrypoint=None, labels=None, host_config=None):
+        body = {'Image': image, 'Cmd': cmd, 'Labels': labels or {}, 'HostConfig': dict(host_config or {})}
+        if entrypoint is not None:
+            body['Entrypoint'] = entrypoint
+        if binds:
+            body['HostConfig']['Binds'] = binds
+        (status, content) = await self.request('POST', '/containers/create', body=body)
+        return json.loads(content)['Id']
+
+    async def start_container(self, container_id):
+        await self.request('POST', '/containers/' + container_id + '/start')
+
+    async def wait_container(self, container_id):
+        (status, content) = await self.request('POST', '/containers/' + container_id + '/wait')
+        return json.loads(content).get('StatusCode')
+
+    async def inspect_container(self, container_id):
+        (status, content) = await self.request('GET', '/containers/' + container_id + '/json')
+        return json.loads(content)
+
+    async def container_logs(self, container_id, file):
+        # writes the output of a container to a binary file as it is received
+        frames = Demultiplexer(file.write)
+        await self.stream('GET', '/containers/' + container_id + '/logs', frames.feed,
+                          params={'stdout': 1, 'stderr': 1})
+        frames.close()
+
+    async def get_archive(self, container_id, path, file):
+        # writes the tar archive of a path of a container to a binary file as it is received
+        await self.stream('GET', '/containers/' + container_id + '/archive', file.write, params={'path': path})
+
+    async def remove_container(self, container_id):
+        await self.request('DELETE', '/containers/' + container_id, params={'force': 1, 'v': 1})
+
+
+"""
+HostConfig of resource limits given as docker run arguments, memory may be written as in docker run (e.g. 2g)
+"""
+def host_config(limits):
+    config = {}
+    for (limit, value) in limits.items():
+        if limit == 'mem_limit' and isinstance(value, str):
+            value = value.strip().lower()
+            if value[-1:] in BYTE_UNITS:
+                value = int(float(value[:-1]) * BYTE_UNITS[value[-1]])
+            else:
+                value = int(value)
+        config[HOST_CONFIG_LIMITS[limit]] = value
+    return config
+
+
+"""
+reads the JSON lines of the progress of an image pull as they arrive, raising the error one of them reports
+"""
+class PullProgress:
+    def __init__(self):
+        self.buffer = b''
+
+    def feed(self, data):
+        lines = (self.buffer + data).split(b'\n')
+        self.buffer = lines.pop()
+        for line in lines:
+            self.check(line)
+
+    def close(self):
+        self.check(self.buffer)
+        self.buffer = b''
+
+    def check(self, line):
+        if not line.strip():
+            return
+        try:
+            message = json.loads(line)
+        except ValueError:
+            return
+        if 'error' in message or 'errorDetail' in message:
+            detail = message.get('errorDetail') or {}
+            raise DockerAPIException(detail.get('code', 500), detail.get('message') or message.get('error'))
+
+
+"""
+joins the stdout and stderr frames of a non-tty container log as they arrive, handing their payload to on_output
+"""
+class Demultiplexer:
+    def __init__(self, on_output):
+        self.on_output = on_output
+        self.buffer = b''
+        # bytes left in the current frame, None while reading a frame header
+        self.remaining = None
+        # tty containers are not multiplexed, their log is passed through
+        self.raw = False
+
+    def feed(self, data):
+        if self.raw:
+            self.on_output(data)
+            return
+        self.buffer += data
+        while self.buffer:
+            if self.remaining is None:
+                if len(self.buffer) < 8:
+                    return
+                (stream, size) = struct.unpack('>BxxxL', self.buffer[:8])
+                if stream not in (0, 1, 2):
+                    self.raw = True
+                    self.on_output(self.buffer)
+                    self.buffer = b''
+                    return
+                self.buffer = self.buffer[8:]
+                self.remaining = size
+            payload = self.buffer[:self.remaining]
+            if payload:
+                self.on_output(payload)
+            self.buffer = self.buffer[len(payload):]
+            self.remaining -= len(payload)
+            if self.remaining == 0:
+                self.remaining = None
+
+    def close(self):
+        # a frame header cut by the end of the log is dropped
+        self.buffer = b''
+
+
+"""
+join the stdout and stderr frames of a non-tty container log
+"""
+def demultiplex(content):
+    output = []
+    frames = Demultiplexer(output.append)
+    frames.feed(content)
+    frames.close()
+    return b''.join(output)
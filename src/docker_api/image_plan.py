@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+# images pulled at once by the planning phase, a pull is mostly bandwidth and disk bound
+MAX_PULLS = 4
+
+
+"""
+images needed by the jobs of a sweep, in the order of their first job: the default image of each tool, or its solc<5
+image for the files written for an older compiler
+"""
+def required_images(tasks, logs):
+    # docker and the run machinery are only loaded by a run, the command line reads MAX_PULLS from here
+    from src.docker_api.docker_api import get_solc_version, image_for_version, load_tool_config
+
+    configs = {}
+    solc_versions = {}
+    images = {}
+    for task in tasks:
+        (tool, file) = task[:2]
+        if tool not in configs:
+            configs[tool] = load_tool_config(tool, logs)[1]
+        cfg = configs[tool]
+        solc_version = None
+        if 'solc<5' in cfg['docker_image']:
+            # the version is only read for the tools with a solc<5 image, once per file
+            if file not in solc_versions:
+                solc_versions[file] = get_solc_version(file, logs)[0]
+            solc_version = solc_versions[file]
+        images.setdefault(image_for_version(cfg, solc_version), tool)
+    return list(images)
+
+
+"""
+id of an image, pulled first when it is missing
+"""
+def resolve_image(client, image, logs):
+    import docker
+
+    try:
+        return client.images.get(image).id
+    except docker.errors.ImageNotFound:
+        pass
+    print('pulling ' + image + ' image, this may take a while...')
+    logs.write('pulling ' + image + ' image, this may take a while...\n')
+    pulled = client.images.pull(image)
+    print('image pulled')
+    logs.write('image pulled\n')
+    return pulled.id
+
+
+"""
+resolve the images of a sweep before it starts, pulling the missing ones at most max_pulls at a time, and return
+their ids: the jobs create their containers from these ids, so the whole sweep runs on the same images even if a tag
+moves meanwhile, and the workers no longer ask the daemon about images. an image that cannot be resolved is left out,
+its jobs then look it up by name as before
+"""
+def plan_images(client, tasks, logs, max_pulls=MAX_PULLS):
+    import docker
+    from concurrent.futures import ThreadPoolExecutor
+
+    images = required_images(tasks, logs)
+    if not images:
+        return {}
+
+    def resolve(image):
+        try:
+            return resolve_image(client, image, logs)
+        except docker.errors.APIError as err:
+            print(err)
+            logs.write(str(err) + '\n')
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_pulls, len(images)))) as executor:
+        image_ids = list(executor.map(resolve, images))
+    return {image: image_id for (image, image_id) in zip(images, image_ids) if image_id is not None}
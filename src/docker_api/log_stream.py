@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import codecs
+
+# messages of a failed compilation, looked for in every line of the output
+SOLC_ERRORS = ['Solc experienced a fatal error', 'compilation failed']
+CHUNK_SIZE = 64 * 1024
+
+
+"""
+output of a tool streamed from its container to result.log, and handed to the parsers line by line at the same time
+
+only the current chunk and the current line are held in memory, whatever the size of the output
+"""
+class LogStream:
+    def __init__(self, chunks, path):
+        self.chunks = iter(chunks)
+        self.path = path
+        self.solc_error = False
+        self.stream = self.tee()
+
+    def tee(self):
+        decoder = codecs.getincrementaldecoder('utf8')(errors='replace')
+        pending = ''
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for chunk in self.chunks:
+                text = decoder.decode(chunk)
+                if not text:
+                    continue
+                f.write(text)
+                block = pending + text
+                self.check(block)
+                lines = block.splitlines()
+                # the last line is only complete once it ends with a line break
+                pending = lines.pop() if block[-1] not in '\n\r' else ''
+                yield from lines
+            text = decoder.decode(b'', final=True)
+            f.write(text)
+            pending += text
+        if pending:
+            self.check(pending)
+            yield from pending.splitlines()
+
+    def check(self, text):
+        # an error message always lies within one line, so it is found in the block that completes the line
+        if not self.solc_error and any(error in text for error in SOLC_ERRORS):
+            self.solc_error = True
+
+    def lines(self):
+        # the lines not consumed yet, can only be iterated once
+        return self.stream
+
+    def drain(self):
+        # write the rest of the output to result.log
+        for _ in self.stream:
+            pass
+
+    def read(self):
+        # the whole output, for the tools that print one JSON document
+        self.drain()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+
+    def first_char(self):
+        self.drain()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            while True:
+                block = f.read(CHUNK_SIZE)
+                if not block:
+                    return ''
+                block = block.lstrip()
+                if block:
+                    return block[0]
+
+
+"""
+chunks of a file, to stream an output that was saved before parsing
+"""
+def file_chunks(path, chunk_size=CHUNK_SIZE):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
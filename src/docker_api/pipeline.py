@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import queue
+
+# outputs waiting for a parsing process beyond which no container is started
+QUEUE_SIZE = 16
+
+parser_logs = None
+
+
+"""
+open the log file in each parsing process
+"""
+def init_parser(log_path):
+    global parser_logs
+    parser_logs = open(log_path, 'a')
+
+
+"""
+parse the collected output of an analysis and write its results, returns its SARIF runs
+"""
+def parse_analysis(analysis, result_cache):
+    try:
+        return analysis.parse_collected(parser_logs, result_cache)
+    finally:
+        parser_logs.flush()
+
+
+"""
+runs the analyses of a sweep in two stages
+
+the processes of the first stage run the containers and only collect their output, see Analysis.collect, which a
+separate pool of processes parses into the results. the two pools are sized apart: containers by the memory of the
+host, parsing by its CPUs. no container is started while queue_size outputs wait for their parsing, so the outputs
+held on disk stay bounded when parsing falls behind
+
+analyse_job runs a job of the first stage in a process of the pool and returns one record per file, with the
+collected Analysis of the file or None when its runs are already known (cached results, failed analyses). the state
+analyse_job reads in its process is set by initializer, called with initargs in each process of the pool, so that it
+does not depend on the processes being forked from the caller
+"""
+class Pipeline:
+    def __init__(self, analyse_job, log_path, processes=1, parse_processes=1, queue_size=QUEUE_SIZE,
+                 result_cache=None, journal=None, initializer=None, initargs=()):
+        self.analyse_job = analyse_job
+        self.initializer = initializer
+        self.initargs = initargs
+        self.log_path = log_path
+        self.processes = processes
+        self.parse_processes = parse_processes
+        self.queue_size = max(queue_size, 1)
+        self.result_cache = result_cache
+        self.journal = journal
+
+    def finish(self, record, on_record):
+        (tool, file, file_name, runs, duration) = record
+        if self.journal is not None:
+            self.journal.finished(tool, file, duration)
+        on_record(record)
+
+    def run(self, jobs, on_record):
+        # the pools are only loaded by a run, the command line reads QUEUE_SIZE from here
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import Pool
+
+        # the events of both stages are handled by the calling thread, the only one calling on_record
+        events = queue.Queue()
+        jobs = iter(jobs)
+        running = 0
+        waiting = 0
+        with Pool(processes=self.processes, initializer=self.initializer, initargs=self.initargs) as pool, \
+                ProcessPoolExecutor(max_workers=self.parse_processes, initializer=init_parser,
+                                    initargs=(self.log_path,)) as executor:
+            while True:
+                while running < self.processes and waiting < self.queue_size:
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    pool.apply_async(self.analyse_job, (job,),
+                                     callback=lambda records: events.put(('collected', records)),
+                                     error_callback=lambda error: events.put(('error', error)))
+                    running += 1
+                if running == 0 and waiting == 0:
+                    break
+
+                (kind, value) = events.get()
+                if kind == 'error':
+                    raise value
+                if kind == 'collected':
+                    running -= 1
+                    for (tool, file, file_name, runs, duration, analysis) in value:
+                        if analysis is None:
+                            self.finish((tool, file, file_name, runs, duration), on_record)
+                            continue
+                        waiting += 1
+                        record = (tool, file, file_name, duration)
+                        future = executor.submit(parse_analysis, analysis, self.result_cache)
+                        future.add_done_callback(lambda future, record=record: events.put(('parsed', (record, future))))
+                else:
+                    waiting -= 1
+                    ((tool, file, file_name, duration), future) = value
+                    try:
+                        runs = future.result()
+                    except Exception as e:
+                        if self.journal is not None:
+                            self.journal.failed(tool, file, e)
+                        print(e)
+                        raise e
+                    self.finish((tool, file, file_name, runs, duration), on_record)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+from shutil import copyfile, rmtree
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# staging of the contracts of a job, set by `staging` in the tool configuration
+STAGING_READ_ONLY = 'read-only'
+STAGING_WRITABLE = 'writable'
+STAGING_COPY = 'copy'
+STAGING_MODES = [STAGING_READ_ONLY, STAGING_WRITABLE, STAGING_COPY]
+
+# ioctl sharing the extents of a file with another one, on the filesystems with copy-on-write (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+"""
+private copy of a file: a reflink when the filesystem supports it, so that no data is copied, a plain copy otherwise.
+a hard link would share the file itself, and let a tool that rewrites its copy change the original
+"""
+def clone_file(source, destination):
+    if fcntl is not None:
+        try:
+            with open(source, 'rb') as src, open(destination, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return
+        except OSError:
+            pass
+    copyfile(source, destination)
+
+
+"""
+the contracts of a job as seen in /data of its container, by the mode of its tool:
+
+read-only: each contract is bind-mounted read-only at /data/<name>, nothing is written on the host
+writable: /data is an empty private directory with the contracts bind-mounted read-only in it, for the tools that
+write next to their input
+copy: /data is a private directory with clones of the contracts, for the tools that change their input
+
+each contract is mounted on its own rather than the dataset once, since /data/<name> is the path the tool commands
+name the contract by and the tools print in their output, which the parsers, the split of batch outputs and the
+cached commands are keyed on; the contracts of a sweep can also come from anywhere on the host, with no common root
+short of / to mount, and a folder mounted whole would show the tool the other contracts next to its own. a batch holds
+at most a few tens of contracts, so its mounts cost little next to the start of its container. the names of the files
+of a job are distinct, pack_batches does not put two files with the same name in a batch
+"""
+class Staging:
+    def __init__(self, files, mode=STAGING_READ_ONLY):
+        self.working_dir = None
+        # (host path, container path, mode) of each mount
+        self.mounts = []
+        if mode != STAGING_READ_ONLY:
+            self.working_dir = tempfile.mkdtemp(prefix='smartbugs-')
+            self.mounts.append((self.working_dir, '/data', 'rw'))
+        for file in files:
+            target = '/data/' + os.path.basename(file)
+            if mode == STAGING_COPY:
+                clone_file(file, os.path.join(self.working_dir, os.path.basename(file)))
+            else:
+                self.mounts.append((os.path.abspath(file), target, 'ro'))
+
+    def volumes(self):
+        # the volumes argument of docker-py
+        return {host: {'bind': container, 'mode': mode} for (host, container, mode) in self.mounts}
+
+    def binds(self):
+        # the binds of a container host configuration in the Engine API
+        return [host + ':' + container + ':' + mode for (host, container, mode) in self.mounts]
+
+    def close(self):
+        if self.working_dir is not None:
+            rmtree(self.working_dir, ignore_errors=True)
+            self.working_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
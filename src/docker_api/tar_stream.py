@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import io
+import tarfile
+from fnmatch import fnmatch
+
+
+"""
+read-only file over the chunks of an archive, optionally copying them to a file as they are read
+"""
+class ChunkReader(io.RawIOBase):
+    def __init__(self, chunks, copy=None):
+        self.chunks = iter(chunks)
+        self.copy = copy
+        self.chunk = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.chunk:
+            try:
+                chunk = next(self.chunks)
+            except StopIteration:
+                return 0
+            if self.copy is not None:
+                self.copy.write(chunk)
+            self.chunk = memoryview(chunk)
+        size = min(len(buffer), len(self.chunk))
+        buffer[:size] = self.chunk[:size]
+        self.chunk = self.chunk[size:]
+        return size
+
+    def drain(self):
+        # read the chunks left after the last member, so that a kept archive is complete
+        while self.readinto(bytearray(64 * 1024)):
+            pass
+
+
+"""
+contents of the members of an archive stream whose name matches one of the patterns (all members without patterns)
+
+the archive is read once, in stream mode, and is only written to archive_path when it is given
+"""
+def extract_members(chunks, patterns=None, archive_path=None):
+    copy = open(archive_path, 'wb') if archive_path is not None else None
+    try:
+        reader = ChunkReader(chunks, copy)
+        members = {}
+        with tarfile.open(fileobj=io.BufferedReader(reader), mode='r|') as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                if patterns and not any(fnmatch(member.name, pattern) for pattern in patterns):
+                    continue
+                members[member.name] = tar.extractfile(member).read()
+        if copy is not None:
+            reader.drain()
+        return members
+    finally:
+        if copy is not None:
+            copy.close()
@@ -0,0 +1,15 @@
+class BrokerKeyException(Exception):
+    """
+        Exception raised when the broker of the distributed engine would be
+        reached from other hosts with the public default key.
+
+        Attributes:
+            Address -> The HOST:PORT address of the broker.
+            Message -> Why the key is refused.
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self.message = ('the broker at {} is not on the loopback interface, set the {} environment variable to a '
+                        'secret shared by the coordinator and its workers').format(address, 'SMARTBUGS_BROKER_KEY')
+        super().__init__(self.message)
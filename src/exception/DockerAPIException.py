@@ -0,0 +1,14 @@
+class DockerAPIException(Exception):
+    """
+        Exception raised when the Docker Engine API answers a request
+        of the asyncio engine with an error status.
+
+        Attributes:
+            Status -> The HTTP status code.
+            Message -> The error message sent by the daemon.
+    """
+
+    def __init__(self, status, message):
+        self.status = status
+        self.message = 'Docker API error {}: {}'.format(status, message)
+        super().__init__(self.message)
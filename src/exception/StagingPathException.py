@@ -0,0 +1,14 @@
+class StagingPathException(Exception):
+    """
+        Exception raised when a job of the distributed engine would stage
+        its contract outside of the staging folder of its contract hash.
+
+        Attributes:
+            Path -> The path of the contract in the repository, as sent by the broker.
+            Message -> Why the job is refused.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.message = 'the contract path {} leaves the staging folder of the job, job refused'.format(path)
+        super().__init__(self.message)
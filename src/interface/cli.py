@@ -5,9 +5,16 @@ import os
 import sys
 from functools import reduce
 
+from src.distributed.broker import BROKER_ADDRESS, LEASE_TIMEOUT, MAX_ATTEMPTS
+from src.docker_api.image_plan import MAX_PULLS
+from src.docker_api.pipeline import QUEUE_SIZE
+from src.result_cache.result_cache import CACHE_DIR, CACHE_SIZE
+
 DATASET_CHOICES = ['all']
 TOOLS_CHOICES = ['all']
 VERSION_CHOICES = ['v1', 'v2', 'all']
+ENGINE_CHOICES = ['pool', 'async', 'distributed']
+SCHEDULE_CHOICES = ['longest-first', 'fifo']
 CONFIG_TOOLS_PATH = os.path.abspath('config/tools')
 CONFIG_DATASET_PATH = os.path.abspath('config/dataset/dataset.yaml')
 
@@ -51,6 +58,33 @@ class ListAction(argparse.Action):
 
 
 # Parser stuff
+def limit(value):
+    """Parse a NAME=N concurrency limit."""
+    name, sep, count = value.rpartition('=')
+    if not sep or not name or not count.isdigit() or int(count) < 1:
+        raise argparse.ArgumentTypeError("'%s' is not of the form NAME=N" % value)
+    return name, int(count)
+
+
+def sarif_shards(value):
+    """Parse a sharding of the unique SARIF output: tool or a number of contracts."""
+    if value == 'tool':
+        return value
+    if not value.isdigit() or int(value) < 1:
+        raise argparse.ArgumentTypeError("'%s' is neither tool nor a number of contracts" % value)
+    return int(value)
+
+
+def check_required(parser, args):
+    """Exit unless the files and the tools to analyse are given, or come from a resumed sweep."""
+    if args.resume is not None:
+        return
+    if not args.file and not args.dataset:
+        parser.error('one of the arguments -f/--file --dataset is required')
+    if not args.tool:
+        parser.error('one of the arguments -t/--tool is required')
+
+
 def isRemoteDataset(cfg_dataset, name):
     """Given a dataset file configuration and a dataset name, return True
        if the dataset is remote and False otherwise.
@@ -98,8 +132,9 @@ def getRemoteDataset(cfg_dataset, name):
 
 def create_parser():
     parser = argparse.ArgumentParser(description="Static analysis of Ethereum smart contracts")
-    group_source_files = parser.add_mutually_exclusive_group(required='True')
-    group_tools = parser.add_mutually_exclusive_group(required='True')
+    # required unless a sweep is resumed, see check_required
+    group_source_files = parser.add_mutually_exclusive_group()
+    group_tools = parser.add_mutually_exclusive_group()
     parser._optionals.title = "options:"
 
     parser.register('action', 'info', InfoAction)
@@ -109,19 +144,23 @@ def create_parser():
     list_option = parser.add_argument_group('list_option')
 
     for name in cfg_dataset.items():
-        DATASET_CHOICES.append(name[0])
+        if name[0] not in DATASET_CHOICES:
+            DATASET_CHOICES.append(name[0])
 
         # list all subsets of remote datasets
         if isRemoteDataset(cfg_dataset, name[0]):
             remote_dataset = getRemoteDataset(cfg_dataset, name[0])
             for sbset_name in remote_dataset['subsets']:
-                DATASET_CHOICES.append(name[0] + '/' + sbset_name)
+                if name[0] + '/' + sbset_name not in DATASET_CHOICES:
+                    DATASET_CHOICES.append(name[0] + '/' + sbset_name)
 
     # get tools available by parsing the name of the config files
     tools = [os.path.splitext(f)[0] for f in os.listdir(CONFIG_TOOLS_PATH) if
              os.path.isfile(os.path.join(CONFIG_TOOLS_PATH, f))]
+    # the choices are only listed once when the command line is parsed again to resume a sweep
     for tool in tools:
-        TOOLS_CHOICES.append(tool)
+        if tool not in TOOLS_CHOICES:
+            TOOLS_CHOICES.append(tool)
 
     group_source_files.add_argument('-f',
                                     '--file',
@@ -163,6 +202,17 @@ def create_parser():
                       default=1,
                       help='The number of parallel execution')
 
+    info.add_argument('--parse-processes',
+                      type=int,
+                      default=None,
+                      help='The number of processes parsing the outputs of the tools, by default as many as '
+                           '--processes up to the number of CPUs')
+
+    info.add_argument('--parse-queue',
+                      type=int,
+                      default=QUEUE_SIZE,
+                      help='The number of outputs waiting for a parsing process beyond which no container is started')
+
     info.add_argument('--output-version',
                       choices=VERSION_CHOICES,
                       default='all',
@@ -181,14 +231,125 @@ def create_parser():
                       action='store_true',
                       help='Aggregates all sarif analysis outputs in a single file')
 
+    info.add_argument('--sarif-shards',
+                      type=sarif_shards,
+                      metavar='tool|N',
+                      help='With --unique-sarif-output, write one SARIF file per tool or per N contracts as soon as '
+                           'their analyses are done, listed in a manifest')
+
+    info.add_argument('--warm-containers',
+                      type=int,
+                      nargs='?',
+                      const=1,
+                      default=0,
+                      metavar='N',
+                      help='Reuse up to N long-lived containers per tool image in each process instead of one container per file')
+
+    info.add_argument('--container-max-jobs',
+                      type=int,
+                      default=100,
+                      help='The number of analyses after which a warm container is recycled')
+
+    info.add_argument('--adaptive-timeout',
+                      nargs='?',
+                      const=95,
+                      type=float,
+                      metavar='PERCENTILE',
+                      help='set the timeout of each tool from a percentile (by default 95) of the durations of its '
+                           'past analyses, never above the timeout of its configuration')
+
+    info.add_argument('--schedule',
+                      choices=SCHEDULE_CHOICES,
+                      default='fifo',
+                      help='fifo: analyse in file and tool order - longest-first: start the analyses expected to '
+                           'take longest first, from the durations of past results, and write how the predicted '
+                           'makespan compares with the actual one to results/logs')
+
+    info.add_argument('--engine',
+                      choices=ENGINE_CHOICES,
+                      default='pool',
+                      help='pool: one process per running analysis - async: all containers driven from one event '
+                           'loop, --processes or --parse-processes then sets the number of parsing processes - '
+                           'distributed: analyses run by the workers connected to the broker, see smartBugs.py '
+                           'worker')
+
+    info.add_argument('--max-containers',
+                      type=int,
+                      default=16,
+                      help='The number of containers running at once with the async engine')
+
+    info.add_argument('--tool-limit',
+                      type=limit,
+                      nargs='+',
+                      default=[],
+                      metavar='TOOL=N',
+                      help='The number of containers of a tool running at once with the async engine')
+
+    info.add_argument('--image-limit',
+                      type=limit,
+                      nargs='+',
+                      default=[],
+                      metavar='IMAGE=N',
+                      help='The number of containers of an image running at once with the async engine')
+
+    info.add_argument('--no-batch',
+                      action='store_true',
+                      help='Run one container per file, also for the tools with a batch configuration (always the case '
+                           'with --warm-containers)')
+
+    info.add_argument('--max-pulls',
+                      type=int,
+                      default=MAX_PULLS,
+                      help='The number of missing images pulled at once before the analyses start')
+
+    info.add_argument('--broker',
+                      type=str,
+                      default=BROKER_ADDRESS,
+                      metavar='HOST:PORT',
+                      help='Address the broker of the distributed engine listens on (0.0.0.0:PORT for workers on '
+                           'other hosts, which needs the same secret in the SMARTBUGS_BROKER_KEY environment variable '
+                           'of the coordinator and its workers)')
+
+    info.add_argument('--lease-timeout',
+                      type=int,
+                      default=LEASE_TIMEOUT,
+                      help='Seconds without news from a worker after which its analysis is given to another worker')
+
+    info.add_argument('--max-attempts',
+                      type=int,
+                      default=MAX_ATTEMPTS,
+                      help='The number of times an analysis is run by the distributed engine before it is given up')
+
+    info.add_argument('--resume',
+                      type=str,
+                      metavar='SWEEP',
+                      help='Run the analyses a stopped sweep (its output folder, e.g. 20210101_1200) did not finish, '
+                           'with its files, tools and options unless given again')
+
+    info.add_argument('--cache',
+                      action='store_true',
+                      help='Reuse stored results of unchanged contracts, tool configurations and images')
+
+    info.add_argument('--cache-dir',
+                      type=str,
+                      default=CACHE_DIR,
+                      help='Directory of the result cache')
+
+    info.add_argument('--cache-size',
+                      type=int,
+                      default=CACHE_SIZE,
+                      help='Size in MB above which the least recently used cached results are evicted')
+
     args = parser.parse_args()
+    check_required(parser, args)
     return args
 
 
 def create_parser_with_args(init_args):
     parser = argparse.ArgumentParser(description="Static analysis of Ethereum smart contracts")
-    group_source_files = parser.add_mutually_exclusive_group(required='True')
-    group_tools = parser.add_mutually_exclusive_group(required='True')
+    # required unless a sweep is resumed, see check_required
+    group_source_files = parser.add_mutually_exclusive_group()
+    group_tools = parser.add_mutually_exclusive_group()
     parser._optionals.title = "options:"
 
     parser.register('action', 'info', InfoAction)
@@ -198,19 +359,23 @@ def create_parser_with_args(init_args):
     list_option = parser.add_argument_group('list_option')
 
     for name in cfg_dataset.items():
-        DATASET_CHOICES.append(name[0])
+        if name[0] not in DATASET_CHOICES:
+            DATASET_CHOICES.append(name[0])
 
         # list all subsets of remote datasets
         if isRemoteDataset(cfg_dataset, name[0]):
             remote_dataset = getRemoteDataset(cfg_dataset, name[0])
             for sbset_name in remote_dataset['subsets']:
-                DATASET_CHOICES.append(name[0] + '/' + sbset_name)
+                if name[0] + '/' + sbset_name not in DATASET_CHOICES:
+                    DATASET_CHOICES.append(name[0] + '/' + sbset_name)
 
     # get tools available by parsing the name of the config files
     tools = [os.path.splitext(f)[0] for f in os.listdir(CONFIG_TOOLS_PATH) if
              os.path.isfile(os.path.join(CONFIG_TOOLS_PATH, f))]
+    # the choices are only listed once when the command line is parsed again to resume a sweep
     for tool in tools:
-        TOOLS_CHOICES.append(tool)
+        if tool not in TOOLS_CHOICES:
+            TOOLS_CHOICES.append(tool)
 
     group_source_files.add_argument('-f',
                                     '--file',
@@ -252,6 +417,17 @@ def create_parser_with_args(init_args):
                       default=1,
                       help='The number of parallel execution')
 
+    info.add_argument('--parse-processes',
+                      type=int,
+                      default=None,
+                      help='The number of processes parsing the outputs of the tools, by default as many as '
+                           '--processes up to the number of CPUs')
+
+    info.add_argument('--parse-queue',
+                      type=int,
+                      default=QUEUE_SIZE,
+                      help='The number of outputs waiting for a parsing process beyond which no container is started')
+
     info.add_argument('--output-version',
                       choices=VERSION_CHOICES,
                       default='all',
@@ -270,5 +446,166 @@ def create_parser_with_args(init_args):
                       action='store_true',
                       help='Aggregates all sarif analysis outputs in a single file')
 
+    info.add_argument('--sarif-shards',
+                      type=sarif_shards,
+                      metavar='tool|N',
+                      help='With --unique-sarif-output, write one SARIF file per tool or per N contracts as soon as '
+                           'their analyses are done, listed in a manifest')
+
+    info.add_argument('--warm-containers',
+                      type=int,
+                      nargs='?',
+                      const=1,
+                      default=0,
+                      metavar='N',
+                      help='Reuse up to N long-lived containers per tool image in each process instead of one container per file')
+
+    info.add_argument('--container-max-jobs',
+                      type=int,
+                      default=100,
+                      help='The number of analyses after which a warm container is recycled')
+
+    info.add_argument('--adaptive-timeout',
+                      nargs='?',
+                      const=95,
+                      type=float,
+                      metavar='PERCENTILE',
+                      help='set the timeout of each tool from a percentile (by default 95) of the durations of its '
+                           'past analyses, never above the timeout of its configuration')
+
+    info.add_argument('--schedule',
+                      choices=SCHEDULE_CHOICES,
+                      default='fifo',
+                      help='fifo: analyse in file and tool order - longest-first: start the analyses expected to '
+                           'take longest first, from the durations of past results, and write how the predicted '
+                           'makespan compares with the actual one to results/logs')
+
+    info.add_argument('--engine',
+                      choices=ENGINE_CHOICES,
+                      default='pool',
+                      help='pool: one process per running analysis - async: all containers driven from one event '
+                           'loop, --processes or --parse-processes then sets the number of parsing processes - '
+                           'distributed: analyses run by the workers connected to the broker, see smartBugs.py '
+                           'worker')
+
+    info.add_argument('--max-containers',
+                      type=int,
+                      default=16,
+                      help='The number of containers running at once with the async engine')
+
+    info.add_argument('--tool-limit',
+                      type=limit,
+                      nargs='+',
+                      default=[],
+                      metavar='TOOL=N',
+                      help='The number of containers of a tool running at once with the async engine')
+
+    info.add_argument('--image-limit',
+                      type=limit,
+                      nargs='+',
+                      default=[],
+                      metavar='IMAGE=N',
+                      help='The number of containers of an image running at once with the async engine')
+
+    info.add_argument('--no-batch',
+                      action='store_true',
+                      help='Run one container per file, also for the tools with a batch configuration (always the case '
+                           'with --warm-containers)')
+
+    info.add_argument('--max-pulls',
+                      type=int,
+                      default=MAX_PULLS,
+                      help='The number of missing images pulled at once before the analyses start')
+
+    info.add_argument('--broker',
+                      type=str,
+                      default=BROKER_ADDRESS,
+                      metavar='HOST:PORT',
+                      help='Address the broker of the distributed engine listens on (0.0.0.0:PORT for workers on '
+                           'other hosts, which needs the same secret in the SMARTBUGS_BROKER_KEY environment variable '
+                           'of the coordinator and its workers)')
+
+    info.add_argument('--lease-timeout',
+                      type=int,
+                      default=LEASE_TIMEOUT,
+                      help='Seconds without news from a worker after which its analysis is given to another worker')
+
+    info.add_argument('--max-attempts',
+                      type=int,
+                      default=MAX_ATTEMPTS,
+                      help='The number of times an analysis is run by the distributed engine before it is given up')
+
+    info.add_argument('--resume',
+                      type=str,
+                      metavar='SWEEP',
+                      help='Run the analyses a stopped sweep (its output folder, e.g. 20210101_1200) did not finish, '
+                           'with its files, tools and options unless given again')
+
+    info.add_argument('--cache',
+                      action='store_true',
+                      help='Reuse stored results of unchanged contracts, tool configurations and images')
+
+    info.add_argument('--cache-dir',
+                      type=str,
+                      default=CACHE_DIR,
+                      help='Directory of the result cache')
+
+    info.add_argument('--cache-size',
+                      type=int,
+                      default=CACHE_SIZE,
+                      help='Size in MB above which the least recently used cached results are evicted')
+
+    args = parser.parse_args(init_args)
+    check_required(parser, args)
+    return args
+
+
+def create_cache_parser(init_args=None):
+    parser = argparse.ArgumentParser(prog='smartBugs.py cache', description="Manage the local result cache")
+    parser.add_argument('--cache-dir',
+                        type=str,
+                        default=CACHE_DIR,
+                        help='Directory of the result cache')
+
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', help='show the number and size of cached results')
+
+    prune = commands.add_parser('prune', help='evict cached results')
+    prune.add_argument('--max-size',
+                       type=int,
+                       default=CACHE_SIZE,
+                       help='Size in MB the cache is reduced to, least recently used results first')
+    prune.add_argument('--older-than',
+                       type=float,
+                       help='Also evict results not used for this number of days')
+    prune.add_argument('--all',
+                       action='store_true',
+                       help='Evict every cached result')
+
+    args = parser.parse_args(init_args)
+    return args
+
+
+def create_worker_parser(init_args=None):
+    parser = argparse.ArgumentParser(prog='smartBugs.py worker',
+                                     description="Run the analyses of a distributed sweep with the local Docker daemon")
+    parser.add_argument('--broker',
+                        type=str,
+                        default=BROKER_ADDRESS,
+                        metavar='HOST:PORT',
+                        help='Address of the broker of the coordinator (a broker on another host needs its secret '
+                             'in the SMARTBUGS_BROKER_KEY environment variable)')
+    parser.add_argument('--processes',
+                        type=int,
+                        default=1,
+                        help='The number of analyses run at once by this worker')
+    parser.add_argument('--cache',
+                        action='store_true',
+                        help='Reuse stored results of unchanged contracts, tool configurations and images')
+    parser.add_argument('--cache-dir',
+                        type=str,
+                        default=CACHE_DIR,
+                        help='Directory of the result cache')
+
     args = parser.parse_args(init_args)
     return args
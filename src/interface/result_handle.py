@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+import json
+import os
+
+
+"""
+result of the analysis of a file by a tool, as a sweep run in process returns it (see smartBugs.run_analyses): the
+folder its results were written to and the SARIF runs they were converted to
+"""
+class ResultHandle:
+    def __init__(self, tool, file, sweep, file_name, runs, duration):
+        self.tool = tool
+        self.file = file
+        self.sweep = sweep
+        self.folder = os.path.join('results', tool, sweep, file_name)
+        self.result_json = os.path.join(self.folder, 'result.json')
+        self.runs = runs
+        self.duration = duration
+
+    def exists(self):
+        # an analysis whose container could not be run has no result files
+        return os.path.exists(self.result_json)
+
+    def load(self):
+        with open(self.result_json, 'r') as f:
+            return json.load(f)
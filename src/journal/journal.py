@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import json
+import os
+from time import time
+
+JOURNAL_DIR = 'results/logs'
+
+QUEUED = 'queued'
+STARTED = 'started'
+FINISHED = 'finished'
+FAILED = 'failed'
+
+
+"""
+path of the journal of a sweep, next to its log
+"""
+def journal_path(sweep, journal_dir=JOURNAL_DIR):
+    return os.path.join(journal_dir, 'SmartBugs_' + sweep + '.journal')
+
+
+"""
+append-only journal of the jobs of a sweep, one JSON event per line
+
+the parent queues the jobs and records them finished, the processes running them record them started or failed:
+each event is one write to a file opened in append mode, so lines of concurrent processes never interleave, and
+a crashed sweep leaves at worst its last line incomplete
+"""
+class JobJournal:
+    def __init__(self, sweep, journal_dir=JOURNAL_DIR):
+        self.sweep = sweep
+        self.path = journal_path(sweep, journal_dir)
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def append(self, events):
+        data = ''.join(json.dumps(event) + '\n' for event in events)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data.encode('utf8'))
+        finally:
+            os.close(fd)
+
+    def event(self, state, tool, file, **fields):
+        return dict({'event': state, 'tool': tool, 'file': file, 'time': time()}, **fields)
+
+    def open_sweep(self, argv, resumed=False):
+        if resumed:
+            self.terminate_last_line()
+        self.append([{'event': 'sweep', 'sweep': self.sweep, 'time': time(), 'argv': argv, 'resumed': resumed}])
+
+    def terminate_last_line(self):
+        # the line cut by a crash is ended, so that the events of the resumed sweep start on their own line
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b'\n':
+                return
+        with open(self.path, 'ab') as f:
+            f.write(b'\n')
+
+    def queued(self, tasks):
+        self.append(self.event(QUEUED, task[0], task[1]) for task in tasks)
+
+    def started(self, tool, file):
+        self.append([self.event(STARTED, tool, file, pid=os.getpid())])
+
+    def finished(self, tool, file, duration):
+        self.append([self.event(FINISHED, tool, file, duration=duration)])
+
+    def failed(self, tool, file, error):
+        self.append([self.event(FAILED, tool, file, error=str(error))])
+
+    def replay(self):
+        # the command line of the sweep when first run, and the last state of each of its (tool, file) jobs,
+        # read in one pass whatever the number of events
+        argv = None
+        states = {}
+        with open(self.path, 'r', encoding='utf8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # the line being written when the sweep crashed
+                    continue
+                if event.get('event') == 'sweep':
+                    if argv is None:
+                        argv = event['argv']
+                else:
+                    states[(event['tool'], event['file'])] = event['event']
+        return argv, states
+
+
+"""
+(tool, file) jobs of a sweep that were queued, running or failed when it stopped
+"""
+def remaining_jobs(states):
+    return {job for (job, state) in states.items() if state != FINISHED}
@@ -1,13 +1,14 @@
-from sarif_om import Tool, ToolComponent, MultiformatMessageString, Run
-
 from src.output_parser.Parser import Parser
-from src.output_parser.SarifHolder import parseRule, parseResult, isNotDuplicateRule, parseArtifact, \
-    parseLogicalLocation, isNotDuplicateLogicalLocation
+from src.output_parser.SarifHolder import parseLogicalLocation, parseResult
 
 
 class Conkas(Parser):
-    def __init__(self):
-        pass
+    tool = "conkas"
+    name = "Conkas"
+    version = "1.0.0"
+    information_uri = "https://github.com/nveloso/conkas"
+    description = "Conkas is based on symbolic execution, determines which inputs cause which program branches to execute, to find potential security vulnerabilities. Conkas uses rattle to lift bytecode to a high level representation."
+    logical_locations = True
 
     @staticmethod
     def __parse_vuln_line(line):
@@ -26,46 +27,21 @@ class Conkas(Parser):
             'line_number': line_number
         }
 
-    def parse(self, str_output):
-        output = []
-        str_output = str_output.split('\n')
-        for line in str_output:
+    def entries(self, lines):
+        for line in lines:
             if 'Vulnerability' in line:
                 try:
-                    output.append(self.__parse_vuln_line(line))
+                    entry = self.__parse_vuln_line(line)
                 except:
                     continue
-        return output
-
-    def parseSarif(self, conkas_output_results, file_path_in_repo):
-        resultsList = []
-        rulesList = []
-        logicalLocationsList = []
-
-        for analysis_result in conkas_output_results["analysis"]:
-            rule = parseRule(tool="conkas", vulnerability=analysis_result["vuln_type"])
-
-            logicalLocation = parseLogicalLocation(analysis_result["maybe_in_function"], kind="function")
-
-            result = parseResult(tool="conkas", vulnerability=analysis_result["vuln_type"], uri=file_path_in_repo,
-                                 line=int(analysis_result["line_number"]),
-                                 logicalLocation=logicalLocation)
-
-            resultsList.append(result)
-
-            if isNotDuplicateRule(rule, rulesList):
-                rulesList.append(rule)
-
-            if isNotDuplicateLogicalLocation(logicalLocation, logicalLocationsList):
-                logicalLocationsList.append(logicalLocation)
-
-        artifact = parseArtifact(uri=file_path_in_repo)
+                yield entry
 
-        tool = Tool(driver=ToolComponent(name="Conkas", version="1.0.0", rules=rulesList,
-                                         information_uri="https://github.com/nveloso/conkas",
-                                         full_description=MultiformatMessageString(
-                                             text="Conkas is based on symbolic execution, determines which inputs cause which program branches to execute, to find potential security vulnerabilities. Conkas uses rattle to lift bytecode to a high level representation.")))
+    def add_finding(self, run, analysis_result):
+        rule = self.rule(analysis_result["vuln_type"])
 
-        run = Run(tool=tool, artifacts=[artifact], logical_locations=logicalLocationsList, results=resultsList)
+        logicalLocation = parseLogicalLocation(analysis_result["maybe_in_function"], kind="function")
 
-        return run
+        run.results.append(parseResult(tool=self.tool, vulnerability=analysis_result["vuln_type"], uri=run.uri,
+                                       line=int(analysis_result["line_number"]), logicalLocation=logicalLocation))
+        run.add_rule(rule)
+        run.add_logical_location(logicalLocation)
@@ -1,13 +1,14 @@
-from sarif_om import *
-
 from src.output_parser.Parser import Parser
-from src.output_parser.SarifHolder import isNotDuplicateRule, parseRule, parseResult, \
-    parseArtifact, parseLogicalLocation, isNotDuplicateLogicalLocation
+from src.output_parser.SarifHolder import parseLogicalLocation, parseResult
 
 
 class HoneyBadger(Parser):
-    def __init__(self):
-        pass
+    tool = "honeybadger"
+    name = "HoneyBadger"
+    version = "1.8.16"
+    information_uri = "https://honeybadger.uni.lu/"
+    description = "An analysis tool to detect honeypots in Ethereum smart contracts"
+    logical_locations = True
 
     def extract_result_line(self, line):
         line = line.replace("INFO:symExec:	 ", '')
@@ -20,14 +21,12 @@ class HoneyBadger(Parser):
             value = False
         return (key, value)
 
-    def parse(self, str_output):
-        output = []
+    def entries(self, lines):
         current_contract = None
-        lines = str_output.splitlines()
         for line in lines:
             if "INFO:root:Contract " in line:
                 if current_contract is not None:
-                    output.append(current_contract)
+                    yield current_contract
                 current_contract = {
                     'errors': []
                 }
@@ -48,37 +47,13 @@ class HoneyBadger(Parser):
                     'message': current_error
                 })
         if current_contract is not None:
-            output.append(current_contract)
-        return output
-
-    def parseSarif(self, honeybadger_output_results, file_path_in_repo):
-        resultsList = []
-        logicalLocationsList = []
-        rulesList = []
-
-        for analysis in honeybadger_output_results["analysis"]:
-            for result in analysis["errors"]:
-                rule = parseRule(tool="honeybadger", vulnerability=result["message"])
-                result = parseResult(tool="honeybadger", vulnerability=result["message"], level="warning",
-                                     uri=file_path_in_repo, line=result["line"], column=result["column"])
-
-                resultsList.append(result)
-
-                if isNotDuplicateRule(rule, rulesList):
-                    rulesList.append(rule)
-
-            logicalLocation = parseLogicalLocation(analysis["name"])
-
-            if logicalLocation is not None and isNotDuplicateLogicalLocation(logicalLocation, logicalLocationsList):
-                logicalLocationsList.append(logicalLocation)
-
-        artifact = parseArtifact(uri=file_path_in_repo)
-
-        tool = Tool(driver=ToolComponent(name="HoneyBadger", version="1.8.16", rules=rulesList,
-                                         information_uri="https://honeybadger.uni.lu/",
-                                         full_description=MultiformatMessageString(
-                                             text="An analysis tool to detect honeypots in Ethereum smart contracts")))
+            yield current_contract
 
-        run = Run(tool=tool, artifacts=[artifact], logical_locations=logicalLocationsList, results=resultsList)
+    def add_finding(self, run, analysis):
+        for result in analysis["errors"]:
+            rule = self.rule(result["message"])
+            run.results.append(parseResult(tool=self.tool, vulnerability=result["message"], level="warning",
+                                           uri=run.uri, line=result["line"], column=result["column"]))
+            run.add_rule(rule)
 
-        return run
+        run.add_logical_location(parseLogicalLocation(analysis["name"]))
@@ -1,13 +1,13 @@
-from sarif_om import *
-
 from src.output_parser.Parser import Parser
-from src.output_parser.SarifHolder import parseRule, \
-    parseResult, parseArtifact
+from src.output_parser.SarifHolder import parseResult
 
 
 class Maian(Parser):
-    def __init__(self):
-        pass
+    tool = "maian"
+    name = "Maian"
+    version = "5.10"
+    information_uri = "https://github.com/ivicanikolicsg/MAIAN"
+    description = "Maian is a tool for automatic detection of buggy Ethereum smart contracts of three different types prodigal, suicidal and greedy."
 
     def parse(self, str_output):
         output = {
@@ -15,7 +15,7 @@ class Maian(Parser):
             'is_prodigal_vulnerable': False,
             'is_suicidal_vulnerable': False,
         }
-        lines = str_output.splitlines()
+        lines = self.lines(str_output)
         for line in lines:
             if 'Locking vulnerability found!' in line:
                 output['is_lock_vulnerable'] = True
@@ -25,26 +25,13 @@ class Maian(Parser):
                 output['is_suicidal_vulnerable'] = True
         return output
 
-    def parseSarif(self, maian_output_results, file_path_in_repo):
-        resultsList = []
-        rulesList = []
-
-        for vulnerability in maian_output_results["analysis"].keys():
-            if maian_output_results["analysis"][vulnerability]:
-                rule = parseRule(tool="maian", vulnerability=vulnerability)
-                result = parseResult(tool="maian", vulnerability=vulnerability, level="error",
-                                     uri=file_path_in_repo)
-
-                rulesList.append(rule)
-                resultsList.append(result)
-
-        artifact = parseArtifact(uri=file_path_in_repo)
-
-        tool = Tool(driver=ToolComponent(name="Maian", version="5.10", rules=rulesList,
-                                         information_uri="https://github.com/ivicanikolicsg/MAIAN",
-                                         full_description=MultiformatMessageString(
-                                             text="Maian is a tool for automatic detection of buggy Ethereum smart contracts of three different types prodigal, suicidal and greedy.")))
+    def read(self, output, archive):
+        analysis = self.parse(output.lines())
+        return analysis, self.findings(analysis)
 
-        run = Run(tool=tool, artifacts=[artifact], results=resultsList)
+    def findings(self, analysis):
+        return [vulnerability for (vulnerability, found) in analysis.items() if found]
 
-        return run
+    def add_finding(self, run, vulnerability):
+        run.rules.append(self.rule(vulnerability))
+        run.results.append(parseResult(tool=self.tool, vulnerability=vulnerability, level="error", uri=run.uri))
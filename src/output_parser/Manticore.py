@@ -1,12 +1,18 @@
-from sarif_om import *
+import re
 
 from src.output_parser.Parser import Parser
-from src.output_parser.SarifHolder import isNotDuplicateRule, parseArtifact, parseRule, parseResult
+from src.output_parser.SarifHolder import parseResult
+
+re_manticore_results = re.compile('Results in /(mcore_.+)')
 
 
 class Manticore(Parser):
-    def __init__(self):
-        pass
+    tool = "manticore"
+    members = ("results/*/global.findings",)
+    name = "Manticore"
+    version = "0.3.5"
+    information_uri = "https://github.com/trailofbits/manticore"
+    description = "Manticore is a symbolic execution tool for analysis of smart contracts and binaries."
 
     def parse(self, str_output):
         output = []
@@ -33,29 +39,23 @@ class Manticore(Parser):
             output.append(current_vul)
         return output
 
-    def parseSarif(self, manticore_output_results, file_path_in_repo):
-        rulesList = []
-        resultsList = []
-
-        artifact = parseArtifact(uri=file_path_in_repo)
-
-        for multipleAnalysis in manticore_output_results["analysis"]:
-            for analysis in multipleAnalysis:
-                rule = parseRule(tool="manticore", vulnerability=analysis["name"])
-                result = parseResult(tool="manticore", vulnerability=analysis["name"], level="warning",
-                                     uri=file_path_in_repo,
-                                     line=analysis["line"], snippet=analysis["code"])
-
-                resultsList.append(result)
-
-                if isNotDuplicateRule(rule, rulesList):
-                    rulesList.append(rule)
-
-        tool = Tool(driver=ToolComponent(name="Manticore", version="0.3.5", rules=rulesList,
-                                         information_uri="https://github.com/trailofbits/manticore",
-                                         full_description=MultiformatMessageString(
-                                             text="Manticore is a symbolic execution tool for analysis of smart contracts and binaries.")))
-
-        run = Run(tool=tool, artifacts=[artifact], results=resultsList)
-
-        return run
+    def read(self, output, archive):
+        # the findings of each results folder reported in the output, from the archive of the container
+        analysis = []
+
+        def findings():
+            m = [match.group(1) for match in map(re_manticore_results.search, output.lines()) if match]
+            for fout in m:
+                found = self.parse(archive['results/' + fout + '/global.findings'].decode('utf8'))
+                analysis.append(found)
+                yield from found
+        return analysis, findings()
+
+    def findings(self, analysis):
+        return [finding for multipleAnalysis in analysis for finding in multipleAnalysis]
+
+    def add_finding(self, run, analysis):
+        rule = self.rule(analysis["name"])
+        run.results.append(parseResult(tool=self.tool, vulnerability=analysis["name"], level="warning", uri=run.uri,
+                                       line=analysis["line"], snippet=analysis["code"]))
+        run.add_rule(rule)
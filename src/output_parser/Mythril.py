@@ -1,40 +1,28 @@
-from sarif_om import *
-
-from src.output_parser.SarifHolder import isNotDuplicateRule, parseLogicalLocation, parseRule, \
-    parseResult, parseArtifact, isNotDuplicateLogicalLocation
-
-
-class Mythril:
-
-    def parseSarif(self, mythril_output_results, file_path_in_repo):
-        resultsList = []
-        logicalLocationsList = []
-        rulesList = []
-
-        for issue in mythril_output_results["analysis"]["issues"]:
-            rule = parseRule(tool="mythril", vulnerability=issue["title"], full_description=issue["description"])
-            result = parseResult(tool="mythril", vulnerability=issue["title"], level=issue["type"],
-                                 uri=file_path_in_repo,
-                                 line=issue["lineno"], snippet=issue["code"] if "code" in issue.keys() else None,
-                                 logicalLocation=parseLogicalLocation(issue["function"],
-                                                                      kind="function"))
-
-            logicalLocation = parseLogicalLocation(name=issue["function"], kind="function")
-
-            if isNotDuplicateLogicalLocation(logicalLocation, logicalLocationsList):
-                logicalLocationsList.append(logicalLocation)
-            resultsList.append(result)
-
-            if isNotDuplicateRule(rule, rulesList):
-                rulesList.append(rule)
-
-        artifact = parseArtifact(uri=file_path_in_repo)
-
-        tool = Tool(driver=ToolComponent(name="Mythril", version="0.4.25", rules=rulesList,
-                                         information_uri="https://mythx.io/",
-                                         full_description=MultiformatMessageString(
-                                             text="Mythril analyses EVM bytecode using symbolic analysis, taint analysis and control flow checking to detect a variety of security vulnerabilities.")))
-
-        run = Run(tool=tool, artifacts=[artifact], logical_locations=logicalLocationsList, results=resultsList)
-
-        return run
+import json
+
+from src.output_parser.Parser import Parser
+from src.output_parser.SarifHolder import parseLogicalLocation, parseResult
+
+
+class Mythril(Parser):
+    tool = "mythril"
+    name = "Mythril"
+    version = "0.4.25"
+    information_uri = "https://mythx.io/"
+    description = "Mythril analyses EVM bytecode using symbolic analysis, taint analysis and control flow checking to detect a variety of security vulnerabilities."
+    logical_locations = True
+
+    def read(self, output, archive):
+        analysis = json.loads(output.read())
+        return analysis, self.findings(analysis)
+
+    def findings(self, analysis):
+        return analysis["issues"]
+
+    def add_finding(self, run, issue):
+        rule = self.rule(issue["title"], full_description=issue["description"])
+        run.results.append(parseResult(tool=self.tool, vulnerability=issue["title"], level=issue["type"], uri=run.uri,
+                                       line=issue["lineno"], snippet=issue["code"] if "code" in issue.keys() else None,
+                                       logicalLocation=parseLogicalLocation(issue["function"], kind="function")))
+        run.add_logical_location(parseLogicalLocation(name=issue["function"], kind="function"))
+        run.add_rule(rule)
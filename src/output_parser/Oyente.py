@@ -1,13 +1,14 @@
-from sarif_om import *
-
 from src.output_parser.Parser import Parser
-from src.output_parser.SarifHolder import isNotDuplicateRule, parseRule, parseResult, \
-    parseArtifact, parseLogicalLocation, isNotDuplicateLogicalLocation
+from src.output_parser.SarifHolder import parseLogicalLocation, parseResult
 
 
 class Oyente(Parser):
-    def __init__(self):
-        pass
+    tool = "oyente"
+    name = "Oyente"
+    version = "0.4.25"
+    information_uri = "https://oyente.tech/"
+    description = "Oyente runs on symbolic execution, determines which inputs cause which program branches to execute, to find potential security vulnerabilities. Oyente works directly with EVM bytecode without access high level representation and does not provide soundness nor completeness."
+    logical_locations = True
 
     def extract_result_line(self, line):
         line = line.replace("INFO:symExec:	  ", '')
@@ -20,14 +21,12 @@ class Oyente(Parser):
             value = False
         return key, value
 
-    def parse(self, str_output):
-        output = []
+    def entries(self, lines):
         current_contract = None
-        lines = str_output.splitlines()
         for line in lines:
             if "INFO:root:contract" in line:
                 if current_contract is not None:
-                    output.append(current_contract)
+                    yield current_contract
                 current_contract = {
                     'errors': []
                 }
@@ -49,37 +48,13 @@ class Oyente(Parser):
                     'message': message.strip()
                 })
         if current_contract is not None:
-            output.append(current_contract)
-        return output
-
-    def parseSarif(self, oyente_output_results, file_path_in_repo):
-        resultsList = []
-        logicalLocationsList = []
-        rulesList = []
-
-        for analysis in oyente_output_results["analysis"]:
-            for result in analysis["errors"]:
-                rule = parseRule(tool="oyente", vulnerability=result["message"])
-                result = parseResult(tool="oyente", vulnerability=result["message"], level=result["level"],
-                                     uri=file_path_in_repo, line=result["line"], column=result["column"])
-
-                resultsList.append(result)
-
-                if isNotDuplicateRule(rule, rulesList):
-                    rulesList.append(rule)
-
-            logicalLocation = parseLogicalLocation(name=analysis["name"])
-
-            if isNotDuplicateLogicalLocation(logicalLocation, logicalLocationsList):
-                logicalLocationsList.append(logicalLocation)
-
-        artifact = parseArtifact(uri=file_path_in_repo)
-
-        tool = Tool(driver=ToolComponent(name="Oyente", version="0.4.25", rules=rulesList,
-                                         information_uri="https://oyente.tech/",
-                                         full_description=MultiformatMessageString(
-                                             text="Oyente runs on symbolic execution, determines which inputs cause which program branches to execute, to find potential security vulnerabilities. Oyente works directly with EVM bytecode without access high level representation and does not provide soundness nor completeness.")))
+            yield current_contract
 
-        run = Run(tool=tool, artifacts=[artifact], logical_locations=logicalLocationsList, results=resultsList)
+    def add_finding(self, run, analysis):
+        for result in analysis["errors"]:
+            rule = self.rule(result["message"])
+            run.results.append(parseResult(tool=self.tool, vulnerability=result["message"], level=result["level"],
+                                           uri=run.uri, line=result["line"], column=result["column"]))
+            run.add_rule(rule)
 
-        return run
+        run.add_logical_location(parseLogicalLocation(name=analysis["name"]))
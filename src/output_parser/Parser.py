@@ -1,9 +1,138 @@
+from sarif_om import Tool, ToolComponent, MultiformatMessageString, Run
+
+from src.output_parser.SarifHolder import isNotDuplicateRule, isNotDuplicateLogicalLocation, parseArtifact, \
+    parseRule, ArtifactList, LogicalLocationList, RuleList
+
+# rules kept by a parser for its next runs, beyond which they are built again
+RULE_CACHE_SIZE = 4096
+
+
+"""
+run of a tool being built from its findings: its rules and logical locations are kept unique as they are added
+"""
+class SarifRun:
+    def __init__(self, parser, results, file_path_in_repo):
+        self.parser = parser
+        self.contract = results['contract']
+        self.uri = file_path_in_repo
+        self.rules = RuleList()
+        self.results = []
+        self.logical_locations = LogicalLocationList() if parser.logical_locations else None
+
+    def add_rule(self, rule):
+        if isNotDuplicateRule(rule, self.rules):
+            self.rules.append(rule)
+
+    def add_logical_location(self, logicalLocation):
+        if isNotDuplicateLogicalLocation(logicalLocation, self.logical_locations):
+            self.logical_locations.append(logicalLocation)
+
+    def build(self):
+        parser = self.parser
+        tool = Tool(driver=ToolComponent(name=parser.name, version=parser.version, rules=self.rules,
+                                         information_uri=parser.information_uri,
+                                         full_description=parser.full_description()))
+        return Run(tool=tool, artifacts=ArtifactList([parseArtifact(uri=self.uri)]),
+                   logical_locations=self.logical_locations, results=self.results)
+
+
 class Parser:
+    # name of the tool in its configuration and in the vulnerability table
+    tool = None
+    # the members of the output_in_files archive the parser reads, in addition to the output of the container.
+    # a parser with members gives no analysis when the archive could not be fetched
+    members = ()
+    # driver of the runs
+    name = None
+    version = None
+    information_uri = None
+    description = None
+    # whether the runs list the logical locations of their findings
+    logical_locations = False
+
     def __init__(self):
-        pass
+        # the parsers are long-lived, their rules and description are built once for all their runs
+        self.rules = {}
+        self.description_message = None
 
     def parse(self, str):
+        return list(self.entries(self.lines(str)))
+
+    def entries(self, lines):
+        # the entries of the analysis, parsed from the lines of the output as they are read
+        return iter(())
+
+    def read(self, output, archive):
+        # the analysis of a container, and the findings to convert to SARIF. the entries of the parsers of the
+        # output lines are added to the analysis while the findings are iterated, in a single pass over the output
+        analysis = []
+
+        def findings():
+            for entry in self.entries(output.lines()):
+                analysis.append(entry)
+                yield entry
+        return analysis, findings()
+
+    def findings(self, analysis):
+        # the findings of an analysis already parsed
+        return analysis
+
+    def open_run(self, run):
+        # called before the findings are added to a run
         pass
 
-    def parseSarif(self, str, file_path_in_repo):
+    def add_finding(self, run, finding):
         pass
+
+    def parse_output(self, output, archive, results, file_path_in_repo):
+        # sets the analysis of the results from the output and the archive of a container, and returns its SARIF
+        # run, or None when there is none. a finding that cannot be converted to SARIF leaves the run out, as the
+        # conversion after the analysis did, but the analysis is still complete
+        if self.members and archive is None:
+            return None
+        run = self.new_run(results, file_path_in_repo)
+        error = None
+        (analysis, findings) = self.read(output, archive)
+        for finding in findings:
+            if error is None:
+                try:
+                    self.add_finding(run, finding)
+                except Exception as e:
+                    error = e
+        results['analysis'] = analysis
+        if error is not None:
+            raise error
+        return run.build()
+
+    def parseSarif(self, output_results, file_path_in_repo):
+        run = self.new_run(output_results, file_path_in_repo)
+        for finding in self.findings(output_results['analysis']):
+            self.add_finding(run, finding)
+        return run.build()
+
+    def new_run(self, results, file_path_in_repo):
+        run = SarifRun(self, results, file_path_in_repo)
+        self.open_run(run)
+        return run
+
+    def rule(self, vulnerability, full_description=None):
+        key = (vulnerability, full_description)
+        rule = self.rules.get(key)
+        if rule is None:
+            if len(self.rules) >= RULE_CACHE_SIZE:
+                self.rules.clear()
+            rule = self.rules[key] = parseRule(tool=self.tool, vulnerability=vulnerability,
+                                               full_description=full_description)
+        return rule
+
+    def full_description(self):
+        if self.description_message is None:
+            self.description_message = MultiformatMessageString(text=self.description)
+        return self.description_message
+
+    @staticmethod
+    def lines(output):
+        # the output of a tool may be a string or an iterator over its lines when it is streamed from the container
+        if isinstance(output, str):
+            return output.splitlines()
+        return output
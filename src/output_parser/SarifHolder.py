@@ -1,44 +1,61 @@
+import csv
+import json
+from abc import ABCMeta, abstractmethod
+from collections import Counter
+
 import attr
-import pandas
+import sarif_om
 from sarif_om import *
 
 from src.exception.VulnerabilityNotFoundException import VulnerabilityNotFoundException
 VERSION = "2.1.0"
 SCHEMA = "https://raw.githubusercontent.com/oasis-tcs/sarif-spec/master/Schemata/sarif-schema-2.1.0.json"
+VULNERABILITY_TABLE = "src/output_parser/sarif_vulnerability_mapping.csv"
 
 
 class SarifHolder:
     def __init__(self):
         self.sarif = SarifLog(runs=[], version=VERSION, schema_uri=SCHEMA)
         self.translationDict = dict()
+        # tool name -> run of the tool, so that merging a run does not scan the runs
+        self.runsByTool = dict()
 
     # each analysis is defined by a Run
     def addRun(self, newRun):
         # Check if already exists an analysis performed by the same tool
-        for run in self.sarif.runs:
-            if run.tool.driver.name == newRun.tool.driver.name:
-                # Append Unique Rules
-                for rule in newRun.tool.driver.rules:
-                    if isNotDuplicateRule(rule, run.tool.driver.rules):
-                        run.tool.driver.rules.append(rule)
-                # Append Unique Artifacts
-                for artifact in newRun.artifacts:
-                    if isNotDuplicateArtifact(artifact, run.artifacts):
-                        run.artifacts.append(artifact)
-                # Append Unique Logical Locations
-                if newRun.logical_locations is not None:
-                    for logicalLocation in newRun.logical_locations:
-                        if isNotDuplicateLogicalLocation(logicalLocation, run.logical_locations):
-                            run.logical_locations.append(logicalLocation)
-                # Append Results
-                for result in newRun.results:
-                    run.results.append(result)
-                return
-
+        run = self.runsByTool.get(newRun.tool.driver.name)
+        if run is not None:
+            # Append Unique Rules
+            for rule in newRun.tool.driver.rules:
+                if isNotDuplicateRule(rule, run.tool.driver.rules):
+                    run.tool.driver.rules.append(rule)
+            # Append Unique Artifacts
+            for artifact in newRun.artifacts:
+                if isNotDuplicateArtifact(artifact, run.artifacts):
+                    run.artifacts.append(artifact)
+            # Append Unique Logical Locations
+            if newRun.logical_locations is not None:
+                if run.logical_locations is None:
+                    run.logical_locations = LogicalLocationList()
+                for logicalLocation in newRun.logical_locations:
+                    if isNotDuplicateLogicalLocation(logicalLocation, run.logical_locations):
+                        run.logical_locations.append(logicalLocation)
+            # Append Results
+            run.results.extend(newRun.results)
+            return
+
+        # the run merges the next runs of its tool, its lists are indexed so that duplicates are found in O(1)
+        if not isinstance(newRun.tool.driver.rules, RuleList):
+            newRun.tool.driver.rules = RuleList(newRun.tool.driver.rules)
+        if not isinstance(newRun.artifacts, ArtifactList):
+            newRun.artifacts = ArtifactList(newRun.artifacts)
+        if newRun.logical_locations is not None and not isinstance(newRun.logical_locations, LogicalLocationList):
+            newRun.logical_locations = LogicalLocationList(newRun.logical_locations)
+        self.runsByTool[newRun.tool.driver.name] = newRun
         self.sarif.runs.append(newRun)
 
-    # to print the analysis from a given tool
-    def printToolRun(self, tool):
+    # SARIF log with the last run of a given tool only
+    def toolRunLog(self, tool):
         run = -1
         for i in range(len(self.sarif.runs)):
             if self.sarif.runs[i].tool.driver.name.lower() == tool.lower():
@@ -46,12 +63,24 @@ class SarifHolder:
         sarifIndividual = SarifLog(runs=[], version=VERSION, schema_uri=SCHEMA)
         if run != -1:
             sarifIndividual.runs.append(self.sarif.runs[run])
-        return self.serializeSarif(sarifIndividual)
+        return sarifIndividual
+
+    # to print the analysis from a given tool
+    def printToolRun(self, tool):
+        return self.serializeSarif(self.toolRunLog(tool))
 
     # print json formatted the SARIF file
     def print(self):
         return self.serializeSarif(self.sarif)
 
+    # writes the analysis from a given tool to a file, as json.dump(self.printToolRun(tool), file, indent=2) would
+    def writeToolRun(self, tool, file):
+        SarifWriter(file).write(self.toolRunLog(tool))
+
+    # writes the SARIF file, as json.dump(self.print(), file, indent=2) would
+    def write(self, file):
+        SarifWriter(file).write(self.sarif)
+
     # creates dictionary to fix variable names from sarif_om to standard sarif
     def serialize(self, inst, field, value):
         if field is not None:
@@ -84,6 +113,244 @@ class SarifHolder:
             return lis
 
 
+# sarif_om field name -> standard SARIF name, for all the sarif_om classes
+schemaPropertyNames = {field.name: field.metadata['schema_property_name']
+                       for cls in vars(sarif_om).values() if isinstance(cls, type) and attr.has(cls)
+                       for field in attr.fields(cls)}
+encodeString = json.encoder.encode_basestring_ascii
+# sarif_om class -> function writing its fields, see fieldWriter
+fieldWriters = dict()
+
+
+# builds the function writing the fields of a sarif_om class, from the SARIF name of each field encoded once and
+# the value left out with None as filterUnusedKeys does; the function returns the separator after the last field
+def fieldWriter(cls):
+    writer = fieldWriters.get(cls)
+    if writer is None:
+        fields = []
+        for field in attr.fields(cls):
+            # a factory default never equals a value, what it produces can
+            if isinstance(field.default, attr.Factory):
+                unused = field.default.factory()
+            elif field.name == "level" or field.default is attr.NOTHING:
+                unused = None
+            else:
+                unused = field.default
+            fields.append((field.name, encodeString(field.metadata['schema_property_name']) + ': ', unused))
+
+        def writeFields(sarifObj, parts, writeValue, inner):
+            separator = "{" + inner
+            for (name, key, unused) in fields:
+                value = getattr(sarifObj, name)
+                if value is None or (unused is not None and unused == value):
+                    continue
+                parts.append(separator)
+                parts.append(key)
+                if isinstance(value, str):
+                    parts.append(encodeString(value))
+                elif value.__class__ is int:
+                    parts.append(int.__repr__(value))
+                else:
+                    writeValue(value, inner)
+                separator = "," + inner
+            return separator
+
+        writer = fieldWriters[cls] = writeFields
+    return writer
+
+
+class SarifWriter:
+    """
+        Streams a sarif_om object to a file as indented JSON, in one pass over the objects.
+
+        The output is the same, byte for byte, as json.dump(..., indent=2) of SarifHolder.serializeSarif:
+        None values and defaults are left out (except "level"), fields are named after the SARIF schema
+        and values that are neither objects, lists, dicts, strings nor ints are written as null.
+    """
+
+    # parts buffered before they are written to the file
+    BUFFER_SIZE = 64 * 1024
+
+    def __init__(self, file):
+        self.file = file
+        self.parts = []
+
+    def write(self, sarifObj):
+        self.writeValue(sarifObj, '\n')
+        self.flush()
+
+    def flush(self):
+        self.file.write(''.join(self.parts))
+        # cleared in place, the writers hold on to the list
+        self.parts.clear()
+
+    # newline is the line break and the indentation of the value
+    def writeValue(self, value, newline):
+        writer = fieldWriters.get(value.__class__)
+        if writer is not None:
+            separator = writer(value, self.parts, self.writeValue, newline + '  ')
+            self.parts.append('{}' if separator[0] == '{' else newline + '}')
+        elif isinstance(value, str):
+            self.parts.append(encodeString(value))
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            self.writeList(value, newline)
+        elif value is True:
+            self.parts.append('true')
+        elif value is False:
+            self.parts.append('false')
+        elif isinstance(value, int):
+            self.parts.append(int.__repr__(value))
+        elif isinstance(value, dict):
+            self.writeDict(value, newline)
+        elif attr.has(value.__class__):
+            # a class met for the first time
+            fieldWriter(value.__class__)
+            self.writeValue(value, newline)
+        else:
+            self.parts.append('null')
+
+    def writeList(self, values, newline):
+        parts = self.parts
+        inner = newline + '  '
+        objectInner = inner + '  '
+        separator = '[' + inner
+        for value in values:
+            parts.append(separator)
+            # lists mostly hold objects, written here without going through writeValue
+            writer = fieldWriters.get(value.__class__)
+            if writer is not None:
+                objectSeparator = writer(value, parts, self.writeValue, objectInner)
+                parts.append('{}' if objectSeparator[0] == '{' else inner + '}')
+            else:
+                self.writeValue(value, inner)
+            separator = ',' + inner
+            if len(parts) >= self.BUFFER_SIZE:
+                self.flush()
+        parts.append('[]' if separator[0] == '[' else newline + ']')
+
+    def writeDict(self, values, newline):
+        inner = newline + '  '
+        separator = '{' + inner
+        for key, value in values.items():
+            self.parts.append(separator + encodeString(schemaPropertyNames[key]) + ': ')
+            self.writeValue(value, inner)
+            separator = ',' + inner
+        self.parts.append('{}' if separator[0] == '{' else newline + '}')
+
+
+class IndexedList(list, metaclass=ABCMeta):
+    """
+        List of SARIF objects that counts the keys of its items next to them, so that the
+        isNotDuplicate helpers answer without scanning the list.
+
+        Every method of list that adds or removes items keeps the count of keys, and the order
+        of the items, and so the SARIF output, is that of a plain list. Subclasses give the key
+        of an item.
+    """
+
+    def __init__(self, items=()):
+        # list, unlike object, does not refuse to build an instance of a class with abstract methods
+        if self.__abstractmethods__:
+            raise TypeError("Can't instantiate abstract class {} without a key".format(self.__class__.__name__))
+        super().__init__()
+        # key -> number of items with that key
+        self.keys = Counter()
+        self.extend(items)
+
+    @staticmethod
+    @abstractmethod
+    def key(item):
+        pass
+
+    def count_keys(self, keys):
+        for key in keys:
+            self.keys[key] += 1
+
+    def discount_items(self, items):
+        for item in items:
+            key = self.key(item)
+            self.keys[key] -= 1
+            if self.keys[key] == 0:
+                del self.keys[key]
+
+    def append(self, item):
+        self.count_keys([self.key(item)])
+        super().append(item)
+
+    def insert(self, index, item):
+        self.count_keys([self.key(item)])
+        super().insert(index, item)
+
+    def extend(self, items):
+        items = list(items)
+        self.count_keys([self.key(item) for item in items])
+        super().extend(items)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def __imul__(self, times):
+        super().__imul__(times)
+        self.keys = Counter(self.key(item) for item in self)
+        return self
+
+    def __setitem__(self, index, value):
+        # an index takes an item, a slice takes items
+        if isinstance(index, slice):
+            (replaced, value) = (self[index], list(value))
+            added = value
+        else:
+            (replaced, added) = ([self[index]], [value])
+        keys = [self.key(item) for item in added]
+        super().__setitem__(index, value)
+        self.discount_items(replaced)
+        self.count_keys(keys)
+
+    def __delitem__(self, index):
+        removed = self[index] if isinstance(index, slice) else [self[index]]
+        super().__delitem__(index)
+        self.discount_items(removed)
+
+    def remove(self, item):
+        index = self.index(item)
+        del self[index]
+
+    def pop(self, index=-1):
+        item = super().pop(index)
+        self.discount_items([item])
+        return item
+
+    def clear(self):
+        super().clear()
+        self.keys.clear()
+
+    def __reduce__(self):
+        # the keys are rebuilt from the items when unpickled
+        return self.__class__, (list(self),)
+
+
+# rules of a run, unique by id
+class RuleList(IndexedList):
+    @staticmethod
+    def key(rule):
+        return rule.id
+
+
+# artifacts of a run, unique by uri
+class ArtifactList(IndexedList):
+    @staticmethod
+    def key(artifact):
+        return artifact.location.uri
+
+
+# logical locations of a run, unique by name
+class LogicalLocationList(IndexedList):
+    @staticmethod
+    def key(logicalLocation):
+        return logicalLocation.name
+
+
 def parseRule(tool, vulnerability, full_description=None):
     vuln_info = findVulnerabilityOnTable(tool, vulnerability)
 
@@ -131,18 +398,77 @@ def parseLogicalLocation(name, kind="contract"):
     return LogicalLocation(name=name, kind=kind)
 
 
-# returns the row from the table for a given vulnerability and tool
-def findVulnerabilityOnTable(tool, vulnerability_found):
-    table = pandas.read_csv("src/output_parser/sarif_vulnerability_mapping.csv")
+class VulnerabilityIndex:
+    """
+        In-memory view of sarif_vulnerability_mapping.csv, loaded once per process and keyed by tool.
+
+        Lookups resolve in the same way the original table scan did: the first row (in table order)
+        whose vulnerability is a substring of the message found, or contains it, wins.
+    """
+
+    def __init__(self, table_path=VULNERABILITY_TABLE):
+        # tool -> {vulnerability: row} for messages that are exactly a table entry
+        self.exact = dict()
+        # tool -> ordered tuple of (vulnerability, row) used for substring matching
+        self.matchers = dict()
+        # (tool, vulnerability found) -> row, for messages already resolved
+        self.memo = dict()
+
+        rows = dict()
+        with open(table_path, newline='', encoding='utf-8') as table:
+            for row in csv.DictReader(table):
+                rows.setdefault(row["Tool"], []).append(row)
+
+        for tool, tool_rows in rows.items():
+            matcher = tuple((row["Vulnerability"], row) for row in tool_rows)
+            self.matchers[tool] = matcher
+            # an exact entry can still be shadowed by an earlier row that matches it as a substring,
+            # so the hash map stores whatever the ordered scan would return for it
+            exact = dict()
+            for vulnerability, _ in matcher:
+                if vulnerability not in exact:
+                    exact[vulnerability] = self.scan(matcher, vulnerability)
+            self.exact[tool] = exact
+
+    @staticmethod
+    def scan(matcher, vulnerability_found):
+        # Due to messages that have extra information (for example the line where the vulnerability was found)
+        # this loop will search if the vulnerability expressed on table exist inside vulnerability found
+        for vulnerability, row in matcher:
+            if vulnerability in vulnerability_found or vulnerability_found in vulnerability:
+                return row
+        return None
+
+    def find(self, tool, vulnerability_found):
+        key = (tool, vulnerability_found)
+        row = self.memo.get(key)
+        if row is not None:
+            return row
 
-    tool_table = table.loc[table["Tool"] == tool]
+        row = self.exact.get(tool, {}).get(vulnerability_found)
+        if row is None:
+            row = self.scan(self.matchers.get(tool, ()), vulnerability_found)
+        if row is None:
+            raise VulnerabilityNotFoundException(tool=tool, vulnerability=vulnerability_found)
 
-    # Due to messages that have extra information (for example the line where the vulnerability was found) this loop
-    # will search if the vulnerability expressed on table exist inside vulnerability found
-    for index, row in tool_table.iterrows():
-        if row["Vulnerability"] in vulnerability_found or vulnerability_found in row["Vulnerability"]:
-            return row
-    raise VulnerabilityNotFoundException(tool=tool, vulnerability=vulnerability_found)
+        self.memo[key] = row
+        return row
+
+
+vulnerabilityIndex = None
+
+
+# returns the process-wide vulnerability index, loading the table on first use
+def getVulnerabilityIndex():
+    global vulnerabilityIndex
+    if vulnerabilityIndex is None:
+        vulnerabilityIndex = VulnerabilityIndex()
+    return vulnerabilityIndex
+
+
+# returns the row from the table for a given vulnerability and tool
+def findVulnerabilityOnTable(tool, vulnerability_found):
+    return getVulnerabilityIndex().find(tool, vulnerability_found)
 
 
 # given a level produced by a tool, returns the level in SARIF format
@@ -162,6 +488,8 @@ def parseLevel(level):
 
 # Returns True when rule is unique
 def isNotDuplicateRule(newRule, rulesList):
+    if isinstance(rulesList, RuleList):
+        return newRule.id not in rulesList.keys
     for rule in rulesList:
         if rule.id == newRule.id:
             return False
@@ -170,6 +498,8 @@ def isNotDuplicateRule(newRule, rulesList):
 
 # Returns True when artifact is unique
 def isNotDuplicateArtifact(newArtifact, artifactsList):
+    if isinstance(artifactsList, ArtifactList):
+        return newArtifact.location.uri not in artifactsList.keys
     for artifact in artifactsList:
         if artifact.location.uri == newArtifact.location.uri:
             return False
@@ -178,6 +508,8 @@ def isNotDuplicateArtifact(newArtifact, artifactsList):
 
 # Returns True when LogicalLocation is unique
 def isNotDuplicateLogicalLocation(newLogicalLocation, logicalLocationList):
+    if isinstance(logicalLocationList, LogicalLocationList):
+        return newLogicalLocation.name not in logicalLocationList.keys
     for logicalLocation in logicalLocationList:
         if logicalLocation.name == newLogicalLocation.name:
             return False
@@ -0,0 +1,193 @@
+import json
+import os
+import shutil
+import tempfile
+
+import attr
+
+from src.output_parser.SarifHolder import SarifHolder, SarifWriter, VERSION
+
+MANIFEST = "manifest.json"
+# indentation of the results of a run in a SARIF file: log > runs > run > results
+RESULTS_NEWLINE = "\n" + "  " * 4
+
+
+class SpooledResults:
+    """
+        Results of a run kept in a temporary file, already written as the items of the "results"
+        list of a SARIF file, so that the results of a sweep never stay in memory.
+    """
+
+    def __init__(self, directory):
+        self.file = tempfile.TemporaryFile('w+', encoding='utf-8', dir=directory)
+        self.count = 0
+
+    def extend(self, results):
+        writer = SarifWriter(self.file)
+        for result in results:
+            writer.parts.append((',' if self.count else '') + RESULTS_NEWLINE)
+            writer.writeValue(result, RESULTS_NEWLINE)
+            self.count += 1
+        writer.flush()
+
+    def copyTo(self, file):
+        self.file.seek(0)
+        shutil.copyfileobj(self.file, file)
+
+    def close(self):
+        self.file.close()
+
+
+class ShardWriter(SarifWriter):
+    # writes the spooled results of the runs in place of their results
+    def writeValue(self, value, newline):
+        if isinstance(value, SpooledResults):
+            if value.count == 0:
+                self.parts.append('[]')
+                return
+            self.parts.append('[')
+            self.flush()
+            value.copyTo(self.file)
+            self.parts.append(newline + ']')
+        else:
+            super().writeValue(value, newline)
+
+
+class SarifShard:
+    """
+        One SARIF file of the aggregate, with a run per tool: the rules, artifacts and logical
+        locations of the runs are merged in memory as SarifHolder does, their results are spooled.
+    """
+
+    def __init__(self, path, expected):
+        self.path = path
+        self.holder = SarifHolder()
+        self.spools = dict()
+        self.fileNames = set()
+        # analyses whose runs go to the shard, it is written once they are all added
+        self.expected = expected
+
+    def addRuns(self, runs, fileName):
+        self.fileNames.add(fileName)
+        for run in runs:
+            tool = run.tool.driver.name
+            if tool not in self.spools:
+                self.spools[tool] = SpooledResults(os.path.dirname(self.path))
+            self.spools[tool].extend(run.results or [])
+            # the run is copied down to its lists, the runs of the first tool run are extended by the merge
+            driver = attr.evolve(run.tool.driver, rules=list(run.tool.driver.rules or []))
+            self.holder.addRun(attr.evolve(run, tool=attr.evolve(run.tool, driver=driver),
+                                           artifacts=list(run.artifacts or []),
+                                           logical_locations=list(run.logical_locations)
+                                           if run.logical_locations is not None else None,
+                                           results=[]))
+        self.expected -= 1
+
+    def write(self):
+        for run in self.holder.sarif.runs:
+            run.results = self.spools[run.tool.driver.name]
+        entry = {
+            'path': os.path.basename(self.path),
+            'tools': [run.tool.driver.name for run in self.holder.sarif.runs],
+            'files': sorted(self.fileNames),
+            'results': sum(spool.count for spool in self.spools.values())
+        }
+        # written aside and renamed, so that readers never see a partial shard
+        (fd, staging) = tempfile.mkstemp(prefix='.', suffix='.sarif', dir=os.path.dirname(self.path))
+        try:
+            with os.fdopen(fd, 'w') as f:
+                ShardWriter(f).write(self.holder.sarif)
+            os.replace(staging, self.path)
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+            self.close()
+        return entry
+
+    def close(self):
+        for spool in self.spools.values():
+            spool.close()
+        self.spools = dict()
+
+
+class SarifAggregate:
+    """
+        Unique SARIF output of a sweep, written as the analyses finish instead of from a holder of all runs.
+
+        Without sharding, the runs go to a single file written at the end of the sweep. Sharded by tool, or
+        by N contracts in file order, each shard is written as soon as its last analysis is added and a
+        manifest listing the written shards is updated, so that they can be read before the sweep ends.
+        The results of a run follow the order in which the analyses finish.
+    """
+
+    def __init__(self, path, tasks, fileNames, sharding=None):
+        self.sharding = sharding
+        self.shards = dict()
+        self.written = []
+        self.expected = dict()
+        if sharding is None:
+            self.path = path
+            self.directory = os.path.dirname(path) or '.'
+        else:
+            self.directory = os.path.splitext(path)[0] + '_sarif'
+            os.makedirs(self.directory, exist_ok=True)
+            self.path = os.path.join(self.directory, MANIFEST)
+        # the shard of each contract, by its position in the sweep when sharded by N contracts
+        self.fileShards = dict()
+        for fileName in fileNames:
+            self.fileShards.setdefault(fileName, len(self.fileShards))
+        for (tool, fileName) in tasks:
+            key = self.shardKey(tool, fileName)
+            self.expected[key] = self.expected.get(key, 0) + 1
+        self.writeManifest(complete=False)
+
+    def shardKey(self, tool, fileName):
+        if self.sharding is None:
+            return None
+        if self.sharding == 'tool':
+            return tool
+        return self.fileShards[fileName] // self.sharding
+
+    def shardPath(self, key):
+        if key is None:
+            return self.path
+        if self.sharding == 'tool':
+            return os.path.join(self.directory, key + '.sarif')
+        return os.path.join(self.directory, 'contracts_%05d.sarif' % key)
+
+    # adds the runs of a finished analysis, and writes its shard if it was the last one of the shard
+    def addRuns(self, tool, fileName, runs):
+        key = self.shardKey(tool, fileName)
+        shard = self.shards.get(key)
+        if shard is None:
+            shard = self.shards[key] = SarifShard(self.shardPath(key), self.expected.get(key, 0))
+        shard.addRuns(runs, fileName)
+        if shard.expected <= 0:
+            self.writeShard(key)
+
+    def writeShard(self, key):
+        self.written.append(self.shards.pop(key).write())
+        self.writeManifest(complete=False)
+
+    # writes the shards of the analyses that did not all finish, then the complete manifest
+    def close(self):
+        if self.sharding is None and None not in self.shards and not self.written:
+            # a sweep without analyses still has its (empty) unique output
+            self.shards[None] = SarifShard(self.path, 0)
+        for key in sorted(self.shards, key=str):
+            self.writeShard(key)
+        self.writeManifest(complete=True)
+
+    def writeManifest(self, complete):
+        if self.sharding is None:
+            return
+        manifest = {
+            'version': VERSION,
+            'sharding': self.sharding,
+            'complete': complete,
+            'shards': self.written
+        }
+        (fd, staging) = tempfile.mkstemp(prefix='.', suffix='.json', dir=self.directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(staging, self.path)
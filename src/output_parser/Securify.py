@@ -1,80 +1,80 @@
-import numpy
-from sarif_om import *
-
-from src.output_parser.SarifHolder import parseLogicalLocation, parseArtifact, \
-    parseRule, parseResult, isNotDuplicateLogicalLocation
-
-
-class Securify:
-
-    def parseSarif(self, securify_output_results, file_path_in_repo):
-        resultsList = []
-        logicalLocationsList = []
-        rulesList = []
-
-        for name, analysis in securify_output_results["analysis"].items():
-
-            contractName = name.split(':')[1]
-            logicalLocation = parseLogicalLocation(name=contractName)
-
-            if isNotDuplicateLogicalLocation(logicalLocation, logicalLocationsList):
-                logicalLocationsList.append(logicalLocation)
-
-            for vuln, analysisResult in analysis["results"].items():
-                rule = parseRule(tool="securify", vulnerability=vuln)
-                # Extra loop to add unique rule to tool in sarif
-                for level, lines in analysisResult.items():
-                    if len(lines) > 0:
-                        rulesList.append(rule)
-                        break
-                for level, lines in analysisResult.items():
-                    for lineNumber in lines:
-                        result = parseResult(tool="securify", vulnerability=vuln, level=level, uri=file_path_in_repo,
-                                             line=lineNumber)
-
-                        resultsList.append(result)
-
-        artifact = parseArtifact(uri=file_path_in_repo)
+import json
 
-        tool = Tool(driver=ToolComponent(name="Securify", version="0.4.25", rules=rulesList,
-                                         information_uri="https://github.com/eth-sri/securify2",
-                                         full_description=MultiformatMessageString(
-                                             text="Securify uses formal verification, also relying on static analysis checks. Securify’s analysis consists of two steps. First, it symbolically analyzes the contract’s dependency graph to extract precise semantic information from the code. Then, it checks compliance and violation patterns that capture sufficient conditions for proving if a property holds or not.")))
-
-        run = Run(tool=tool, artifacts=[artifact], logical_locations=logicalLocationsList, results=resultsList)
+import numpy
 
-        return run
+from src.output_parser.Parser import Parser
+from src.output_parser.SarifHolder import parseLogicalLocation, parseResult
+
+
+class Securify(Parser):
+    tool = "securify"
+    members = ("results/results.json", "results/live.json")
+    name = "Securify"
+    version = "0.4.25"
+    information_uri = "https://github.com/eth-sri/securify2"
+    description = "Securify uses formal verification, also relying on static analysis checks. Securify’s analysis consists of two steps. First, it symbolically analyzes the contract’s dependency graph to extract precise semantic information from the code. Then, it checks compliance and violation patterns that capture sufficient conditions for proving if a property holds or not."
+    logical_locations = True
+
+    def parse_output(self, output, archive, results, file_path_in_repo):
+        # the results of securify are printed, or written to results.json, or only to live.json when it did not
+        # finish. the printed results are not converted to SARIF
+        if output.first_char() == '{':
+            results['analysis'] = json.loads(output.read())
+            return None
+        if archive is None:
+            return None
+        try:
+            results['analysis'] = json.loads(archive['results/results.json'])
+            return self.parseSarif(results, file_path_in_repo)
+        except Exception as e:
+            print('pas terrible')
+            results['analysis'] = {
+                results['contract']: {
+                    'results': json.loads(archive['results/live.json'])["patternResults"]
+                }
+            }
+            return self.parseSarifFromLiveJson(results, file_path_in_repo)
+
+    def findings(self, analysis):
+        return analysis.items()
+
+    def add_finding(self, run, contract):
+        (name, analysis) = contract
+        contractName = name.split(':')[1]
+        run.add_logical_location(parseLogicalLocation(name=contractName))
+
+        for vuln, analysisResult in analysis["results"].items():
+            rule = self.rule(vuln)
+            # Extra loop to add unique rule to tool in sarif
+            for level, lines in analysisResult.items():
+                if len(lines) > 0:
+                    run.rules.append(rule)
+                    break
+            for level, lines in analysisResult.items():
+                for lineNumber in lines:
+                    run.results.append(parseResult(tool=self.tool, vulnerability=vuln, level=level, uri=run.uri,
+                                                   line=lineNumber))
 
     def parseSarifFromLiveJson(self, securify_output_results, file_path_in_repo):
-        resultsList = []
-        rulesList = []
+        run = self.new_run(securify_output_results, file_path_in_repo)
+        run.logical_locations = None
 
         for name, analysis in securify_output_results["analysis"].items():
             for vuln, analysisResult in analysis["results"].items():
-                rule = parseRule(tool="securify", vulnerability=vuln)
+                rule = self.rule(vuln)
                 # Extra loop to add unique rule to tool in sarif
                 for level, lines in analysisResult.items():
                     if not isinstance(lines, list):
                         continue
                     if len(lines) > 0:
-                        rulesList.append(rule)
+                        run.rules.append(rule)
                         break
                 for level, lines in analysisResult.items():
                     if not isinstance(lines, list):
                         continue
                     for lineNumber in list(numpy.unique(lines)):
-                        result = parseResult(tool="securify", vulnerability=vuln, level=level, uri=file_path_in_repo,
-                                             line=int(lineNumber))  # without int() lineNumber returns null??!
-
-                        resultsList.append(result)
-
-        artifact = parseArtifact(uri=file_path_in_repo)
-
-        tool = Tool(driver=ToolComponent(name="Securify", version="0.4.25", rules=rulesList,
-                                         information_uri="https://github.com/eth-sri/securify2",
-                                         full_description=MultiformatMessageString(
-                                             text="Securify uses formal verification, also relying on static analysis checks. Securify’s analysis consists of two steps. First, it symbolically analyzes the contract’s dependency graph to extract precise semantic information from the code. Then, it checks compliance and violation patterns that capture sufficient conditions for proving if a property holds or not.")))
-
-        run = Run(tool=tool, artifacts=[artifact], results=resultsList)
+                        # without int() lineNumber returns null??!
+                        run.results.append(parseResult(tool=self.tool, vulnerability=vuln, level=level, uri=run.uri,
+                                                       line=int(lineNumber)))
 
-        return run
+        return run.build()
@@ -1,12 +1,14 @@
-from sarif_om import *
-
 from src.output_parser.Parser import Parser
-from src.output_parser.SarifHolder import isNotDuplicateRule, parseArtifact, parseRule, parseResult, parseLogicalLocation
+from src.output_parser.SarifHolder import parseLogicalLocation, parseResult
 
 
 class Smartcheck(Parser):
-    def __init__(self):
-        pass
+    tool = "smartcheck"
+    name = "SmartCheck"
+    version = "0.0.12"
+    information_uri = "https://tool.smartdec.net/"
+    description = "Securify automatically checks for vulnerabilities and bad coding practices. It runs lexical and syntactical analysis on Solidity source code."
+    logical_locations = True
 
     def extract_result_line(self, line):
         index_split = line.index(":")
@@ -16,14 +18,12 @@ class Smartcheck(Parser):
             value = int(value)
         return (key, value)
 
-    def parse(self, str_output):
-        output = []
+    def entries(self, lines):
         current_error = None
-        lines = str_output.splitlines()
         for line in lines:
             if "ruleId: " in line:
                 if current_error is not None:
-                    output.append(current_error)
+                    yield current_error
                 current_error = {
                     'name': line[line.index("ruleId: ") + 8:]
                 }
@@ -32,33 +32,14 @@ class Smartcheck(Parser):
                 current_error[key] = value
 
         if current_error is not None:
-            output.append(current_error)
-        return output
-
-    def parseSarif(self, smartcheck_output_results, file_path_in_repo):
-        resultsList = []
-        rulesList = []
-
-        artifact = parseArtifact(uri=file_path_in_repo)
-
-        for analysis in smartcheck_output_results["analysis"]:
-            rule = parseRule(tool="smartcheck", vulnerability=analysis["name"])
-            result = parseResult(tool="smartcheck", vulnerability=analysis["name"], level=analysis["severity"],
-                                 uri=file_path_in_repo,
-                                 line=analysis["line"], column=analysis["column"], snippet=analysis["content"])
-
-            resultsList.append(result)
-
-            if isNotDuplicateRule(rule, rulesList):
-                rulesList.append(rule)
-
-        logicalLocation = parseLogicalLocation(name=smartcheck_output_results["contract"])
-
-        tool = Tool(driver=ToolComponent(name="SmartCheck", version="0.0.12", rules=rulesList,
-                                         information_uri="https://tool.smartdec.net/",
-                                         full_description=MultiformatMessageString(
-                                             text="Securify automatically checks for vulnerabilities and bad coding practices. It runs lexical and syntactical analysis on Solidity source code.")))
+            yield current_error
 
-        run = Run(tool=tool, artifacts=[artifact], logical_locations=[logicalLocation], results=resultsList)
+    def open_run(self, run):
+        run.add_logical_location(parseLogicalLocation(name=run.contract))
 
-        return run
+    def add_finding(self, run, analysis):
+        rule = self.rule(analysis["name"])
+        run.results.append(parseResult(tool=self.tool, vulnerability=analysis["name"], level=analysis["severity"],
+                                       uri=run.uri, line=analysis["line"], column=analysis["column"],
+                                       snippet=analysis["content"]))
+        run.add_rule(rule)
@@ -1,16 +1,16 @@
-from sarif_om import *
-
 from src.output_parser.Parser import Parser
-from src.output_parser.SarifHolder import isNotDuplicateRule, parseRule, parseResult, parseArtifact, parseLogicalLocation
+from src.output_parser.SarifHolder import parseLogicalLocation, parseResult
 
 
 class Solhint(Parser):
-    def __init__(self):
-        pass
-
-    def parse(self, str_output):
-        output = []
-        lines = str_output.splitlines()
+    tool = "solhint"
+    name = "Solhint"
+    version = "3.3.2"
+    information_uri = "https://protofire.github.io/solhint/"
+    description = "Open source project for linting solidity code. This project provide both security and style guide validations."
+    logical_locations = True
+
+    def entries(self, lines):
         for line in lines:
             if ":" in line:
                 s_result = line.split(':')
@@ -22,40 +22,20 @@ class Solhint(Parser):
                 message = end_error[1:end_error.index('[') - 1]
                 level = end_error[end_error.index('[') + 1: end_error.index('/')]
                 type = end_error[end_error.index('/') + 1: len(end_error) - 1]
-                output.append({
+                yield {
                     'file': file,
                     'line': line,
                     'column': column,
                     'message': message,
                     'level': level,
                     'type': type
-                })
-
-        return output
-
-    def parseSarif(self, solhint_output_results, file_path_in_repo):
-        resultsList = []
-        rulesList = []
-
-        for analysis in solhint_output_results["analysis"]:
-            rule = parseRule(tool="solhint", vulnerability=analysis["type"], full_description=analysis["message"])
-            result = parseResult(tool="solhint", vulnerability=analysis["type"], level=analysis["level"],
-                                 uri=file_path_in_repo, line=int(analysis["line"]), column=int(analysis["column"]))
-
-            resultsList.append(result)
-
-            if isNotDuplicateRule(rule, rulesList):
-                rulesList.append(rule)
-
-        artifact = parseArtifact(uri=file_path_in_repo)
-
-        logicalLocation = parseLogicalLocation(name=solhint_output_results["contract"], kind="contract")
-
-        tool = Tool(driver=ToolComponent(name="Solhint", version="3.3.2", rules=rulesList,
-                                         information_uri="https://protofire.github.io/solhint/",
-                                         full_description=MultiformatMessageString(
-                                             text="Open source project for linting solidity code. This project provide both security and style guide validations.")))
+                }
 
-        run = Run(tool=tool, artifacts=[artifact], logical_locations=[logicalLocation], results=resultsList)
+    def open_run(self, run):
+        run.add_logical_location(parseLogicalLocation(name=run.contract, kind="contract"))
 
-        return run
+    def add_finding(self, run, analysis):
+        rule = self.rule(analysis["type"], full_description=analysis["message"])
+        run.results.append(parseResult(tool=self.tool, vulnerability=analysis["type"], level=analysis["level"],
+                                       uri=run.uri, line=int(analysis["line"]), column=int(analysis["column"])))
+        run.add_rule(rule)
@@ -0,0 +1,56 @@
+import os
+from importlib import import_module
+
+# tool name -> parser of its results, one instance per process for all its analyses
+parsers = dict()
+
+# tool name -> class of the parser in src/output_parser of the same name, imported with the first analysis of the
+# tool so that a run only loads the parsers (and their dependencies) of the tools it uses
+PARSER_CLASSES = {
+    'conkas': 'Conkas',
+    'honeybadger': 'HoneyBadger',
+    'maian': 'Maian',
+    'manticore': 'Manticore',
+    'manticore2': 'Manticore2',
+    'mythril': 'Mythril',
+    'mythril2': 'Mythril2',
+    'osiris': 'Osiris',
+    'oyente': 'Oyente',
+    'securify': 'Securify',
+    'securify2': 'Securify2',
+    'slither': 'Slither',
+    'slither2': 'Slither2',
+    'smartcheck': 'Smartcheck',
+    'solhint': 'Solhint',
+}
+
+
+"""
+registers the parser of a tool, in place of the one it had if any
+"""
+def register(parser):
+    parsers[parser.tool] = parser
+    return parser
+
+
+"""
+parser of a tool, or None for a tool whose results are not parsed
+"""
+def get_parser(tool):
+    parser = parsers.get(tool)
+    if parser is None and tool in PARSER_CLASSES:
+        name = PARSER_CLASSES[tool]
+        parser = register(getattr(import_module('src.output_parser.' + name), name)())
+    return parser
+
+
+"""
+source files the results of a tool are built by: its parser, the parser base class, the SARIF writers and the
+vulnerability table
+"""
+def parser_sources(tool):
+    folder = os.path.dirname(os.path.abspath(__file__))
+    names = ['Parser.py', 'SarifHolder.py', 'SarifStream.py', 'sarif_vulnerability_mapping.csv']
+    if tool in PARSER_CLASSES:
+        names.insert(0, PARSER_CLASSES[tool] + '.py')
+    return [os.path.join(folder, name) for name in names]
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from shutil import copyfile, rmtree
+from time import time
+
+CACHE_DIR = 'results/cache'
+CACHE_SIZE = 1024  # MB
+# version of what an entry holds, changed when the stored results or runs change form so that older entries miss
+CACHE_VERSION = 2
+
+# tool -> digest of the sources of its parser, read once per process
+parser_digests = dict()
+
+
+"""
+digest of the code the results of a tool are parsed by, so that a changed parser does not serve the results of the
+former one
+"""
+def parser_digest(tool):
+    from src.output_parser.registry import parser_sources
+
+    if tool not in parser_digests:
+        digest = hashlib.sha256()
+        for path in parser_sources(tool):
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        parser_digests[tool] = digest.digest()
+    return parser_digests[tool]
+
+
+"""
+local store of analysis results addressed by the contract, the tool configuration, the image and the command
+
+each entry keeps the raw tool output (result.log), the v1 results (result.json) and the SARIF runs (runs.pickle),
+so that the result files can be written again for any output version without starting a container
+"""
+class ResultCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_size=CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size * 1024 * 1024
+
+    # key of an analysis: contract bytes, tool YAML, resolved image, command line, the path reported in SARIF, the
+    # output version, the code of the parser of the tool and the version of the entries
+    def key(self, file, cfg_path, image_id, cmd, file_path_in_repo, tool, output_version):
+        digest = hashlib.sha256()
+        for path in (file, cfg_path):
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        for value in (image_id, cmd, file_path_in_repo, output_version, CACHE_VERSION):
+            digest.update(b'\0' + str(value).encode('utf8'))
+        digest.update(parser_digest(tool))
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def load(self, key):
+        # returns the path of the stored result.log, the results and the runs, None on a miss
+        entry = self.entry_path(key)
+        log_path = os.path.join(entry, 'result.log')
+        try:
+            if not os.path.isfile(log_path):
+                return None
+            with open(os.path.join(entry, 'result.json'), 'r', encoding='utf-8') as f:
+                results = json.load(f)
+            with open(os.path.join(entry, 'runs.pickle'), 'rb') as f:
+                runs = pickle.load(f)
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+            return None
+        # the modification time of an entry is its last use, for LRU eviction
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return log_path, results, runs
+
+    def store(self, key, log_path, results, runs):
+        entry = self.entry_path(key)
+        if os.path.isdir(entry):
+            return
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        # entries are written aside and renamed so that concurrent workers never read a partial entry
+        staging = tempfile.mkdtemp(prefix='.' + key + '.', dir=os.path.dirname(entry))
+        try:
+            copyfile(log_path, os.path.join(staging, 'result.log'))
+            with open(os.path.join(staging, 'result.json'), 'w', encoding='utf-8') as f:
+                json.dump(results, f)
+            with open(os.path.join(staging, 'runs.pickle'), 'wb') as f:
+                pickle.dump(runs, f)
+            os.rename(staging, entry)
+        except OSError:
+            rmtree(staging, ignore_errors=True)
+
+    def entries(self):
+        # returns (last use, size in bytes, path) of every entry
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for prefix in os.scandir(self.cache_dir):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if not entry.is_dir() or entry.name.startswith('.'):
+                    continue
+                size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                entries.append((entry.stat().st_mtime, size, entry.path))
+        return entries
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            'entries': len(entries),
+            'size': sum(size for _, size, _ in entries),
+            'max_size': self.max_size,
+            'oldest': min((used for used, _, _ in entries), default=None),
+            'newest': max((used for used, _, _ in entries), default=None)
+        }
+
+    def prune(self, max_size=None, older_than=None):
+        # evict least recently used entries until the store fits in max_size bytes, returns the evicted count
+        if max_size is None:
+            max_size = self.max_size
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for used, size, path in entries:
+            if total <= max_size and (older_than is None or used >= time() - older_than):
+                break
+            rmtree(path, ignore_errors=True)
+            total -= size
+            evicted += 1
+        return evicted
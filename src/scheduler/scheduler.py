@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+import heapq
+import json
+import os
+
+import numpy
+
+from src.source_metadata.source_metadata import get_source_metadata
+
+RESULTS_DIR = 'results'
+# past runs of a (tool, contract) read to learn its duration
+HISTORY_DEPTH = 3
+# an adaptive timeout is only set from this many completed analyses of the tool, the most recent ones first
+ADAPTIVE_MIN_SAMPLES = 20
+ADAPTIVE_MAX_SAMPLES = 1000
+# margin above the percentile of past durations, and the lowest adaptive timeout in seconds
+ADAPTIVE_MARGIN = 1.5
+ADAPTIVE_MIN_TIMEOUT = 60
+
+
+"""
+cheap features of a contract: size in KB, number of contracts, and whether it needs a solc<5 image
+"""
+def contract_features(file):
+    metadata = get_source_metadata(file)
+    old_solc = 1.0 if metadata['solc_version'] is not None and metadata['solc_version'][0] < 5 else 0.0
+    return (os.path.getsize(file) / 1024, float(len(metadata['contracts'])), old_solc)
+
+
+"""
+per-tool linear model of analysis durations, learnt from the duration recorded in past result.json files
+"""
+class DurationModel:
+    def __init__(self):
+        self.samples = {}
+        self.coefficients = {}
+        self.means = {}
+
+    def add(self, tool, features, duration):
+        self.samples.setdefault(tool, []).append((features, duration))
+
+    def load_results(self, tool, file_names, features, results_dir=RESULTS_DIR):
+        # read the durations of the contracts of the sweep from the most recent runs of the tool
+        tool_dir = os.path.join(results_dir, tool)
+        if not os.path.isdir(tool_dir):
+            return
+        runs = sorted((d for d in os.listdir(tool_dir) if os.path.isdir(os.path.join(tool_dir, d))), reverse=True)
+        wanted = set(file_names)
+        found = {}
+        for run in runs:
+            if not wanted:
+                break
+            for file_name in wanted.intersection(os.listdir(os.path.join(tool_dir, run))):
+                try:
+                    with open(os.path.join(tool_dir, run, file_name, 'result.json'), 'r', encoding='utf-8') as f:
+                        duration = json.load(f)['duration']
+                except (OSError, ValueError, KeyError, TypeError):
+                    continue
+                self.add(tool, features[file_name], duration)
+                found[file_name] = found.get(file_name, 0) + 1
+                if found[file_name] >= HISTORY_DEPTH:
+                    wanted.discard(file_name)
+
+    def fit(self):
+        for tool, samples in self.samples.items():
+            durations = numpy.array([duration for _, duration in samples], dtype=float)
+            self.means[tool] = float(durations.mean())
+            if len(samples) < 4:
+                continue
+            x = numpy.array([(1.0,) + tuple(features) for features, _ in samples], dtype=float)
+            (coefficients, _, _, _) = numpy.linalg.lstsq(x, durations, rcond=None)
+            self.coefficients[tool] = coefficients
+
+    def predict(self, tool, features):
+        if tool in self.coefficients:
+            prediction = float(numpy.dot(self.coefficients[tool], (1.0,) + tuple(features)))
+            return max(prediction, 0.0)
+        if tool in self.means:
+            return self.means[tool]
+        if self.means:
+            # a tool never run before is assumed to cost as much as the average tool, scaled by the contract size
+            return sum(self.means.values()) / len(self.means) * (1 + features[0] / 100)
+        return features[0]
+
+
+"""
+order the tasks longest expected job first, through a priority queue on the predicted durations
+"""
+def longest_first(tasks, predictions):
+    queue = [(-predictions[(task[0], task[1])], index, task) for index, task in enumerate(tasks)]
+    heapq.heapify(queue)
+    return [heapq.heappop(queue)[2] for _ in range(len(queue))]
+
+
+"""
+makespan of durations started in order on a number of workers, each job going to the first free worker
+"""
+def simulate_makespan(durations, workers):
+    free_at = [0.0] * max(workers, 1)
+    for duration in durations:
+        heapq.heapreplace(free_at, free_at[0] + duration)
+    return max(free_at)
+
+
+"""
+predict the durations of the tasks and order them, returns the ordered tasks and the predictions
+"""
+def schedule(tasks, results_dir=RESULTS_DIR):
+    files = sorted(set(task[1] for task in tasks))
+    features = {}
+    file_features = {}
+    for file in files:
+        file_features[file] = contract_features(file)
+        features[os.path.splitext(os.path.basename(file))[0]] = file_features[file]
+
+    model = DurationModel()
+    for tool in sorted(set(task[0] for task in tasks)):
+        model.load_results(tool, list(features.keys()), features, results_dir)
+    model.fit()
+
+    predictions = {(task[0], task[1]): model.predict(task[0], file_features[task[1]]) for task in tasks}
+    return longest_first(tasks, predictions), predictions
+
+
+"""
+durations of the most recent completed analyses of a tool, analyses cut short by a timeout or a kill are left out
+"""
+def past_durations(tool, results_dir=RESULTS_DIR, max_samples=ADAPTIVE_MAX_SAMPLES):
+    durations = []
+    tool_dir = os.path.join(results_dir, tool)
+    if not os.path.isdir(tool_dir):
+        return durations
+    for run in sorted(os.listdir(tool_dir), reverse=True):
+        run_dir = os.path.join(tool_dir, run)
+        if not os.path.isdir(run_dir):
+            continue
+        for file_name in os.listdir(run_dir):
+            try:
+                with open(os.path.join(run_dir, file_name, 'result.json'), 'r', encoding='utf-8') as f:
+                    results = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if results.get('status', 'completed') == 'completed' and isinstance(results.get('duration'), (int, float)):
+                durations.append(results['duration'])
+            if len(durations) >= max_samples:
+                return durations
+    return durations
+
+
+"""
+timeout of each tool from a percentile of its past durations, tools without enough history keep their configuration
+"""
+def adaptive_timeouts(tools, percentile, results_dir=RESULTS_DIR):
+    timeouts = {}
+    for tool in tools:
+        durations = past_durations(tool, results_dir)
+        if len(durations) < ADAPTIVE_MIN_SAMPLES:
+            continue
+        timeouts[tool] = max(ADAPTIVE_MIN_TIMEOUT, ADAPTIVE_MARGIN * float(numpy.percentile(durations, percentile)))
+    return timeouts
+
+
+"""
+write how the predicted durations and makespan compare with the actual ones
+"""
+def write_makespan_report(path, tasks, predictions, actual, workers, wall_time):
+    in_order = [predictions[(task[0], task[1])] for task in tasks]
+    errors = [abs(predictions[key] - duration) for key, duration in actual.items() if key in predictions]
+    report = {
+        'workers': workers,
+        'tasks': len(tasks),
+        'predicted_makespan': simulate_makespan(in_order, workers),
+        'actual_makespan': wall_time,
+        'replayed_makespan': simulate_makespan([actual[(task[0], task[1])] for task in tasks
+                                                if (task[0], task[1]) in actual], workers),
+        'mean_absolute_error': sum(errors) / len(errors) if errors else None,
+        'jobs': [{'tool': task[0], 'file': task[1], 'predicted': predictions[(task[0], task[1])],
+                  'actual': actual.get((task[0], task[1]))} for task in tasks]
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+"""
+pack the tasks of the tools that analyse several files in one container into batches of at most their batch size,
+of files needing the same image and with distinct names since they share /data. a batch takes the place of its first
+task in the order of the tasks, tasks left alone stay tasks
+"""
+def pack_batches(tasks, batch_sizes, image_of):
+    jobs = []
+    open_batches = {}
+    for task in tasks:
+        size = batch_sizes.get(task[0], 1)
+        if size <= 1:
+            jobs.append(task)
+            continue
+        key = (task[0], image_of(task))
+        batch = open_batches.get(key)
+        name = os.path.basename(task[1])
+        if batch is None or len(batch) >= size or any(os.path.basename(other[1]) == name for other in batch):
+            batch = []
+            open_batches[key] = batch
+            jobs.append(batch)
+        batch.append(task)
+    return [job[0] if isinstance(job, list) and len(job) == 1 else job for job in jobs]
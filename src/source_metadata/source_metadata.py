@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+METADATA_DIR = 'results/metadata'
+# stored entries of another scanner version are computed again
+SCANNER_VERSION = 1
+
+re_comment_or_string = re.compile(r'//[^\n]*|/\*[\s\S]*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'')
+re_string = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'')
+re_statement = re.compile(r'\s*(pragma|import|\S+)')
+re_pragma = re.compile(r'\bpragma\s+([A-Za-z_$][\w$]*)\s*([^;]*);')
+re_import = re.compile(r'\bimport\b[^;]*?("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')')
+re_contract = re.compile(r'\b(?:abstract\s+)?(?:contract|library|interface)\s+([A-Za-z_$][\w$]*)')
+# characters of the version expressions the scanner reads the way the parser does
+re_version_expression = re.compile(r'^[0-9.^~<>=| ]*$')
+# the version put in the tool commands, as found by the former regex over the raw source
+re_cmd_pragma = re.compile(r'pragma solidity (>=)?(.?[0-9]+)+', re.I)
+re_cmd_version = re.compile(r'([0-9]+.?)+')
+
+
+"""
+solc version of a pragma value, as read from the first element of the parsed source: (minor, patch) of 0.minor.patch
+"""
+def solc_version_of(value):
+    try:
+        version = value.strip('^').split('.')
+        return [int(version[1]), int(version[2])]
+    except (IndexError, ValueError, AttributeError):
+        return None
+
+
+"""
+first element of a source with the full solidity parser, for the sources the scanner cannot read
+"""
+def parse_first_pragma(source):
+    from solidity_parser import parser
+    try:
+        return parser.parse(source)['children'][0].get('value')
+    except Exception:
+        return None
+
+
+"""
+pragmas, contract names and imports of a solidity source, read in linear time without building a syntax tree
+"""
+def scan(source):
+    code = re_comment_or_string.sub(lambda match: match.group(0) if match.group(0)[0] in '"\'' else ' ', source)
+    bare = re_string.sub('""', code)
+
+    pragmas = [[name, re.sub(r'\s+', '', value)] for (name, value) in re_pragma.findall(bare)]
+    first = re_statement.match(bare)
+    first_value = None
+    if '/*' in bare:
+        # an unterminated comment, leave it to the parser
+        first_value = parse_first_pragma(source)
+    elif first is not None and first.group(1) == 'pragma':
+        pragma = re_pragma.match(bare, first.start(1))
+        first_value = re.sub(r'\s+', '', pragma.group(2)) if pragma is not None else None
+        if first_value is None or not re_version_expression.match(first_value):
+            first_value = parse_first_pragma(source)
+
+    cmd_pragma = re_cmd_pragma.search(source)
+    return {
+        'scanner': SCANNER_VERSION,
+        'pragmas': pragmas,
+        'contracts': re_contract.findall(bare),
+        'imports': [path[1:-1] for path in re_import.findall(code)],
+        'solc_version': solc_version_of(first_value),
+        'cmd_version': re_cmd_version.search(cmd_pragma.group()).group() if cmd_pragma is not None else None
+    }
+
+
+"""
+metadata of solidity sources shared by the tools of a run, memoized by content hash in memory and in a sidecar
+directory so that later runs do not scan the same contracts again
+"""
+class SourceMetadata:
+    def __init__(self, metadata_dir=METADATA_DIR):
+        self.metadata_dir = metadata_dir
+        self.memo = {}
+
+    def entry_path(self, digest):
+        return os.path.join(self.metadata_dir, digest[:2], digest + '.json')
+
+    def get(self, file):
+        with open(file, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        if digest in self.memo:
+            return self.memo[digest]
+
+        metadata = self.load(digest)
+        if metadata is None:
+            metadata = scan(content.decode('utf-8', errors='replace'))
+            self.store(digest, metadata)
+        self.memo[digest] = metadata
+        return metadata
+
+    def load(self, digest):
+        try:
+            with open(self.entry_path(digest), 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if metadata.get('scanner') != SCANNER_VERSION:
+            return None
+        return metadata
+
+    def store(self, digest, metadata):
+        path = self.entry_path(digest)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # written aside and renamed, so that concurrent workers never read a partial entry
+            (fd, staging) = tempfile.mkstemp(prefix='.' + digest, dir=os.path.dirname(path))
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(metadata, f)
+            os.replace(staging, path)
+        except OSError:
+            pass
+
+
+source_metadata = None
+
+
+"""
+metadata of a solidity file, through the metadata store of this process
+"""
+def get_source_metadata(file):
+    global source_metadata
+    if source_metadata is None:
+        source_metadata = SourceMetadata()
+    return source_metadata.get(file)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Consensus voting of main.py over many contracts: per-contract nested dicts against the columnar findings table.
+
+"loops" is the former path: the findings of each tool grouped by line as the phase_result_json_* functions did, then
+main.aggregate run once per contract. "table" adds the (line, issue) findings of each tool to one FindingsTable and
+computes the consensus of all the contracts at once. Findings are
+synthetic, drawn for 11 tools with their issue ranges, and each contract is checked to serialize to the same JSON
+as AnalysisResult.save writes. Run from the repository root:
+
+    python3 -m utils.benchmarks.aggregation [--contracts N] [--findings N] [--strategy N]
+"""
+
+import argparse
+import json
+import random
+from time import perf_counter
+
+from src.aggregation.aggregation import FindingsTable, aggregate_table
+
+
+class Issue:
+    def __init__(self, issue_type, name):
+        self.issue_type = issue_type
+        self.name = name
+
+
+ISSUE_UNKNOWN = Issue(-1, "unknown")
+ISSUE_OTHER = Issue(0, "other")
+# main.py declares one of its issues as a tuple, kept here since it serializes differently
+ISSUE_LIST = [ISSUE_OTHER] + [Issue(i, "issue_%d" % i) for i in range(1, 4)] + [(4, "issue_4")] + \
+             [Issue(i, "issue_%d" % i) for i in range(5, 9)]
+TOOLS = ["conkas", "mythril", "osiris", "slither", "oyente", "solhint", "smartcheck", "honeybadger", "manticore",
+         "maian", "securify"]
+
+
+def by_line(findings):
+    result = {}
+    for (line, issue) in findings:
+        if line not in result:
+            result[line] = []
+        result[line].append(issue)
+    return result
+
+
+def former_aggregate(result, tool_ranges, strategy):
+    aggregate_result = {}
+    statistical_result = {}
+    confidence_count = {}
+    for issue_type in ISSUE_LIST:
+        confidence_count[issue_type] = 0
+    for tool in result.keys():
+        for issue_type in tool_ranges[tool]:
+            confidence_count[issue_type] += 1
+    for tool, tool_res in result.items():
+        for line, issue_list in tool_res.items():
+            for issue in issue_list:
+                if line not in statistical_result:
+                    statistical_result[line] = {}
+                if issue not in statistical_result[line]:
+                    statistical_result[line][issue] = 0
+                statistical_result[line][issue] += 1
+    for line, issue_count in statistical_result.items():
+        for issue, count in issue_count.items():
+            if (count >= strategy * confidence_count[issue]) and issue != ISSUE_OTHER and issue != ISSUE_UNKNOWN:
+                if line not in aggregate_result:
+                    aggregate_result[line] = []
+                aggregate_result[line].append(issue)
+    return aggregate_result
+
+
+def to_json(issues):
+    return json.dumps(issues, default=lambda o: o.__dict__, sort_keys=True, indent=4, ensure_ascii=False)
+
+
+def synthetic_results(contracts, findings, tool_ranges, rng):
+    results = []
+    for _ in range(contracts):
+        result = {}
+        for tool in TOOLS:
+            # some tools fail on some contracts, and do not take part in their consensus
+            if rng.random() < 0.1:
+                continue
+            result[tool] = [(rng.randint(1, 60), rng.choice(tool_ranges[tool] or ISSUE_LIST))
+                            for _ in range(rng.randint(0, findings))]
+        results.append(result)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the consensus voting of main.py')
+    parser.add_argument('--contracts', type=int, default=50000)
+    parser.add_argument('--findings', type=int, default=8)
+    parser.add_argument('--strategy', type=float, default=0.3)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    tool_ranges = {tool: rng.sample(ISSUE_LIST[1:], rng.randint(0, 5)) for tool in TOOLS}
+    results = synthetic_results(args.contracts, args.findings, tool_ranges, rng)
+    print('%d contracts x %d tools, %d findings' % (args.contracts, len(TOOLS),
+                                                   sum(len(findings) for result in results
+                                                       for findings in result.values())))
+
+    start = perf_counter()
+    former = [former_aggregate({tool: by_line(findings) for (tool, findings) in result.items()}, tool_ranges,
+                               args.strategy) for result in results]
+    print('%8s %8.2fs' % ('loops', perf_counter() - start))
+
+    start = perf_counter()
+    table = FindingsTable(TOOLS, ISSUE_LIST + [ISSUE_UNKNOWN])
+    for (contract, result) in enumerate(results):
+        for (tool, findings) in result.items():
+            table.add(contract, tool, findings)
+    added = perf_counter() - start
+    aggregated = aggregate_table(table, tool_ranges, args.strategy, [ISSUE_OTHER, ISSUE_UNKNOWN])
+    print('%8s %8.2fs (%.2fs filling the table)' % ('table', perf_counter() - start, added))
+
+    for (contract, result) in enumerate(former):
+        assert to_json(aggregated.get(contract, {})) == to_json(result), 'contract %d differs' % contract
+    print('same output for every contract')
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Runs the asyncio engine against a local fake Docker Engine API server.
+
+The fake daemon answers the calls the engine makes, keeps each container "running" for --duration seconds and
+returns solhint-like logs, so the benchmark shows how many containers one process keeps in flight and at which
+memory cost. Run from the repository root:
+
+    python3 -m utils.benchmarks.async_engine [--jobs N] [--max-containers N] [--duration S]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import struct
+from itertools import count
+from shutil import rmtree
+from time import perf_counter, strftime
+
+from src.docker_api.async_engine import AsyncEngine
+from src.docker_api.docker_http import AsyncDockerClient
+
+LOG = b'/data/contract.sol:10:5: Line length must be no more than 120 [Warning/max-line-length]\n'
+
+
+class FakeDockerAPI:
+    def __init__(self, duration):
+        self.duration = duration
+        self.ids = count()
+        self.running = 0
+        self.peak_running = 0
+
+    async def handle(self, reader, writer):
+        request_line = (await reader.readline()).decode('latin-1')
+        (method, target, _) = request_line.split(' ', 2)
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            if line.lower().startswith(b'content-length:'):
+                length = int(line.split(b':')[1])
+        if length:
+            await reader.readexactly(length)
+        path = target.split('?')[0]
+
+        status, body = 200, b''
+        if method == 'GET' and path.endswith('/json') and '/images/' in path:
+            body = json.dumps({'Id': 'sha256:fake'}).encode()
+        elif method == 'POST' and path.endswith('/containers/create'):
+            status, body = 201, json.dumps({'Id': 'fake%d' % next(self.ids)}).encode()
+        elif method == 'POST' and path.endswith('/start'):
+            status = 204
+            self.running += 1
+            self.peak_running = max(self.peak_running, self.running)
+        elif method == 'POST' and path.endswith('/wait'):
+            await asyncio.sleep(self.duration)
+            self.running -= 1
+            body = json.dumps({'StatusCode': 0}).encode()
+        elif method == 'GET' and path.endswith('/logs'):
+            body = struct.pack('>BxxxL', 1, len(LOG)) + LOG
+        elif method == 'DELETE':
+            status = 204
+        else:
+            status, body = 404, json.dumps({'message': 'not found'}).encode()
+
+        writer.write(b'HTTP/1.1 %d X\r\nContent-Length: %d\r\nConnection: close\r\n\r\n' % (status, len(body)) + body)
+        await writer.drain()
+        writer.close()
+
+
+async def bench(args, tasks, output_folder, log_path):
+    fake = FakeDockerAPI(args.duration)
+    server = await asyncio.start_server(fake.handle, '127.0.0.1', 0, backlog=4096)
+    port = server.sockets[0].getsockname()[1]
+    engine = AsyncEngine(AsyncDockerClient('tcp://127.0.0.1:%d' % port), output_folder, log_path,
+                         max_containers=args.max_containers, parse_processes=args.parse_processes)
+    records = []
+    start = perf_counter()
+    async with server:
+        await engine.run(tasks, records.append)
+    return perf_counter() - start, records, fake.peak_running
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the asyncio engine against a fake Docker API')
+    parser.add_argument('--jobs', type=int, default=500)
+    parser.add_argument('--max-containers', type=int, default=250)
+    parser.add_argument('--duration', type=float, default=2.0, help='seconds each fake container runs')
+    parser.add_argument('--parse-processes', type=int, default=2)
+    parser.add_argument('--file', default='dataset/reentrancy/simple_dao.sol')
+    args = parser.parse_args()
+
+    output_folder = 'bench_' + strftime("%Y%m%d_%H%M%S")
+    log_path = os.path.join('results/logs', output_folder + '.log')
+    os.makedirs('results/logs', exist_ok=True)
+    tasks = [('solhint', args.file, 'FILE', 'v1', None, None, None)] * args.jobs
+    try:
+        (elapsed, records, peak_running) = asyncio.run(bench(args, tasks, output_folder, log_path))
+    finally:
+        rmtree(os.path.join('results/solhint', output_folder), ignore_errors=True)
+        if os.path.exists(log_path):
+            os.remove(log_path)
+
+    serial = args.jobs * args.duration
+    print('jobs:                 %d x %.1fs' % (len(records), args.duration))
+    print('containers in flight: %d (limit %d)' % (peak_running, args.max_containers))
+    print('wall time:            %.1fs (%.0fs if run one at a time)' % (elapsed, serial))
+    print('peak RSS:             %.1f MB' % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+One container per file against batches of files, for solhint on the curated dataset, with a fake Docker client.
+
+Each fake container costs --start-time seconds to start, then "lints" the files of its command: one unix-format
+warning per line longer than 80 characters, and the problem count at the end, as solhint -f unix does. The analyses
+are run once per file with analyse_files, then in batches with analyse_batch, and the result.json findings and
+result.sarif files of each contract are checked to be the same. The result.log of each contract in a batch is checked
+to hold the findings of its single run and not the problem count of the batch, which sums up all its files. Run from
+the repository root:
+
+    python3 -m utils.benchmarks.batch [--files N] [--batch-size N] [--start-time S]
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+from shutil import rmtree
+from time import perf_counter, sleep
+
+from src.docker_api import docker_api
+from src.docker_api.docker_api import analyse_batch, analyse_files, load_tool_config, pin_images, select_image
+from src.output_parser.SarifHolder import SarifHolder
+from src.scheduler.scheduler import pack_batches
+
+
+class FakeContainer:
+    def __init__(self, output):
+        self.output = output
+        self.attrs = {}
+
+    def wait(self, timeout=None):
+        return {'StatusCode': 0}
+
+    def logs(self, stream=False):
+        return iter([self.output]) if stream else self.output
+
+    def stop(self, timeout=None):
+        pass
+
+    def remove(self):
+        pass
+
+
+class FakeContainers:
+    def __init__(self, start_time):
+        self.start_time = start_time
+        self.runs = 0
+
+    def run(self, image, cmd, volumes=None, **kwargs):
+        self.runs += 1
+        sleep(self.start_time)
+        # the host file mounted at each container path
+        mounts = {volume['bind']: host for (host, volume) in volumes.items()}
+        lines = []
+        for path in (token for token in cmd.split() if token.startswith('/data/')):
+            with open(mounts[path], 'r', encoding='utf-8') as f:
+                for (number, line) in enumerate(f, 1):
+                    if len(line.rstrip('\n')) > 80:
+                        lines.append('%s:%d:1: Line length must be no more than 80 but current length is %d. '
+                                     '[Warning/max-line-length]' % (path, number, len(line.rstrip('\n'))))
+        lines.append('')
+        lines.append('%d problems' % len(lines))
+        return FakeContainer(('\n'.join(lines) + '\n').encode('utf8'))
+
+
+class FakeImages:
+    def list(self, name):
+        return [name]
+
+
+class FakeClient:
+    def __init__(self, start_time):
+        self.containers = FakeContainers(start_time)
+        self.images = FakeImages()
+
+
+def read_results(folder, file_names):
+    results = {}
+    for file_name in file_names:
+        with open(os.path.join(folder, file_name, 'result.json'), 'r') as f:
+            analysis = json.load(f)['analysis']
+        with open(os.path.join(folder, file_name, 'result.sarif'), 'r') as f:
+            sarif = f.read()
+        with open(os.path.join(folder, file_name, 'result.log'), 'r') as f:
+            log = f.read().splitlines()
+        results[file_name] = (analysis, sarif, log)
+    return results
+
+
+def findings(results):
+    # the results without the lines of result.log that are not findings, such as the problem count
+    return {file_name: (analysis, sarif, [line for line in log if line.startswith('/data/')])
+            for (file_name, (analysis, sarif, log)) in results.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare single and batched analyses with a fake Docker client')
+    parser.add_argument('--files', type=int, default=143)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--start-time', type=float, default=0.05)
+    args = parser.parse_args()
+
+    files = sorted(glob.glob('dataset/**/*.sol', recursive=True))[:args.files]
+    file_names = [os.path.splitext(os.path.basename(file))[0] for file in files]
+    logs = io.StringIO()
+    pin_images({})
+    cfg = load_tool_config('solhint', logs)[1]
+    tasks = [('solhint', file) for file in files]
+
+    outputs = {}
+    for name in ('single', 'batch'):
+        docker_api.client = FakeClient(args.start_time)
+        now = 'benchmark_batch_' + name
+        start = perf_counter()
+        if name == 'single':
+            for file in files:
+                file_name = os.path.splitext(os.path.basename(file))[0]
+                analyse_files('solhint', file, logs, now, {file_name: SarifHolder()}, 'all', 'dataset/')
+        else:
+            jobs = pack_batches(tasks, {'solhint': args.batch_size}, lambda task: select_image(cfg, task[1], logs))
+            for job in jobs:
+                batch = [task[1] for task in (job if isinstance(job, list) else [job])]
+                sarif_outputs = {os.path.splitext(os.path.basename(file))[0]: SarifHolder() for file in batch}
+                analyse_batch('solhint', batch, logs, now, sarif_outputs, 'all', 'dataset/')
+        elapsed = perf_counter() - start
+        outputs[name] = read_results(os.path.join('results', 'solhint', now), file_names)
+        rmtree(os.path.join('results', 'solhint', now))
+        print('%8s %8.2fs %6d containers' % (name, elapsed, docker_api.client.containers.runs))
+
+    assert findings(outputs['single']) == findings(outputs['batch']), 'the batched results differ'
+    for (file_name, (analysis, sarif, log)) in outputs['batch'].items():
+        assert log == findings(outputs['batch'])[file_name][2], 'the result.log of %s holds more than its findings' \
+            % file_name
+    print('%d contracts, same results' % len(files))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Runs a distributed sweep on one machine: a coordinator and its broker in this process, workers in local processes.
+
+The analyses are faked: each one sleeps --duration seconds and writes a result file, one in --fail-every fails on
+its first attempt, and an extra worker dies holding the lease of its first job, which is run again once its lease
+expires. The benchmark checks that every job ends with exactly one record and its result file, and shows the
+throughput for 1, 2 and 4 worker processes. Run from the repository root:
+
+    python3 -m utils.benchmarks.distributed [--jobs N] [--duration S] [--fail-every N] [--lease-timeout S]
+"""
+
+import argparse
+import os
+import tempfile
+from multiprocessing import Process
+from time import perf_counter, sleep
+
+from src.distributed.broker import Coordinator
+from src.distributed.worker import run_workers, work
+
+KEY = b'benchmark'
+
+
+def fake_analyse(job, file, import_path, logs, result_cache):
+    with open(file, 'rb') as f:
+        contract = f.read()
+    sleep(ARGS.duration)
+    marker = os.path.join(ARGS.markers, str(job['id']))
+    if ARGS.fail_every and job['id'] % ARGS.fail_every == 0 and not os.path.exists(marker):
+        open(marker, 'w').close()
+        raise RuntimeError('first attempt of job %d' % job['id'])
+    results_folder = tempfile.mkdtemp()
+    with open(os.path.join(results_folder, 'result.json'), 'wb') as f:
+        f.write(b'{"contract": %d}' % len(contract))
+    return [], results_folder
+
+
+def dying_analyse(job, file, import_path, logs, result_cache):
+    # a worker host lost in the middle of a job: no failure is reported and its heartbeat stops
+    os._exit(1)
+
+
+def sweep(directory, contracts, workers, lease_timeout, dying_worker):
+    address = '127.0.0.1:%d' % (7900 + workers)
+    tasks = [('tool_%d' % (i % 2), contract, directory + '/', 'v2', None, None, None)
+             for (i, contract) in enumerate(contracts)]
+    processes = [Process(target=run_workers, args=(address, workers, None, KEY, fake_analyse,
+                                                   os.path.join(directory, 'worker.log')))]
+    if dying_worker:
+        processes.append(Process(target=work, args=(('127.0.0.1', 7900 + workers), KEY, 'dying', directory,
+                                                    os.path.join(directory, 'worker.log'), None, dying_analyse)))
+    for process in processes:
+        process.start()
+
+    records = []
+    coordinator = Coordinator(address, 'sweep_%d' % workers, os.path.join(directory, 'coordinator.log'), key=KEY,
+                              lease_timeout=lease_timeout)
+    start = perf_counter()
+    coordinator.run(tasks, records.append)
+    elapsed = perf_counter() - start
+    for process in processes:
+        process.join()
+
+    assert sorted((record[0], record[1]) for record in records) == sorted(task[:2] for task in tasks), \
+        'a job has no record or several'
+    for (tool, contract) in (task[:2] for task in tasks):
+        file_name = os.path.splitext(os.path.basename(contract))[0]
+        assert os.path.isfile(os.path.join('results', tool, 'sweep_%d' % workers, file_name, 'result.json')), \
+            'missing result of ' + file_name
+    return elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a distributed sweep with local worker processes')
+    parser.add_argument('--jobs', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=0.05)
+    parser.add_argument('--fail-every', type=int, default=10)
+    parser.add_argument('--lease-timeout', type=int, default=2)
+    ARGS = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        contracts = []
+        for i in range(ARGS.jobs):
+            contracts.append(os.path.join(directory, 'contracts', 'contract_%d.sol' % i))
+            os.makedirs(os.path.dirname(contracts[-1]), exist_ok=True)
+            with open(contracts[-1], 'w') as f:
+                f.write('pragma solidity ^0.5.0;\ncontract C%d {}\n' % i)
+
+        print('%d jobs of %.2fs, one in %d failing once, lease timeout %ds' % (ARGS.jobs, ARGS.duration,
+                                                                             ARGS.fail_every, ARGS.lease_timeout))
+        for workers in (1, 2, 4):
+            ARGS.markers = tempfile.mkdtemp(dir=directory)
+            elapsed = sweep(directory, contracts, workers, ARGS.lease_timeout, dying_worker=workers == 4)
+            print('%d worker(s)%s %8.2fs %8.1f jobs/s' % (workers, ' + 1 dying' if workers == 4 else '         ',
+                                                          elapsed, ARGS.jobs / elapsed))
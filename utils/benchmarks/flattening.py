@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Flattening of a solidity monorepo by process_file.py: the files read and tokenized once, in parallel, and the import
+order of each main file built from those of the files it imports, against the former per-file expressions and graph
+walk.
+
+The tree is either --path, laid out as process_file.py expects it (an @openzeppelin* directory next to the contracts), or
+one generated in a temporary directory: --library files under @openzeppelin, each importing a few files of the level
+below, and --mains contracts importing some of them, with both forms of import. "former" is the former SolFile: each
+of its directives found again by every step that needs it, and the output of each main file made of the whole mapping
+in the order of a walk over it. "graph" is process_file.py as it is now. The files are checked to have the same source
+code, imports and versions in both, and the output of each main file to be the files it imports, directly or not, in
+the former order. Run from the repository root:
+
+    python3 -m utils.benchmarks.flattening [--path DIR] [--library N] [--mains N] [--processes N]
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import tempfile
+from time import perf_counter
+
+import process_file
+from process_file import (SolVersion, merge, re_import_file1, re_import_file2, re_license, re_pragma1, re_pragma2,
+                          re_pragma3, re_sol_version)
+
+LEVELS = 5
+
+former_mapping = {}
+
+
+class FormerSolFile:
+    def __init__(self, filepath):
+        self.filepath = filepath
+        if not (filepath.endswith(".sol") and os.path.isfile(filepath)):
+            exit("file {} is not a solidity file".format(filepath))
+        self.name = os.path.split(filepath)[1][:-4]
+        with open(filepath) as f:
+            self.file_data = f.read()
+        if self._count_pragma_of_file() != 1:
+            exit("file {} has {} version pragma".format(self.filepath, self._count_pragma_of_file()))
+        if len(re_license.findall(self.file_data)) != 1:
+            exit("file {} has {} license".format(self.filepath, len(re_license.findall(self.file_data))))
+        self.sol_version = self._get_sol_version()
+        self.license = re_license.findall(self.file_data)[0][28:]
+        self.import_files = self._get_import_files()
+        self.source_code = self._get_source_code()
+
+    def _get_sol_version(self):
+        if len(re_pragma1.findall(self.file_data)) != 0:
+            pragma = re_pragma1.findall(self.file_data)[0]
+        elif len(re_pragma2.findall(self.file_data)) != 0:
+            pragma = re_pragma2.findall(self.file_data)[0]
+        else:
+            pragma = re_pragma3.findall(self.file_data)[0]
+        sol_version = SolVersion(0, 0, 0, True)
+        sol_version.allow_higher = ("^" in pragma) or (">=" in pragma)
+        sol_version_string_tuple = re_sol_version.findall(pragma)[0][:len(pragma) - 1].split(".")
+        sol_version.first = int(sol_version_string_tuple[0])
+        sol_version.second = int(sol_version_string_tuple[1])
+        sol_version.third = int(sol_version_string_tuple[2])
+        return sol_version
+
+    def _count_pragma_of_file(self):
+        return len(re_pragma1.findall(self.file_data) + re_pragma2.findall(self.file_data)
+                   + re_pragma3.findall(self.file_data))
+
+    def _get_source_code(self):
+        pragmas = re_pragma1.findall(self.file_data) + re_pragma2.findall(self.file_data) + \
+            re_pragma3.findall(self.file_data)
+        source_code = self.file_data
+        for pragma in pragmas:
+            source_code = source_code.replace(pragma, "")
+        for import_file in re_import_file1.findall(self.file_data) + re_import_file2.findall(self.file_data):
+            source_code = source_code.replace(import_file, "")
+        for spdx_license in re_license.findall(self.file_data):
+            source_code = source_code.replace(spdx_license, "")
+        return source_code
+
+    def _get_import_files(self):
+        files = []
+        for import_file in re_import_file1.findall(self.file_data) + re_import_file2.findall(self.file_data):
+            import_path = import_file.split(" ")[3 if "from" in import_file else 1][1:-2]
+            filepath = os.path.abspath(os.path.join(self.filepath.replace("/" + self.name + ".sol", ""), import_path))
+            new_sol_file = former_make_sol_file(filepath)
+            merge_sol_version, ok = merge(self.sol_version, new_sol_file.sol_version)
+            if not ok:
+                exit("solidity version conflict between {} and {}".format(self.filepath, new_sol_file.filepath))
+            self.sol_version, new_sol_file.sol_version = merge_sol_version, merge_sol_version
+            files.append(new_sol_file)
+        return files
+
+    def output_order(self):
+        # the files of the former output, each main file being made of the whole mapping
+        if len(self.import_files) == 0:
+            return [self.filepath]
+        filepath_in_order = []
+        visited_files = {file_path: 0 for file_path in former_mapping}
+
+        def dfs(s):
+            visited_files[s] = 1
+            for sol_file in former_mapping[s].import_files:
+                if visited_files[sol_file.filepath] == 0:
+                    dfs(sol_file.filepath)
+                elif visited_files[sol_file.filepath] == 1:
+                    exit("circular import")
+            visited_files[s] = 2
+            filepath_in_order.append(s)
+
+        for filepath in former_mapping:
+            if not visited_files[filepath]:
+                dfs(filepath)
+        return filepath_in_order
+
+    def output(self):
+        text = ""
+        for filepath in self.output_order():
+            text += former_mapping[filepath].source_code
+        return text
+
+
+def former_make_sol_file(filepath):
+    filepath = process_file.map_filepath(filepath)
+    if filepath not in former_mapping:
+        former_mapping[filepath] = FormerSolFile(filepath)
+    return former_mapping[filepath]
+
+
+def write_contract(path, name, imports, size, rng):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lines = ['// SPDX-License-Identifier: MIT', 'pragma solidity ^0.8.%d;' % rng.randint(0, 9), '']
+    lines += imports + ['', 'contract %s {' % name]
+    lines += ['    // %s keeps the balance %d of its users' % (name, line)
+              if line % 9 == 0 else '    uint256 public value%d = %d;' % (line, line) for line in range(size)]
+    lines.append('}')
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def generate_tree(root, library, mains, seed):
+    # @openzeppelin/levelK/LibK_I.sol imports files of level K-1, contracts/MainI.sol imports files of any level
+    rng = random.Random(seed)
+    levels = [[] for _ in range(LEVELS)]
+    for index in range(library):
+        level = index * LEVELS // library
+        name = 'Lib%d_%d' % (level, index)
+        imports = []
+        for imported in rng.sample(levels[level - 1], min(3, len(levels[level - 1]))) if level > 0 else []:
+            imports.append('import {%s} from "../level%d/%s.sol";' % (imported, level - 1, imported)
+                           if rng.random() < 0.5 else 'import "../level%d/%s.sol";' % (level - 1, imported))
+        write_contract(os.path.join(root, '@openzeppelin', 'level%d' % level, name + '.sol'), name, imports,
+                       rng.randint(20, 200), rng)
+        levels[level].append(name)
+    for index in range(mains):
+        name = 'Main%d' % index
+        imports = []
+        for level in sorted(rng.sample(range(LEVELS), 2)):
+            imported = rng.choice(levels[level])
+            imports.append('import "@openzeppelin/level%d/%s.sol";' % (level, imported))
+        write_contract(os.path.join(root, 'contracts', name + '.sol'), name, imports, rng.randint(20, 200), rng)
+
+
+def walk(root):
+    for k in list(process_file.openzeppelin_dir_mapping):
+        if k[:-1] in os.listdir(root):
+            process_file.openzeppelin_dir_mapping[k] = os.path.join(root, k[:-1] + "/")
+    return [os.path.join(i, m) for (i, j, k) in os.walk(root) for m in k if m.endswith(".sol")]
+
+
+def former_run(files, processes):
+    for solidity_file in files:
+        former_make_sol_file(solidity_file)
+    main_files = process_file.find_main_files(former_mapping, False)
+    return {main_file: former_mapping[main_file].output() for main_file in main_files}
+
+
+def graph_run(files, processes):
+    process_file.load_sol_sources(files, processes)
+    for solidity_file in files:
+        process_file.make_sol_file(solidity_file)
+    main_files = process_file.find_main_files(process_file.sol_file_mapping, False)
+    return {main_file: process_file.sol_file_mapping[main_file].output() for main_file in main_files}
+
+
+def version(sol_file):
+    return (sol_file.sol_version.first, sol_file.sol_version.second, sol_file.sol_version.third,
+            sol_file.sol_version.allow_higher)
+
+
+def check(outputs):
+    (former, graph) = (former_mapping, process_file.sol_file_mapping)
+    assert list(former) == list(graph), 'the files differ'
+    for (filepath, sol_file) in graph.items():
+        assert sol_file.source_code == former[filepath].source_code, 'the source code of %s differs' % filepath
+        assert sol_file.license == former[filepath].license, 'the license of %s differs' % filepath
+        assert version(sol_file) == version(former[filepath]), 'the version of %s differs' % filepath
+        assert [f.filepath for f in sol_file.import_files] == [f.filepath for f in former[filepath].import_files]
+    assert list(outputs['former']) == list(outputs['graph']), 'the main files differ'
+    for main_file in outputs['graph']:
+        reached = set()
+        pending = [main_file]
+        while pending:
+            filepath = pending.pop()
+            if filepath not in reached:
+                reached.add(filepath)
+                pending += [sol_file.filepath for sol_file in former[filepath].import_files]
+        order = [filepath for filepath in former[main_file].output_order() if filepath in reached]
+        assert outputs['graph'][main_file] == ''.join(former[filepath].source_code for filepath in order), \
+            'the output of %s differs' % main_file
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the former and the import graph flattening')
+    parser.add_argument('--path', help='the tree to flatten instead of a generated one')
+    parser.add_argument('--library', type=int, default=500)
+    parser.add_argument('--mains', type=int, default=300)
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='smartbugs-flattening-') as root:
+        if args.path is None:
+            generate_tree(root, args.library, args.mains, args.seed)
+        files = walk(args.path or root)
+        print('%d files, %d processes' % (len(files), args.processes))
+        outputs = {}
+        for (name, run) in (('former', former_run), ('graph', graph_run)):
+            start = perf_counter()
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                outputs[name] = run(files, args.processes)
+            elapsed = perf_counter() - start
+            print('%8s %8.2fs %10d characters output' % (name, elapsed, sum(map(len, outputs[name].values()))))
+
+    check(outputs)
+    print('%d main files, same files and versions, outputs made of their imports' % len(outputs['graph']))
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Image lookups and pulls of a sweep, with and without the planning phase, against a fake Docker client.
+
+The fake daemon starts without any image; a pull takes --pull-time seconds and a lookup --list-time seconds.
+"workers" is the former path: --processes workers take the jobs of the curated dataset in order and each calls
+get_image (images.list, then a pull if the image is missing) before its job. "plan" resolves the images of the
+sweep once with plan_images before the workers start, and the workers then only read the pinned ids. Run from the
+repository root:
+
+    python3 -m utils.benchmarks.image_plan [--processes N] [--max-pulls N] [--pull-time S] [--list-time S]
+"""
+
+import argparse
+import glob
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, sleep
+
+import docker
+
+from src.docker_api import docker_api
+from src.docker_api.docker_api import get_image, load_tool_config, pin_images
+from src.docker_api.image_plan import plan_images
+
+TOOLS = ['maian', 'mythril', 'securify', 'slither', 'solhint', 'oyente']
+
+
+class FakeImage:
+    def __init__(self, name):
+        self.id = 'sha256:' + '%064x' % (hash(name) % 2 ** 64)
+
+
+class FakeImages:
+    def __init__(self, pull_time, list_time):
+        self.pull_time = pull_time
+        self.list_time = list_time
+        self.present = {}
+        self.lock = threading.Lock()
+        self.pulls = 0
+        self.lookups = 0
+        self.pulling = 0
+        self.peak_pulling = 0
+
+    def list(self, name):
+        with self.lock:
+            self.lookups += 1
+        sleep(self.list_time)
+        return [self.present[name]] if name in self.present else []
+
+    def get(self, name):
+        with self.lock:
+            self.lookups += 1
+        sleep(self.list_time)
+        if name not in self.present:
+            raise docker.errors.ImageNotFound(name)
+        return self.present[name]
+
+    def pull(self, name):
+        with self.lock:
+            self.pulls += 1
+            self.pulling += 1
+            self.peak_pulling = max(self.peak_pulling, self.pulling)
+        sleep(self.pull_time)
+        with self.lock:
+            self.pulling -= 1
+            self.present[name] = FakeImage(name)
+        return self.present[name]
+
+
+class FakeClient:
+    def __init__(self, pull_time, list_time):
+        self.images = FakeImages(pull_time, list_time)
+
+
+def run_jobs(tasks, processes, logs):
+    # the image step of each job, as run by the workers of the pool engine
+    configs = {tool: load_tool_config(tool, logs)[1] for tool in TOOLS}
+    with ThreadPoolExecutor(max_workers=processes) as executor:
+        list(executor.map(lambda task: get_image(configs[task[0]], task[1], logs), tasks))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the image step of a sweep with and without planning')
+    parser.add_argument('--processes', type=int, default=32)
+    parser.add_argument('--max-pulls', type=int, default=4)
+    parser.add_argument('--pull-time', type=float, default=0.5)
+    parser.add_argument('--list-time', type=float, default=0.002)
+    args = parser.parse_args()
+
+    files = sorted(glob.glob('dataset/**/*.sol', recursive=True))
+    tasks = [(tool, file) for file in files for tool in TOOLS]
+    logs = io.StringIO()
+    print('%d jobs, %d processes, pulls of %.2fs' % (len(tasks), args.processes, args.pull_time))
+    for name in ('workers', 'plan'):
+        fake = FakeClient(args.pull_time, args.list_time)
+        docker_api.client = fake
+        pin_images({})
+        start = perf_counter()
+        if name == 'plan':
+            pinned = plan_images(fake, tasks, logs, args.max_pulls)
+            pin_images(pinned)
+            planned = perf_counter() - start
+        run_jobs(tasks, args.processes, logs)
+        elapsed = perf_counter() - start
+        print('%8s %8.2fs %6d pulls (%d at once at most) %6d lookups%s'
+              % (name, elapsed, fake.images.pulls, fake.images.peak_pulling, fake.images.lookups,
+                 ', %.2fs planning' % planned if name == 'plan' else ''))
+    pin_images({})
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Startup of the smartBugs command line: the modules loaded by the commands that do not run analyses, timed with
+python -X importtime.
+
+"former" imports the modules smartBugs.py used to import at module level, before its command line was parsed: docker,
+the Docker client module, the engines, every parser and SARIF (GitPython too, when it is installed). The commands
+("--help", "--list tools", "cache stats" and "import smartBugs", as main.py does) are then run as they are now. Each
+is checked to load none of the heavy modules and to spend less than --budget milliseconds importing, and no log file
+may be created by them. Run from the repository root:
+
+    python3 -m utils.benchmarks.import_time [--repeat N] [--budget MS]
+"""
+
+import argparse
+import glob
+import importlib.util
+import os
+import subprocess
+import sys
+from time import perf_counter
+
+# the top-level packages a command that runs no analysis has no use for
+HEAVY_MODULES = ['docker', 'git', 'numpy', 'pandas', 'requests', 'sarif_om', 'solidity_parser']
+
+FORMER_IMPORTS = ['asyncio', 'git', 'multiprocessing', 'src.distributed.broker', 'src.distributed.worker',
+                  'src.docker_api.docker_api', 'src.docker_api.async_engine', 'src.docker_api.container_pool',
+                  'src.docker_api.docker_http', 'src.docker_api.image_plan', 'src.interface.cli',
+                  'src.journal.journal', 'src.output_parser.SarifHolder', 'src.output_parser.SarifStream',
+                  'src.result_cache.result_cache', 'src.scheduler.scheduler']
+
+COMMANDS = [('--help', ['smartBugs.py', '--help']),
+            ('--list tools', ['smartBugs.py', '--list', 'tools']),
+            ('cache stats', ['smartBugs.py', 'cache', 'stats']),
+            ('import', ['-c', 'import smartBugs'])]
+
+
+def former_command():
+    # the parsers were all imported by smartBugs.py, through the Docker client module
+    modules = [module for module in FORMER_IMPORTS if importlib.util.find_spec(module.split('.')[0]) is not None]
+    modules += ['src.output_parser.' + os.path.splitext(os.path.basename(path))[0]
+                for path in sorted(glob.glob('src/output_parser/*.py'))]
+    return ['-c', '; '.join('import ' + module for module in modules)]
+
+
+def run(command):
+    # the wall time of the command, the modules it imported and the microseconds spent importing them
+    start = perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime'] + command, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, text=True)
+    elapsed = perf_counter() - start
+    modules = set()
+    import_time = 0
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        (_, cumulative, name) = line.split('|')
+        modules.add(name.strip())
+        # the imports of the interpreter start up (site) are not the command's own
+        if not name.startswith('  ') and name.strip() not in ('site', 'encodings'):
+            import_time += int(cumulative)
+    return elapsed, modules, import_time
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the imports of the smartBugs command line')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=100, help='milliseconds a command may spend importing')
+    args = parser.parse_args()
+
+    logs_before = set(glob.glob('results/logs/*.log'))
+    print('%14s %10s %10s %8s' % ('command', 'wall', 'imports', 'modules'))
+    results = {}
+    for (name, command) in [('former', former_command())] + COMMANDS:
+        timings = [run(command) for _ in range(args.repeat)]
+        elapsed = min(timing[0] for timing in timings)
+        modules = timings[0][1]
+        import_time = min(timing[2] for timing in timings)
+        results[name] = (modules, import_time)
+        print('%14s %8.1fms %8.1fms %8d' % (name, elapsed * 1e3, import_time / 1e3, len(modules)))
+
+    for (name, command) in COMMANDS:
+        (modules, import_time) = results[name]
+        loaded = sorted(module for module in HEAVY_MODULES if module in modules)
+        assert not loaded, '%s loads %s' % (name, ', '.join(loaded))
+        assert import_time / 1e3 <= args.budget, '%s spends %.1fms importing' % (name, import_time / 1e3)
+    assert set(glob.glob('results/logs/*.log')) == logs_before, 'a log file was created'
+    print('no heavy module and at most %.0fms of imports for every command' % args.budget)
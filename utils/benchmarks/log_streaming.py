@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Peak memory of capturing and parsing a large tool output.
+
+"buffered" is the former scheme: the whole log is joined, decoded and stripped, written to result.log and split into
+lines by the parser. "streaming" is the current scheme: the chunks go through a LogStream to result.log and to the
+parser at the same time. The output is synthetic verbose logging with solhint findings in between, each mode runs in
+its own process so that their peak RSS can be compared. Run from the repository root:
+
+    python3 -m utils.benchmarks.log_streaming [--size MB ...]
+"""
+
+import argparse
+import os
+import resource
+import tempfile
+from multiprocessing import get_context
+from time import perf_counter
+
+from src.docker_api.log_stream import LogStream
+from src.output_parser.Solhint import Solhint
+
+CHUNK = 16 * 1024
+NOISE = b'DEBUG:symExec: exploring state 0x5f3a pc=1024 depth=17 constraints=42 solver=z3 elapsed=0.0012s\n'
+FINDING = b'/data/contract.sol:10:5: Line length must be no more than 120 [Warning/max-line-length]\n'
+
+
+def synthetic_chunks(size):
+    block = (NOISE * 99 + FINDING)
+    block = block * (CHUNK // len(block) + 1)
+    sent = 0
+    while sent < size:
+        yield block[:CHUNK]
+        sent += CHUNK
+
+
+def buffered(size, path):
+    output = b''.join(synthetic_chunks(size)).decode('utf8').strip()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(output)
+    return len(Solhint().parse(output))
+
+
+def streaming(size, path):
+    output = LogStream(synthetic_chunks(size), path)
+    findings = len(Solhint().parse(output.lines()))
+    output.drain()
+    return findings
+
+
+def measure(mode, size):
+    with tempfile.TemporaryDirectory() as tmp:
+        start = perf_counter()
+        findings = {'buffered': buffered, 'streaming': streaming}[mode](size, os.path.join(tmp, 'result.log'))
+        elapsed = perf_counter() - start
+    return findings, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare buffered and streamed log capture')
+    parser.add_argument('--size', nargs='+', type=int, default=[10, 100, 300], help='output size in MB')
+    args = parser.parse_args()
+
+    context = get_context('spawn')
+    print('%8s %10s %10s %10s %12s' % ('size', 'mode', 'findings', 'time', 'peak RSS'))
+    for size in args.size:
+        for mode in ('buffered', 'streaming'):
+            # a fresh process per measure, ru_maxrss never decreases
+            with context.Pool(1) as pool:
+                (findings, elapsed, rss) = pool.apply(measure, (mode, size * 1024 * 1024))
+            print('%6dMB %10s %10d %9.1fs %9.1f MB' % (size, mode, findings, elapsed, rss))
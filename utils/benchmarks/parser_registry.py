@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Results of each tool read by its registered parser in one pass, against a fresh parser object per step and a second
+walk over the analysis, for synthetic outputs of all the tools.
+
+"former" is the former conversion: a new parser parses the output into the analysis, then a new one walks the
+analysis to build the SARIF run, with a rule built for every finding. "registry" hands the output to the
+long-lived parser of the tool, which builds the analysis and the run together. The analysis and the SARIF run of each
+output are checked to be the same. Run from the repository root:
+
+    python3 -m utils.benchmarks.parser_registry [--outputs N] [--findings N] [--repeat N]
+"""
+
+import argparse
+import gc
+import io
+import json
+import random
+from contextlib import redirect_stdout
+from time import perf_counter
+
+from src.output_parser.SarifHolder import SarifHolder, parseRule
+from src.output_parser.registry import get_parser
+
+TOOLS = ['oyente', 'osiris', 'honeybadger', 'smartcheck', 'solhint', 'maian', 'conkas', 'manticore', 'mythril',
+         'slither', 'securify']
+
+OYENTE = ['Callstack Depth Attack Vulnerability.', 'Integer Overflow.', 'Integer Underflow.', 'Parity Multisig Bug 2.',
+          'Re-Entrancy Vulnerability.', 'Timestamp Dependency.']
+OSIRIS = ['callstack_bug', 'concurrency_bug', 'division_bugs', 'overflow_bugs', 'reentrancy_bug', 'underflow_bugs']
+HONEYBADGER = ['hidden_state_update', 'uninitialised_struct', 'inheritance_disorder', 'straw_man_contract',
+               'hidden_transfer', 'balance_disorder', 'type_overflow']
+SMARTCHECK = ['SOLIDITY_ADDRESS_HARDCODED', 'SOLIDITY_ARRAY_LENGTH_MANIPULATION', 'SOLIDITY_BALANCE_EQUALITY']
+SOLHINT = ['indent', 'max-line-length']
+CONKAS = ['Integer Overflow', 'Integer Underflow', 'Reentrancy', 'Time Manipulation', 'Unchecked Low Level Call']
+MANTICORE = ['Delegatecall to user controlled address', 'INVALID instruction', 'Reachable SELFDESTRUCT',
+             'Unsigned integer overflow at ADD instruction', 'Warning TIMESTAMP instruction used']
+MYTHRIL = ['Ether send', 'Exception state', 'Integer Overflow', 'Integer Underflow', 'Unchecked CALL return value',
+           'State change after external call']
+SLITHER = ['arbitrary-send', 'assembly', 'calls-loop', 'reentrancy-eth', 'timestamp', 'tx-origin', 'unused-return']
+SECURIFY = ['DAO', 'LockedEther', 'MissingInputValidation', 'TODAmount', 'UnhandledException', 'UnrestrictedWrite']
+
+FILE = '/data/contract.sol'
+
+
+def symexec_contracts(rng, contracts, findings, contract_line, result_line, error_line, names):
+    lines = []
+    for contract in range(contracts):
+        lines.append(contract_line % (FILE, 'C%d' % contract))
+        lines.append('INFO:symExec:\t============ Results ===========')
+        found = [rng.choice(names) for _ in range(rng.randint(0, findings))]
+        for name in names:
+            lines.append(result_line % (name.replace('_', ' ').rstrip('.').capitalize(), name in found))
+            for _ in range(found.count(name)):
+                lines.append(error_line % (FILE, 'C%d' % contract, rng.randint(1, 300), rng.randint(0, 40), name))
+        lines.append('INFO:symExec:\t====== Analysis Completed ======')
+    return '\n'.join(lines) + '\n'
+
+
+def sample(tool, rng, findings):
+    # (output of the container, members of its archive) of a synthetic analysis
+    base = tool.rstrip('2')
+    if base == 'oyente':
+        output = symexec_contracts(rng, rng.randint(1, 3), findings, 'INFO:root:contract %s:%s:',
+                                   'INFO:symExec:\t  %s: \t\t\t %s', 'INFO:symExec:%s:%.0s%d:%d: Warning: %s', OYENTE)
+        return output, None
+    if base == 'osiris':
+        output = symexec_contracts(rng, rng.randint(1, 3), findings, 'INFO:root:Contract %s:%s:',
+                                   'INFO:symExec:\t  %s: \t\t\t %s', '%s:%s:%d:%d%.0s', OSIRIS)
+        return output, None
+    if base == 'honeybadger':
+        output = symexec_contracts(rng, rng.randint(1, 2), findings, 'INFO:root:Contract %s:%s:',
+                                   'INFO:symExec:\t %s: \t\t\t %s', '%s:%s:%d:%d%.0s', HONEYBADGER)
+        return output, None
+    if base == 'smartcheck':
+        lines = []
+        for _ in range(rng.randint(0, findings)):
+            lines += ['ruleId: ' + rng.choice(SMARTCHECK), 'patternId: 5616b2', 'severity: %d' % rng.randint(1, 3),
+                      'line: %d' % rng.randint(1, 300), 'column: %d' % rng.randint(0, 40), 'content: a = b + c']
+        return '\n'.join(lines) + '\n', None
+    if base == 'solhint':
+        lines = ['%s:%d:%d: A problem found by the %s rule [%s/%s]' % (FILE, rng.randint(1, 300), rng.randint(1, 40),
+                                                                      rule, rng.choice(['Warning', 'Error']), rule)
+                 for rule in (rng.choice(SOLHINT) for _ in range(rng.randint(0, findings)))]
+        return '\n'.join(lines + ['', '%d problems' % len(lines)]) + '\n', None
+    if base == 'maian':
+        lines = ['[ ] Check if contract is PRODIGAL']
+        if rng.random() < 0.5:
+            lines.append('[-] Locking vulnerability found!')
+        if rng.random() < 0.5:
+            lines.append('[-] The contract is prodigal')
+        if rng.random() < 0.5:
+            lines.append('[-] Confirmed ! The contract is suicidal !')
+        return '\n'.join(lines) + '\n', None
+    if base == 'conkas':
+        lines = ['Analysing %s...' % FILE]
+        for _ in range(rng.randint(0, findings)):
+            lines.append('Vulnerability: %s. Maybe in function: f%d. PC: 0x%x. Line number: %d.'
+                         % (rng.choice(CONKAS), rng.randint(0, 3), rng.randint(0, 999), rng.randint(1, 300)))
+        return '\n'.join(lines) + '\n', None
+    if base == 'manticore':
+        folders = ['mcore_%d' % folder for folder in range(rng.randint(1, 2))]
+        archive = {}
+        for folder in folders:
+            lines = []
+            for _ in range(rng.randint(0, findings)):
+                lines += ['- %s -' % rng.choice(MANTICORE), '  Contract: 0x%x' % rng.randint(0, 999),
+                          '  Solidity snippet:', '    %d  a = b + c' % rng.randint(1, 300), '']
+            archive['results/%s/global.findings' % folder] = ('\n'.join(lines) + '\n').encode('utf8')
+        output = ''.join('Results in /%s\n' % folder for folder in folders)
+        return output, archive
+    if base == 'mythril':
+        issues = [{'title': rng.choice(MYTHRIL), 'description': 'A finding of mythril.\nSee the code.',
+                   'function': 'f%d()' % rng.randint(0, 3), 'type': rng.choice(['Warning', 'Informational']),
+                   'address': rng.randint(0, 999), 'lineno': rng.randint(1, 300), 'debug': 'calldata: 0x00'}
+                  for _ in range(rng.randint(0, findings))]
+        for issue in issues:
+            if rng.random() < 0.7:
+                issue['code'] = 'a = b + c'
+        return json.dumps({'error': None, 'issues': issues, 'success': True}), None
+    if base == 'slither':
+        checks = []
+        for _ in range(rng.randint(0, findings)):
+            elements = []
+            for _ in range(rng.randint(1, 3)):
+                start = rng.randint(1, 300)
+                element = {'type': rng.choice(['function', 'variable']), 'name': 'f',
+                           'source_mapping': {'lines': list(range(start, start + rng.randint(1, 5)))}}
+                if rng.random() < 0.5:
+                    element['expression'] = 'a = b + c'
+                if rng.random() < 0.5:
+                    element['contract'] = {'name': 'C0', 'type': 'contract'}
+                elements.append(element)
+            checks.append({'check': rng.choice(SLITHER), 'impact': rng.choice(['High', 'Low', 'Informational']),
+                           'confidence': 'Medium', 'description': 'A finding of slither\n', 'elements': elements})
+        return '', {'output.json': json.dumps(checks).encode('utf8')}
+    if base == 'securify':
+        contracts = {}
+        patterns = {}
+        for contract in range(rng.randint(1, 2)):
+            results = {}
+            for pattern in rng.sample(SECURIFY, rng.randint(0, len(SECURIFY))):
+                results[pattern] = {level: sorted(rng.sample(range(1, 300), rng.randint(0, 3)))
+                                    for level in ('violations', 'warnings', 'safe', 'conflicts')}
+                patterns[pattern] = dict(results[pattern], completed=True)
+            contracts['%s:C%d' % (FILE, contract)] = {'results': results}
+        archive = {'results/live.json': json.dumps({'patternResults': patterns}).encode('utf8')}
+        # some results.json files are missing, the live results are read instead
+        if rng.random() < 0.8:
+            archive['results/results.json'] = json.dumps(contracts).encode('utf8')
+        return '', archive
+    raise ValueError(tool)
+
+
+class Output:
+    # the output of a container as parse_results hands it to the parsers, held in memory
+    def __init__(self, text):
+        self.text = text
+
+    def lines(self):
+        return iter(self.text.splitlines())
+
+    def read(self):
+        return self.text.strip()
+
+    def first_char(self):
+        return self.text.lstrip()[:1]
+
+
+def former_parser(tool):
+    # a new parser building a rule for every finding, as the former parseSarif methods did
+    parser = get_parser(tool).__class__()
+    parser.rule = lambda vulnerability, full_description=None: parseRule(tool, vulnerability, full_description)
+    return parser
+
+
+def former_parse(tool, output, archive, results, file_path_in_repo):
+    if tool == 'securify':
+        return former_parser(tool).parse_output(output, archive, results, file_path_in_repo)
+    (analysis, findings) = former_parser(tool).read(output, archive)
+    for _ in findings:
+        pass
+    results['analysis'] = analysis
+    return former_parser(tool).parseSarif(results, file_path_in_repo)
+
+
+def registry_parse(tool, output, archive, results, file_path_in_repo):
+    return get_parser(tool).parse_output(output, archive, results, file_path_in_repo)
+
+
+def run_all(parse, samples):
+    outputs = []
+    for (tool, file_name, output, archive) in samples:
+        results = {'contract': file_name, 'tool': tool, 'analysis': None}
+        try:
+            run = parse(tool, Output(output), archive, results, FILE)
+        except Exception:
+            # the run is left out, as parse_results does
+            run = None
+        outputs.append((results['analysis'], run))
+    return outputs
+
+
+def serialize(outputs):
+    serialized = []
+    for (analysis, run) in outputs:
+        holder = SarifHolder()
+        if run is not None:
+            holder.addRun(run)
+        serialized.append((json.dumps(analysis), json.dumps(holder.print())))
+    return serialized
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the conversion of tool outputs to results and SARIF')
+    parser.add_argument('--outputs', type=int, default=300)
+    parser.add_argument('--findings', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    samples = [(tool, '%s_%d' % (tool, index)) + sample(tool, rng, args.findings)
+               for tool in TOOLS for index in range(args.outputs)]
+    print('%d outputs of %d tools' % (len(samples), len(TOOLS)))
+
+    serialized = {}
+    for (name, parse) in (('former', former_parse), ('registry', registry_parse)):
+        best = float('inf')
+        for _ in range(args.repeat):
+            outputs = None
+            gc.collect()
+            start = perf_counter()
+            # securify prints a line when it falls back to its live results
+            with redirect_stdout(io.StringIO()):
+                outputs = run_all(parse, samples)
+            best = min(best, perf_counter() - start)
+        serialized[name] = serialize(outputs)
+        print('%10s %8.3fs %8.1f us/output' % (name, best, best / len(samples) * 1e6))
+
+    assert serialized['former'] == serialized['registry'], 'the results differ'
+    print('same analysis and SARIF run for every output')
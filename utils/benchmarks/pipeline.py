@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Parsing in the processes that run the containers against the two-stage pipeline, for solhint with a fake Docker
+client.
+
+Each fake container takes --container-time seconds, as an analysis waiting on its container does, then prints
+--findings unix-format warnings for its file. "former" is the former pool engine: --processes processes each run a
+container and parse its output before taking the next job. "pipeline" runs the containers in --processes processes and
+parses their outputs in --parse-processes other ones, with at most --parse-queue outputs waiting. The result.json and
+result.sarif files of each contract are checked to be the same. Run from the repository root:
+
+    python3 -m utils.benchmarks.pipeline [--files N] [--processes N] [--parse-processes N] [--findings N]
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+import tempfile
+from multiprocessing import Pool
+from shutil import rmtree
+from time import perf_counter, sleep
+
+from src.docker_api import docker_api
+from src.docker_api.docker_api import analyse_files, pin_images
+from src.docker_api.pipeline import QUEUE_SIZE, Pipeline
+from src.output_parser.SarifHolder import SarifHolder
+
+logs = io.StringIO()
+
+
+class FakeContainer:
+    def __init__(self, output):
+        self.output = output
+        self.attrs = {}
+
+    def wait(self, timeout=None):
+        return {'StatusCode': 0}
+
+    def logs(self, stream=False):
+        return iter([self.output]) if stream else self.output
+
+    def stop(self, timeout=None):
+        pass
+
+    def remove(self):
+        pass
+
+
+class FakeContainers:
+    def __init__(self, container_time, findings):
+        self.container_time = container_time
+        self.findings = findings
+
+    def run(self, image, cmd, volumes=None, **kwargs):
+        sleep(self.container_time)
+        path = cmd.split()[-1]
+        lines = ['%s:%d:%d: Line length must be no more than 80 but current length is %d. [Warning/max-line-length]'
+                 % (path, finding % 400 + 1, finding % 7 + 1, 81 + finding % 40) for finding in range(self.findings)]
+        lines.append('')
+        lines.append('%d problems' % self.findings)
+        return FakeContainer(('\n'.join(lines) + '\n').encode('utf8'))
+
+
+class FakeImages:
+    def list(self, name):
+        return [name]
+
+
+class FakeClient:
+    def __init__(self, container_time, findings):
+        self.containers = FakeContainers(container_time, findings)
+        self.images = FakeImages()
+
+
+def former_job(task):
+    (file, now) = task
+    file_name = os.path.splitext(os.path.basename(file))[0]
+    runs = analyse_files('solhint', file, logs, now, {file_name: SarifHolder()}, 'all', 'dataset/')
+    return [('solhint', file, file_name, runs, 0)]
+
+
+def collect_job(task):
+    (file, now) = task
+    file_name = os.path.splitext(os.path.basename(file))[0]
+    (runs, analysis) = analyse_files('solhint', file, logs, now, {file_name: SarifHolder()}, 'all', 'dataset/',
+                                     collect=True)
+    return [('solhint', file, file_name, runs, 0, analysis)]
+
+
+def read_results(folder, file_names):
+    results = {}
+    for file_name in file_names:
+        with open(os.path.join(folder, file_name, 'result.json'), 'r') as f:
+            result = json.load(f)
+        with open(os.path.join(folder, file_name, 'result.sarif'), 'r') as f:
+            results[file_name] = (result['status'], result['analysis'], f.read())
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare parsing in the container processes and the pipeline')
+    parser.add_argument('--files', type=int, default=143)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--parse-processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--parse-queue', type=int, default=QUEUE_SIZE)
+    parser.add_argument('--container-time', type=float, default=0.2)
+    parser.add_argument('--findings', type=int, default=2000)
+    args = parser.parse_args()
+
+    files = sorted(glob.glob('dataset/**/*.sol', recursive=True))[:args.files]
+    file_names = [os.path.splitext(os.path.basename(file))[0] for file in files]
+    pin_images({})
+    # the processes of both pools inherit the fake client
+    docker_api.client = FakeClient(args.container_time, args.findings)
+    (fd, log_path) = tempfile.mkstemp(prefix='smartbugs-pipeline-', suffix='.log')
+    os.close(fd)
+
+    print('%d files, %d container processes, %d parsing processes, %d findings per output'
+          % (len(files), args.processes, args.parse_processes, args.findings))
+    outputs = {}
+    for name in ('former', 'pipeline'):
+        now = 'benchmark_pipeline_' + name
+        tasks = [(file, now) for file in files]
+        start = perf_counter()
+        if name == 'former':
+            with Pool(processes=args.processes) as pool:
+                for _ in pool.imap_unordered(former_job, tasks):
+                    pass
+        else:
+            Pipeline(collect_job, log_path, processes=args.processes, parse_processes=args.parse_processes,
+                     queue_size=args.parse_queue).run(tasks, lambda record: None)
+        elapsed = perf_counter() - start
+        outputs[name] = read_results(os.path.join('results', 'solhint', now), file_names)
+        rmtree(os.path.join('results', 'solhint', now))
+        print('%10s %8.2fs %8.1f files/s' % (name, elapsed, len(files) / elapsed))
+    os.remove(log_path)
+
+    assert outputs['former'] == outputs['pipeline'], 'the results of the pipeline differ'
+    print('%d contracts, same results' % len(files))
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Findings read by main.py from the result.json files of mythril, osiris, oyente and slither: jsonpath recursive
+descent against the extractors of src/aggregation/ingestion.
+
+"jsonpath" is the former path: the whole file loaded, then "$..issues", "$..errors" or "$..lines" searched in it.
+"paths" loads the file and goes straight to the findings, "stream" reads every file incrementally, as is done for
+files larger than STREAM_SIZE. The corpus is the result.json files of a results folder given with --results, or a
+synthetic one written as write_results does, with some large slither results. The (line, name) findings of each file
+are checked to be the same. Run from the repository root:
+
+    python3 -m utils.benchmarks.result_ingestion [--results FOLDER] [--files N] [--repeat N]
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import tempfile
+from shutil import rmtree
+from time import perf_counter
+
+from jsonpath import jsonpath
+
+from src.aggregation.ingestion import contract_errors, mythril_findings, slither_findings
+
+TOOLS = ['mythril', 'osiris', 'oyente', 'slither']
+
+
+def former_findings(filepath, tool):
+    with open(filepath) as f:
+        data = json.load(f)
+    if tool == 'mythril':
+        return [(issue['lineno'], issue['title']) for issues in jsonpath(data, "$..issues") for issue in issues]
+    if tool in ('osiris', 'oyente'):
+        return [(error['line'], error['message']) for errors in jsonpath(data, "$..errors") for error in errors]
+    return [(line, check['check']) for check in data['analysis']
+            for lines in (jsonpath(check['elements'], "$..lines") or []) for line in lines]
+
+
+def findings(filepath, tool, stream_size):
+    if tool == 'mythril':
+        return mythril_findings(filepath, stream_size)
+    if tool in ('osiris', 'oyente'):
+        return contract_errors(filepath, stream_size)
+    return slither_findings(filepath, stream_size)
+
+
+def source_mapping(rng):
+    start = rng.randint(1, 400)
+    lines = list(range(start, start + rng.randint(1, 12)))
+    return {'start': start * 30, 'length': len(lines) * 30, 'filename_relative': 'contract.sol',
+            'filename_absolute': '/data/contract.sol', 'filename_short': 'contract.sol', 'is_dependency': False,
+            'lines': lines, 'starting_column': 1, 'ending_column': 2}
+
+
+def slither_element(rng, depth):
+    element = {'type': rng.choice(['function', 'node', 'variable']), 'name': 'element',
+               'source_mapping': source_mapping(rng)}
+    if depth > 0:
+        element['type_specific_fields'] = {'parent': slither_element(rng, depth - 1), 'signature': 'f()'}
+    return element
+
+
+def synthetic_analysis(tool, rng, size):
+    if tool == 'mythril':
+        return {'error': None, 'success': True,
+                'issues': [{'title': rng.choice(['Integer Overflow', 'Unchecked Call Return Value', 'Reentrancy']),
+                            'lineno': rng.randint(1, 400), 'function': 'f()', 'type': 'Warning', 'address': 120,
+                            'description': 'The arithmetic operation can result in integer overflow.\n' * 3,
+                            'code': 'a += b', 'debug': 'calldata: 0x' + '00' * 64} for _ in range(size)]}
+    if tool in ('osiris', 'oyente'):
+        return [{'file': '/data/contract.sol', 'name': 'Contract%d' % contract, 'evm_code_coverage': '71.2%',
+                 'integer_overflow': True, 'callstack_depth_attack_vulnerability': False,
+                 'errors': [{'line': rng.randint(1, 400), 'column': rng.randint(1, 40), 'level': 'Warning',
+                             'message': rng.choice(['Integer Overflow.', 'Re-Entrancy Vulnerability.'])}
+                            for _ in range(size)]} for contract in range(rng.randint(1, 3))]
+    return [{'check': rng.choice(['reentrancy-eth', 'timestamp', 'low-level-calls']), 'impact': 'High',
+             'confidence': 'Medium', 'description': 'A finding of slither\n',
+             'elements': [slither_element(rng, rng.randint(0, 3)) for _ in range(rng.randint(1, 6))]}
+            for _ in range(size)]
+
+
+def synthetic_corpus(folder, files, rng):
+    corpus = []
+    for index in range(files):
+        tool = TOOLS[index % len(TOOLS)]
+        # one slither result in 50 is large, as slither results of big contracts are
+        size = 1000 if tool == 'slither' and index % 200 == 3 else rng.randint(0, 20)
+        output_folder = os.path.join(folder, tool, 'contract_%d' % index)
+        os.makedirs(output_folder)
+        results = {'contract': 'contract_%d' % index, 'tool': tool, 'start': 0.0, 'end': 1.0, 'duration': 1.0,
+                   'status': 'completed', 'analysis': synthetic_analysis(tool, rng, size)}
+        filepath = os.path.join(output_folder, 'result.json')
+        with open(filepath, 'w') as f:
+            json.dump(results, f, indent=2)
+        corpus.append((filepath, tool))
+    return corpus
+
+
+def recorded_corpus(folder):
+    corpus = []
+    for tool in TOOLS:
+        for filepath in sorted(glob.glob(os.path.join(folder, tool, '**', 'result.json'), recursive=True)):
+            with open(filepath) as f:
+                analysis = json.load(f)['analysis']
+            # results of failed analyses have no findings to compare
+            if analysis is not None:
+                corpus.append((filepath, tool))
+    return corpus
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the result ingestion of main.py')
+    parser.add_argument('--results', type=str, default=None)
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    folder = None
+    if args.results is not None:
+        corpus = recorded_corpus(args.results)
+    else:
+        folder = tempfile.mkdtemp(prefix='smartbugs-ingestion-')
+        corpus = synthetic_corpus(folder, args.files, random.Random(1))
+    print('%d result.json files, %.1f MB' % (len(corpus),
+                                             sum(os.path.getsize(filepath) for (filepath, _) in corpus) / 1e6))
+
+    readers = [('jsonpath', former_findings),
+               ('paths', lambda filepath, tool: findings(filepath, tool, float('inf'))),
+               ('stream', lambda filepath, tool: findings(filepath, tool, 0))]
+    outputs = {}
+    for (name, read) in readers:
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = perf_counter()
+            outputs[name] = [read(filepath, tool) for (filepath, tool) in corpus]
+            best = min(best, perf_counter() - start)
+        print('%10s %8.3fs %8.1f us/file' % (name, best, best / len(corpus) * 1e6))
+    if folder is not None:
+        rmtree(folder)
+
+    assert outputs['paths'] == outputs['jsonpath'], 'the findings read from the known paths differ'
+    assert outputs['stream'] == outputs['jsonpath'], 'the findings read incrementally differ'
+    print('same findings for every file')
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Stress benchmark of how (tool, file) results reach the per-file SARIF holders.
+
+"manager" is the former scheme: every task reads its file's SarifHolder from a Manager dict, adds its run and
+writes the holder back, and updates shared Value counters. "streaming" is the current scheme: tasks return their
+runs through imap_unordered and the parent folds them. Tasks parse synthetic solhint output, so no container is
+involved. Run from the repository root:
+
+    python3 -m utils.benchmarks.result_streaming [--processes 16 32 64] [--files N] [--tools N] [--findings N]
+"""
+
+import argparse
+from multiprocessing import Manager, Pool
+from time import perf_counter
+
+from src.output_parser.SarifHolder import SarifHolder
+from src.output_parser.Solhint import Solhint
+
+RULES = ['indent', 'max-line-length']
+
+
+def synthetic_run(tool, file_name, findings):
+    output = '\n'.join('%s.sol:%d:%d: synthetic finding [Warning/%s]' % (file_name, i + 1, 4, RULES[i % len(RULES)])
+                       for i in range(findings))
+    results = {'contract': file_name, 'analysis': Solhint().parse(output)}
+    run = Solhint().parseSarif(results, file_name + '.sol')
+    # one driver per simulated tool, as with the real tools
+    run.tool.driver.name = tool
+    return run
+
+
+def manager_task(args):
+    (tool, file_name, findings, sarif_outputs, nb_task_done, total_execution) = args
+    start = perf_counter()
+    nb_task_done.value += 1
+    run = synthetic_run(tool, file_name, findings)
+    sarif_holder = sarif_outputs[file_name]
+    sarif_holder.addRun(run)
+    sarif_outputs[file_name] = sarif_holder
+    total_execution.value += perf_counter() - start
+
+
+def streaming_task(args):
+    (tool, file_name, findings) = args
+    start = perf_counter()
+    run = synthetic_run(tool, file_name, findings)
+    return tool, file_name, [run], perf_counter() - start
+
+
+def bench_manager(processes, jobs, file_names):
+    start = perf_counter()
+    manager = Manager()
+    sarif_outputs = manager.dict()
+    nb_task_done = manager.Value('i', 0)
+    total_execution = manager.Value('f', 0)
+    for file_name in file_names:
+        sarif_outputs[file_name] = SarifHolder()
+    tasks = [(tool, file_name, findings, sarif_outputs, nb_task_done, total_execution)
+             for (tool, file_name, findings) in jobs]
+    with Pool(processes=processes) as pool:
+        pool.map(manager_task, tasks)
+    runs = sum(len(sarif_outputs[file_name].sarif.runs) for file_name in file_names)
+    manager.shutdown()
+    return perf_counter() - start, runs
+
+
+def bench_streaming(processes, jobs, file_names):
+    start = perf_counter()
+    sarif_outputs = {file_name: SarifHolder() for file_name in file_names}
+    with Pool(processes=processes) as pool:
+        for (tool, file_name, runs, duration) in pool.imap_unordered(streaming_task, jobs):
+            for run in runs:
+                sarif_outputs[file_name].addRun(run)
+    runs = sum(len(sarif_outputs[file_name].sarif.runs) for file_name in file_names)
+    return perf_counter() - start, runs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark result aggregation across worker processes')
+    parser.add_argument('--processes', type=int, nargs='+', default=[16, 32, 64])
+    parser.add_argument('--files', type=int, default=100, help='number of synthetic contracts')
+    parser.add_argument('--tools', type=int, default=10, help='number of synthetic tools per contract')
+    parser.add_argument('--findings', type=int, default=20, help='findings reported per (tool, contract)')
+    args = parser.parse_args()
+
+    file_names = ['contract_%d' % i for i in range(args.files)]
+    jobs = [('tool_%d' % t, file_name, args.findings) for file_name in file_names for t in range(args.tools)]
+
+    print('%d tasks, %d findings each' % (len(jobs), args.findings))
+    print('%10s %12s %12s %8s %14s' % ('processes', 'manager', 'streaming', 'speedup', 'runs lost'))
+    for processes in args.processes:
+        (manager_time, manager_runs) = bench_manager(processes, jobs, file_names)
+        (streaming_time, streaming_runs) = bench_streaming(processes, jobs, file_names)
+        if streaming_runs != len(jobs):
+            raise SystemExit('streaming aggregation lost runs')
+        # concurrent read-modify-write of the same holder drops runs in the manager scheme
+        print('%10d %11.2fs %11.2fs %7.1fx %14d' % (processes, manager_time, streaming_time,
+                                                    manager_time / streaming_time, len(jobs) - manager_runs))
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Tools run by main.py one sweep after the other against one sweep of all of them, with a fake Docker client.
+
+"former" is the former main.py: smartBugs.exec_cmd is called once per tool, each sweep with its own pools and the
+default single process, and the result.json of each contract is then looked up in the folder of the sweep (which
+main.py guessed from the minute the sweep started). "api" calls smartBugs.run_analyses once for all the tools, one
+process per tool as main.py now does, and reads the result.json files from the ResultHandle it returns. Each fake
+container takes --container-time seconds and prints a solhint finding per 80 characters of its contract. The
+analyses of both are checked to be the same. Run from the repository root:
+
+    python3 -m utils.benchmarks.run_api [--files N] [--tools TOOL ...] [--container-time S]
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+from shutil import rmtree
+from time import perf_counter, sleep
+
+import smartBugs
+from src.docker_api import docker_api
+from src.interface.cli import create_parser_with_args
+
+
+class FakeContainer:
+    def __init__(self, output):
+        self.output = output
+        self.attrs = {}
+
+    def wait(self, timeout=None):
+        return {'StatusCode': 0}
+
+    def logs(self, stream=False):
+        return iter([self.output]) if stream else self.output
+
+    def stop(self, timeout=None):
+        pass
+
+    def remove(self):
+        pass
+
+
+class FakeContainers:
+    def __init__(self, container_time):
+        self.container_time = container_time
+
+    def run(self, image, cmd, volumes=None, **kwargs):
+        sleep(self.container_time)
+        mounts = {volume['bind']: host for (host, volume) in volumes.items()}
+        lines = []
+        for path in (token for token in cmd.split() if token.startswith('/data/')):
+            size = os.path.getsize(mounts[path])
+            lines += ['%s:%d:1: Line length must be no more than 80 [Warning/max-line-length]' % (path, line)
+                      for line in range(1, size // 80 + 1)]
+        return FakeContainer(('\n'.join(lines) + '\n').encode('utf8'))
+
+
+class FakeImage:
+    id = 'sha256:benchmark'
+
+
+class FakeImages:
+    def list(self, name):
+        return [name]
+
+    def get(self, name):
+        return FakeImage()
+
+
+class FakeClient:
+    def __init__(self, container_time):
+        self.containers = FakeContainers(container_time)
+        self.images = FakeImages()
+
+
+def read_analysis(path):
+    with open(path, 'r') as f:
+        return json.load(f)['analysis']
+
+
+def former_run(files, tools):
+    for tool in tools:
+        smartBugs.exec_cmd(create_parser_with_args(['-t', tool, '-f'] + files + ['--no-batch']))
+    return {(tool, file): read_analysis(os.path.join('results', tool, smartBugs.output_folder,
+                                                     os.path.splitext(os.path.basename(file))[0], 'result.json'))
+            for tool in tools for file in files}
+
+
+def api_run(files, tools):
+    handles = smartBugs.run_analyses(files, tools, len(tools), ['--no-batch'])
+    return {key: read_analysis(handle.result_json) for (key, handle) in handles.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare sweeps run one per tool and one for all the tools')
+    parser.add_argument('--files', type=int, default=20)
+    parser.add_argument('--tools', nargs='+', default=['solhint', 'smartcheck', 'oyente', 'osiris'])
+    parser.add_argument('--container-time', type=float, default=0.2)
+    args = parser.parse_args()
+
+    files = sorted(glob.glob('dataset/**/*.sol', recursive=True))[:args.files]
+    docker_api.client = FakeClient(args.container_time)
+    print('%d files, %d tools, containers of %.2fs' % (len(files), len(args.tools), args.container_time))
+    outputs = {}
+    for (name, run) in (('former', former_run), ('api', api_run)):
+        # each run gets its own output folder and log, run_analyses starts a sweep of its own
+        if name == 'former':
+            smartBugs.start_run('benchmark_run_api_' + name)
+        start = perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            outputs[name] = run(files, args.tools)
+        elapsed = perf_counter() - start
+        for tool in args.tools:
+            rmtree(os.path.join('results', tool, smartBugs.output_folder))
+        smartBugs.logs.close()
+        for path in glob.glob('results/logs/SmartBugs_' + smartBugs.output_folder + '*'):
+            os.remove(path)
+        print('%8s %8.2fs' % (name, elapsed))
+
+    assert outputs['api'] == outputs['former'], 'the analyses differ'
+    print('%d analyses, same results' % len(outputs['api']))
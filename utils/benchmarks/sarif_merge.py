@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Cost of merging runs into one SarifHolder, as --unique-sarif-output does at the end of a sweep.
+
+"legacy" is the former merge: every rule, artifact and logical location of a new run is checked against the whole
+list of the run of its tool. "indexed" is the current SarifHolder, whose runs keep hash indexes of rule ids,
+artifact uris and logical-location names. Runs are synthetic slither-like runs of a few tools over distinct contracts,
+and both merges are checked to produce the same SARIF. Run from the repository root:
+
+    python3 -m utils.benchmarks.sarif_merge [--runs N] [--tools N] [--findings N]
+"""
+
+import argparse
+import copy
+from time import perf_counter
+
+from sarif_om import Run, Tool, ToolComponent
+
+from src.output_parser.SarifHolder import SarifHolder, isNotDuplicateRule, parseArtifact, parseLogicalLocation, \
+    parseResult, parseRule
+
+RULES = ['arbitrary-send', 'assembly', 'calls-loop', 'constable-states', 'constant-function', 'deprecated-standards']
+
+
+def legacy_new_rule(newRule, rulesList):
+    for rule in rulesList:
+        if rule.id == newRule.id:
+            return False
+    return True
+
+
+def legacy_new_artifact(newArtifact, artifactsList):
+    for artifact in artifactsList:
+        if artifact.location.uri == newArtifact.location.uri:
+            return False
+    return True
+
+
+def legacy_new_logical_location(newLogicalLocation, logicalLocationList):
+    for logicalLocation in logicalLocationList:
+        if logicalLocation.name == newLogicalLocation.name:
+            return False
+    return True
+
+
+class LegacySarifHolder(SarifHolder):
+    def addRun(self, newRun):
+        for run in self.sarif.runs:
+            if run.tool.driver.name == newRun.tool.driver.name:
+                for rule in newRun.tool.driver.rules:
+                    if legacy_new_rule(rule, run.tool.driver.rules):
+                        run.tool.driver.rules.append(rule)
+                for artifact in newRun.artifacts:
+                    if legacy_new_artifact(artifact, run.artifacts):
+                        run.artifacts.append(artifact)
+                if newRun.logical_locations is not None:
+                    for logicalLocation in newRun.logical_locations:
+                        if legacy_new_logical_location(logicalLocation, run.logical_locations):
+                            run.logical_locations.append(logicalLocation)
+                for result in newRun.results:
+                    run.results.append(result)
+                return
+        self.sarif.runs.append(newRun)
+
+
+def synthetic_runs(runs, tools, findings):
+    generated = []
+    for i in range(runs):
+        file_name = 'contract_%d.sol' % (i // tools)
+        rules = []
+        results = []
+        for j in range(findings):
+            vulnerability = RULES[(i + j) % len(RULES)]
+            rule = parseRule(tool='slither', vulnerability=vulnerability)
+            if isNotDuplicateRule(rule, rules):
+                rules.append(rule)
+            results.append(parseResult(tool='slither', vulnerability=vulnerability, uri=file_name, line=j + 1))
+        tool = Tool(driver=ToolComponent(name='tool_%d' % (i % tools), rules=rules))
+        generated.append(Run(tool=tool, artifacts=[parseArtifact(uri=file_name)],
+                             logical_locations=[parseLogicalLocation(name='Contract%d' % (i // tools))],
+                             results=results))
+    return generated
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the legacy and indexed SARIF merges')
+    parser.add_argument('--runs', type=int, default=10000)
+    parser.add_argument('--tools', type=int, default=10)
+    parser.add_argument('--findings', type=int, default=5)
+    args = parser.parse_args()
+
+    runs = synthetic_runs(args.runs, args.tools, args.findings)
+    printed = {}
+    print('%d runs of %d tools, %d findings each' % (args.runs, args.tools, args.findings))
+    for (name, holder_class) in (('legacy', LegacySarifHolder), ('indexed', SarifHolder)):
+        # the first run of each tool is extended by the merge, so each holder merges its own copy
+        holder_runs = copy.deepcopy(runs)
+        holder = holder_class()
+        start = perf_counter()
+        for run in holder_runs:
+            holder.addRun(run)
+        elapsed = perf_counter() - start
+        printed[name] = holder.print()
+        print('%10s %9.3fs %12.0f runs/s' % (name, elapsed, args.runs / elapsed))
+
+    assert printed['legacy'] == printed['indexed'], 'the merges differ'
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Cost of writing a large aggregated SARIF file, as --unique-sarif-output does at the end of a sweep.
+
+"dict" is the former path, json.dump(holder.print(), f, indent=2): attr.asdict builds a dict of the whole log, which
+recursiveSarif copies with the SARIF names before json renders it. "stream" is SarifHolder.write, which walks the
+sarif_om objects once and writes the JSON as it goes. The runs are synthetic slither-like runs over the contracts of
+the dataset, and both files are checked to be byte for byte the same. Run from the repository root:
+
+    python3 -m utils.benchmarks.sarif_serializer [--runs N] [--tools N] [--findings N]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+from src.output_parser.SarifHolder import SarifHolder
+from utils.benchmarks.sarif_merge import synthetic_runs
+
+
+def write_dict(holder, path):
+    with open(path, 'w') as f:
+        json.dump(holder.print(), f, indent=2)
+
+
+def write_stream(holder, path):
+    with open(path, 'w') as f:
+        holder.write(f)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the dict and streaming SARIF serializers')
+    parser.add_argument('--runs', type=int, default=10000)
+    parser.add_argument('--tools', type=int, default=10)
+    parser.add_argument('--findings', type=int, default=5)
+    args = parser.parse_args()
+
+    holder = SarifHolder()
+    for run in synthetic_runs(args.runs, args.tools, args.findings):
+        holder.addRun(run)
+
+    print('%d runs of %d tools, %d findings each' % (args.runs, args.tools, args.findings))
+    outputs = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for (name, write) in (('dict', write_dict), ('stream', write_stream)):
+            path = outputs[name] = os.path.join(directory, name + '.sarif')
+            start = perf_counter()
+            write(holder, path)
+            elapsed = perf_counter() - start
+            # written again to trace the allocations, tracing slows the writes down
+            tracemalloc.start()
+            write(holder, path)
+            (_, peak) = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print('%10s %9.3fs %10.1f MB peak %10.1f MB written' % (name, elapsed, peak / 2 ** 20,
+                                                                    os.path.getsize(path) / 2 ** 20))
+
+        with open(outputs['dict'], 'rb') as f:
+            expected = f.read()
+        with open(outputs['stream'], 'rb') as f:
+            assert f.read() == expected, 'the serializers differ'
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Memory held by the parent for --unique-sarif-output over a sweep.
+
+"holder" is the former output: the runs of every analysis are kept in per-file SarifHolders, merged into one holder
+at the end of the sweep and written. "stream" is SarifAggregate, which spools the results of each analysis as it is
+folded, optionally sharded by tool or by N contracts. Runs are synthetic slither-like runs, one per (tool, contract),
+and the unsharded output is checked to be the same file. Run from the repository root:
+
+    python3 -m utils.benchmarks.sarif_stream [--contracts N] [--tools N] [--findings N] [--shard-size N]
+"""
+
+import argparse
+import os
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+from src.output_parser.SarifHolder import SarifHolder
+from src.output_parser.SarifStream import SarifAggregate
+from utils.benchmarks.sarif_merge import synthetic_runs
+
+
+def analyses(contracts, tools, findings):
+    # runs are generated as the analyses would finish, so that the stream never holds them all
+    for i in range(contracts):
+        for run in synthetic_runs(tools, tools, findings):
+            file_name = 'contract_%d' % i
+            run.artifacts[0].location.uri = file_name + '.sol'
+            for result in run.results:
+                result.locations[0].physical_location.artifact_location.uri = file_name + '.sol'
+            yield run.tool.driver.name, file_name, run
+
+
+def write_holder(path, args, _):
+    sarif_outputs = {}
+    for (_, file_name, run) in analyses(args.contracts, args.tools, args.findings):
+        sarif_outputs.setdefault(file_name, SarifHolder()).addRun(run)
+    sarif_holder = SarifHolder()
+    for sarif_output in sarif_outputs.values():
+        for run in sarif_output.sarif.runs:
+            sarif_holder.addRun(run)
+    with open(path, 'w') as f:
+        sarif_holder.write(f)
+
+
+def write_stream(path, args, sharding):
+    file_names = ['contract_%d' % i for i in range(args.contracts)]
+    tasks = [('tool_%d' % j, file_name) for file_name in file_names for j in range(args.tools)]
+    sarif_aggregate = SarifAggregate(path, tasks, file_names, sharding)
+    for (tool, file_name, run) in analyses(args.contracts, args.tools, args.findings):
+        sarif_aggregate.addRuns(tool, file_name, [run])
+    sarif_aggregate.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the parent memory of the unique SARIF outputs')
+    parser.add_argument('--contracts', type=int, default=2000)
+    parser.add_argument('--tools', type=int, default=5)
+    parser.add_argument('--findings', type=int, default=5)
+    parser.add_argument('--shard-size', type=int, default=500)
+    args = parser.parse_args()
+
+    print('%d contracts x %d tools, %d findings each' % (args.contracts, args.tools, args.findings))
+    with tempfile.TemporaryDirectory() as directory:
+        for (name, write, sharding) in (('holder', write_holder, None), ('stream', write_stream, None),
+                                        ('stream/tool', write_stream, 'tool'),
+                                        ('stream/%d' % args.shard_size, write_stream, args.shard_size)):
+            path = os.path.join(directory, name.replace('/', '_') + '.sarif')
+            tracemalloc.start()
+            start = perf_counter()
+            write(path, args, sharding)
+            elapsed = perf_counter() - start
+            (_, peak) = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print('%12s %9.3fs %10.1f MB peak' % (name, elapsed, peak / 2 ** 20))
+
+        with open(os.path.join(directory, 'holder.sarif'), 'rb') as f:
+            expected = f.read()
+        with open(os.path.join(directory, 'stream.sarif'), 'rb') as f:
+            assert f.read() == expected, 'the unique outputs differ'
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Compares the makespan of a sweep started in file and tool order with the longest-first order of the scheduler.
+
+Durations are replayed from the result.json files under results/ when the sweep has been run before; otherwise they
+are drawn from a lognormal distribution scaled by the contract size, with a per-tool cost, which is how the run times
+of the analysis tools are spread. The model only sees the durations of the previous sweeps (--history) so its
+predictions are not the replayed durations. Run from the repository root:
+
+    python3 -m utils.benchmarks.scheduling [--dataset DIR] [--tools T ...] [--workers N ...]
+"""
+
+import argparse
+import glob
+import os
+import random
+
+from src.scheduler.scheduler import DurationModel, contract_features, longest_first, simulate_makespan
+
+# median seconds of an analysis of a 1KB contract
+TOOL_COST = {'solhint': 2, 'smartcheck': 5, 'slither': 4, 'oyente': 15, 'securify': 60, 'mythril': 120,
+             'manticore': 300}
+
+
+def synthetic_duration(rng, tool, features):
+    return TOOL_COST.get(tool, 10) * (1 + features[0]) ** 0.8 * (1 + features[1] / 4) * rng.lognormvariate(0, 0.6)
+
+
+def recorded_durations(model, tasks, features):
+    file_names = {os.path.splitext(os.path.basename(file))[0]: features[file] for file in features}
+    for tool in sorted(set(tool for tool, _ in tasks)):
+        model.load_results(tool, list(file_names.keys()), file_names)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate FIFO and longest-first makespans')
+    parser.add_argument('--dataset', default='dataset')
+    parser.add_argument('--tools', nargs='+', default=sorted(TOOL_COST))
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, 4, 16, 64])
+    parser.add_argument('--history', type=int, default=3, help='previous sweeps the model learns from')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    files = sorted(glob.glob(os.path.join(args.dataset, '**', '*.sol'), recursive=True))
+    features = {file: contract_features(file) for file in files}
+    tasks = [(tool, file) for file in files for tool in args.tools]
+
+    model = DurationModel()
+    recorded_durations(model, tasks, features)
+    if model.samples:
+        model.fit()
+        actual = {task: model.predict(task[0], features[task[1]]) for task in tasks}
+        source = 'results/'
+    else:
+        actual = {task: synthetic_duration(rng, task[0], features[task[1]]) for task in tasks}
+        for _ in range(args.history):
+            for (tool, file) in tasks:
+                model.add(tool, features[file], synthetic_duration(rng, tool, features[file]))
+        model.fit()
+        source = 'synthetic'
+
+    predictions = {task: model.predict(task[0], features[task[1]]) for task in tasks}
+    ordered = longest_first(tasks, predictions)
+    oracle = longest_first(tasks, actual)
+
+    print('%d jobs (%d contracts x %d tools), %s durations, %.0fs of work' %
+          (len(tasks), len(files), len(args.tools), source, sum(actual.values())))
+    print('%8s %12s %14s %14s %8s' % ('workers', 'fifo', 'longest-first', 'exact LPT', 'gain'))
+    for workers in args.workers:
+        fifo = simulate_makespan([actual[task] for task in tasks], workers)
+        lpt = simulate_makespan([actual[task] for task in ordered], workers)
+        exact = simulate_makespan([actual[task] for task in oracle], workers)
+        print('%8d %11.0fs %13.0fs %13.0fs %7.1f%%' % (workers, fifo, lpt, exact, 100 * (fifo - lpt) / fifo))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Cost of reading the solc version of the contracts of a sweep run with every tool.
+
+"parser" is the former scheme: each (tool, file) parses the whole source with solidity_parser to read its first
+pragma. "scanner" reads it with the linear scanner of src/source_metadata, and "memoized" goes through the content
+hash memo, so each contract is scanned once whatever the number of tools. Both schemes are checked to agree. Run from
+the repository root:
+
+    python3 -m utils.benchmarks.source_metadata [--dataset DIR] [--tools N]
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import os
+import tempfile
+from time import perf_counter
+
+from solidity_parser import parser
+
+from src.source_metadata.source_metadata import SourceMetadata, scan
+
+
+def legacy_solc_version(file):
+    try:
+        with open(file, 'r', encoding='utf-8') as fd:
+            solc_version = parser.parse(fd.read())['children'][0]['value'].strip('^').split('.')
+            return [int(solc_version[1]), int(solc_version[2])]
+    except Exception:
+        return None
+
+
+def scanner_solc_version(file):
+    with open(file, 'r', encoding='utf-8') as fd:
+        return scan(fd.read())['solc_version']
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Compare solc version detection schemes')
+    arg_parser.add_argument('--dataset', default='dataset')
+    arg_parser.add_argument('--tools', type=int, default=15, help='tools run on every contract, as with -t all')
+    args = arg_parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.dataset, '**', '*.sol'), recursive=True))
+    tasks = [file for file in files for _ in range(args.tools)]
+
+    with tempfile.TemporaryDirectory() as metadata_dir:
+        store = SourceMetadata(metadata_dir)
+        schemes = [('parser', legacy_solc_version), ('scanner', scanner_solc_version),
+                   ('memoized', lambda file: store.get(file)['solc_version'])]
+        versions = {}
+        print('%d contracts x %d tools' % (len(files), args.tools))
+        for (name, scheme) in schemes:
+            start = perf_counter()
+            # the ANTLR parser prints the syntax errors it recovers from
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                versions[name] = [scheme(file) for file in tasks]
+            print('%10s %9.3fs' % (name, perf_counter() - start))
+        rerun = SourceMetadata(metadata_dir)
+        start = perf_counter()
+        [rerun.get(file)['solc_version'] for file in tasks]
+        print('%10s %9.3fs' % ('rerun', perf_counter() - start))
+
+    assert versions['parser'] == versions['scanner'] == versions['memoized'], 'the schemes disagree'
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Host-side cost of staging the contract of each job, for every contract of the curated dataset and --tools tools.
+
+"former" is the former staging: a temporary directory, a copy of the contract, and its removal after the job. The
+Staging modes follow: read-only mounts the contract itself, writable only creates and removes an empty directory,
+and copy clones the contract (a reflink on copy-on-write filesystems, where no data is actually copied). Run from
+the repository root:
+
+    python3 -m utils.benchmarks.staging [--tools N] [--repeat N]
+"""
+
+import argparse
+import glob
+import os
+import tempfile
+from shutil import copyfile, rmtree
+from time import perf_counter
+
+from src.docker_api.staging import STAGING_MODES, Staging
+
+
+def former_staging(file):
+    working_dir = tempfile.mkdtemp()
+    copyfile(file, os.path.join(working_dir, os.path.basename(file)))
+    volumes = {os.path.abspath(working_dir): {'bind': '/data', 'mode': 'rw'}}
+    rmtree(working_dir)
+    return volumes
+
+
+def staging(mode):
+    def stage(file):
+        with Staging([file], mode) as staged:
+            return staged.volumes()
+    return stage
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the host cost of staging contracts')
+    parser.add_argument('--tools', type=int, default=15)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    files = sorted(glob.glob('dataset/**/*.sol', recursive=True))
+    jobs = [file for file in files for _ in range(args.tools)] * args.repeat
+    print('%d jobs' % len(jobs))
+    for (name, stage) in [('former', former_staging)] + [(mode, staging(mode)) for mode in STAGING_MODES]:
+        start = perf_counter()
+        for file in jobs:
+            stage(file)
+        elapsed = perf_counter() - start
+        # the contract is only written on the host by the former staging and the copy mode
+        copied = sum(os.path.getsize(file) for file in jobs) if name in ('former', 'copy') else 0
+        print('%10s %8.3fs %8.1f us/job %10.1f KB copied' % (name, elapsed, elapsed / len(jobs) * 1e6,
+                                                             copied / 1024))
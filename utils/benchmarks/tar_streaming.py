@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Disk traffic of reading the output files of a tool from its container archive.
+
+"result.tar" is the former scheme: the archive stream is written to result.tar, reopened with tarfile and each
+global.findings extracted from it. "streaming" is the current scheme: the members declared in the tool configuration
+are extracted from the stream and nothing is written. The archive is a synthetic manticore /results folder (one
+mcore_* directory per contract with its state files). Write counts come from /proc/self/io. Run from the repository
+root:
+
+    python3 -m utils.benchmarks.tar_streaming [--archives N] [--states N] [--state-size KB]
+"""
+
+import argparse
+import io
+import os
+import tarfile
+import tempfile
+from time import perf_counter
+
+from src.docker_api.tar_stream import extract_members
+from src.output_parser.Manticore import Manticore
+
+FINDINGS = '- Reachable ether leak to sender -\n    12  msg.sender.transfer(this.balance);\n'
+CHUNK = 16 * 1024
+
+
+def synthetic_archive(states, state_size):
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode='w') as tar:
+        def add(name, content):
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+        for i in range(states):
+            add('results/mcore_x1/test_%08d.pkl' % i, os.urandom(state_size))
+        add('results/mcore_x1/global.findings', FINDINGS.encode())
+    archive = data.getvalue()
+    return [archive[i:i + CHUNK] for i in range(0, len(archive), CHUNK)]
+
+
+def io_counters():
+    with open('/proc/self/io') as f:
+        counters = dict(line.split(': ') for line in f.read().splitlines())
+    return int(counters['syscw']), int(counters['wchar'])
+
+
+def with_result_tar(chunks, folder):
+    path = os.path.join(folder, 'result.tar')
+    with open(path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    tar = tarfile.open(path)
+    return Manticore().parse(tar.extractfile('results/mcore_x1/global.findings').read().decode('utf8'))
+
+
+def streaming(chunks, folder):
+    archive = extract_members(chunks, ['results/*/global.findings'])
+    return Manticore().parse(archive['results/mcore_x1/global.findings'].decode('utf8'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare result.tar and streamed archive extraction')
+    parser.add_argument('--archives', type=int, default=50)
+    parser.add_argument('--states', type=int, default=200)
+    parser.add_argument('--state-size', type=int, default=16, help='KB per state file')
+    args = parser.parse_args()
+
+    chunks = synthetic_archive(args.states, args.state_size * 1024)
+    print('%d archives of %.1f MB' % (args.archives, sum(map(len, chunks)) / 1024 / 1024))
+    print('%10s %10s %12s %14s' % ('scheme', 'time', 'write calls', 'bytes written'))
+    for (name, scheme) in (('result.tar', with_result_tar), ('streaming', streaming)):
+        with tempfile.TemporaryDirectory() as folder:
+            (calls, written) = io_counters()
+            start = perf_counter()
+            for _ in range(args.archives):
+                findings = scheme(chunks, folder)
+            elapsed = perf_counter() - start
+            (end_calls, end_written) = io_counters()
+        print('%10s %9.2fs %12d %11.1f MB' % (name, elapsed, end_calls - calls, (end_written - written) / 1024 / 1024))
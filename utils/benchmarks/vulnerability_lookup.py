@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the per-finding cost of resolving a tool message on sarif_vulnerability_mapping.csv.
+
+Compares the former lookup (re-reading the table with pandas and scanning it with iterrows on every call)
+with the process-wide VulnerabilityIndex. Run from the repository root:
+
+    python3 -m utils.benchmarks.vulnerability_lookup [--findings N]
+"""
+
+import argparse
+import csv
+import random
+from time import perf_counter
+
+from src.output_parser.SarifHolder import VULNERABILITY_TABLE, VulnerabilityIndex
+
+
+def legacy_find(tool, vulnerability_found):
+    import pandas
+    table = pandas.read_csv(VULNERABILITY_TABLE)
+    tool_table = table.loc[table["Tool"] == tool]
+    for index, row in tool_table.iterrows():
+        if row["Vulnerability"] in vulnerability_found or vulnerability_found in row["Vulnerability"]:
+            return row
+    return None
+
+
+def synthetic_findings(n):
+    with open(VULNERABILITY_TABLE, newline='', encoding='utf-8') as table:
+        entries = [(row["Tool"], row["Vulnerability"]) for row in csv.DictReader(table)]
+    rnd = random.Random(42)
+    findings = []
+    for i in range(n):
+        tool, vulnerability = rnd.choice(entries)
+        # half of the messages carry extra information, as mythril and oyente messages do
+        if i % 2:
+            vulnerability = vulnerability + ' (line %d)' % rnd.randint(1, 500)
+        findings.append((tool, vulnerability))
+    return findings
+
+
+def time_per_finding(find, findings):
+    start = perf_counter()
+    rule_ids = [find(tool, vulnerability)["RuleId"] for tool, vulnerability in findings]
+    return (perf_counter() - start) / len(findings), rule_ids
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark vulnerability table lookups')
+    parser.add_argument('--findings', type=int, default=500, help='number of synthetic findings to resolve')
+    parser.add_argument('--skip-legacy', action='store_true', help='do not time the pandas-based lookup')
+    args = parser.parse_args()
+
+    findings = synthetic_findings(args.findings)
+
+    start = perf_counter()
+    index = VulnerabilityIndex()
+    load_time = perf_counter() - start
+    indexed, indexed_ids = time_per_finding(index.find, findings)
+    print('index load:        %10.1f us (once per process)' % (load_time * 1e6))
+    print('indexed lookup:    %10.2f us/finding' % (indexed * 1e6))
+
+    if not args.skip_legacy:
+        legacy, legacy_ids = time_per_finding(legacy_find, findings)
+        print('pandas lookup:     %10.2f us/finding' % (legacy * 1e6))
+        print('speedup:           %10.0fx' % (legacy / indexed))
+        if legacy_ids != indexed_ids:
+            raise SystemExit('indexed lookup disagrees with the pandas lookup')